@@ -0,0 +1,302 @@
+"""
+This module provides opt-in agent mode of host. Small helper
+(rrmngmnt.remote_agent) is uploaded to host once and executed over single
+channel, then metadata-heavy queries like stat, listdir or reading of sysfs
+are served as requests to the helper instead of spawning process per each
+of them.
+
+with h.agent():
+    h.fs.listdir('/etc')  # served by agent
+"""
+import hashlib
+import inspect
+import json
+import threading
+from collections import namedtuple
+
+from rrmngmnt import errors
+from rrmngmnt import remote_agent
+from rrmngmnt.common import trusted_file_check, upload_file
+from rrmngmnt.resource import Resource
+
+StatResult = namedtuple(
+    'StatResult',
+    [
+        'st_mode', 'st_ino', 'st_dev', 'st_nlink', 'st_uid', 'st_gid',
+        'st_size', 'st_atime', 'st_mtime', 'st_ctime',
+    ],
+)
+
+# exit codes of start command
+MISSING_HELPER = 3
+MISSING_PYTHON = 4
+
+
+def _helper_source():
+    return inspect.getsource(remote_agent).encode('utf-8')
+
+
+class Agent(Resource):
+    """
+    Client of helper running on host, all requests are sent over single
+    channel one after another.
+    """
+    remote_dir = '/var/tmp'
+    interpreters = ('python3', 'python')
+
+    class LoggerAdapter(Resource.LoggerAdapter):
+        """
+        Makes sure that all logs made in this class, has appropriate prefix:
+        [IP]
+        """
+        def process(self, msg, kwargs):
+            return (
+                "[%s] %s" % (
+                    self.extra['self'].host.ip,
+                    msg,
+                ),
+                kwargs,
+            )
+
+    def __init__(self, host, user=None):
+        """
+        :param host: host to run agent on
+        :type host: instance of Host
+        :param user: user to run agent as, executor user by default
+        :type user: instance of User
+        """
+        super(Agent, self).__init__()
+        self.host = host
+        self._executor = host.executor(user)
+        self._source = _helper_source()
+        self.digest = hashlib.sha256(self._source).hexdigest()
+        self.path = "%s/rrmngmnt-agent-%s.py" % (
+            self.remote_dir, self.digest[:16],
+        )
+        self._session = None
+        self._channel = None
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self.pid = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type_, value, tb):
+        self.close()
+
+    def _command(self):
+        return (
+            "%(check)s || exit %(missing)d ; "
+            "for p in %(interpreters)s ; do "
+            "command -v $p >/dev/null && exec $p %(path)s ; "
+            "done ; exit %(nopython)d"
+        ) % {
+            'check': trusted_file_check(self.path, self.digest),
+            'path': self.path,
+            'missing': MISSING_HELPER,
+            'interpreters': ' '.join(self.interpreters),
+            'nopython': MISSING_PYTHON,
+        }
+
+    def _start(self):
+        """
+        :return: exit code of start command when helper didn't start,
+                 None otherwise
+        :rtype: int
+        """
+        self._channel = self._session.channel(self._command())
+        hello = self._recv()
+        if hello is None:
+            channel, self._channel = self._channel, None
+            rc = channel.recv_exit_status()
+            channel.close()
+            return rc
+        self.pid = hello['result']['pid']
+        return None
+
+    def open(self):
+        """
+        Start helper on host, it is uploaded only when host doesn't have
+        helper of the same content yet. Services of host use the agent
+        until it is closed.
+        """
+        self._session = self._executor.session()
+        self._session.open()
+        try:
+            rc = self._start()
+            if rc == MISSING_HELPER:
+                self.logger.debug("Uploading agent to %s", self.path)
+                upload_file(
+                    self._executor, self._session, self.path, self._source,
+                )
+                rc = self._start()
+            if rc is not None:
+                raise errors.AgentError(
+                    self.host,
+                    "Failed to start agent %s, RC: %s" % (self.path, rc),
+                )
+        except Exception:
+            self._session.close()
+            self._session = None
+            raise
+        self.logger.debug("Agent started, pid %s", self.pid)
+        self.host._agent = self
+
+    def close(self):
+        if getattr(self.host, '_agent', None) is self:
+            self.host._agent = None
+        if self._channel is not None:
+            channel, self._channel = self._channel, None
+            channel.close()
+        if self._session is not None:
+            session, self._session = self._session, None
+            session.close()
+
+    def _recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._channel.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _recv(self):
+        header = self._recv_exactly(remote_agent.HEADER.size)
+        if header is None:
+            return None
+        size = remote_agent.HEADER.unpack(header)[0]
+        data = self._recv_exactly(size)
+        if data is None:
+            return None
+        return json.loads(data.decode('utf-8'))
+
+    def call(self, method, *params):
+        """
+        Call method of helper, see rrmngmnt.remote_agent.Methods
+
+        :param method: name of method
+        :type method: str
+        :param params: parameters of method
+        :return: result of method
+        :raises: OSError, AgentError
+        """
+        with self._lock:
+            if self._channel is None:
+                raise errors.AgentError(self.host, "Agent is not running")
+            self._last_id += 1
+            data = json.dumps(
+                {'id': self._last_id, 'method': method, 'params': params}
+            ).encode('utf-8')
+            self._channel.sendall(remote_agent.HEADER.pack(len(data)) + data)
+            response = self._recv()
+        if response is None:
+            raise errors.AgentError(
+                self.host, "Agent exited while executing: %s" % method
+            )
+        error = response.get('error')
+        if error is None:
+            return response['result']
+        if error['type'] == 'OSError':
+            raise OSError(
+                error['errno'], error['message'], error['filename']
+            )
+        raise errors.AgentError(
+            self.host, "%s: %s" % (error['type'], error['message'])
+        )
+
+    def stat(self, path):
+        """
+        :param path: path
+        :type path: str
+        :return: status of path, symlinks are followed
+        :rtype: StatResult
+        :raises: OSError
+        """
+        return StatResult(*self.call('stat', path))
+
+    def lstat(self, path):
+        """
+        :param path: path
+        :type path: str
+        :return: status of path, symlinks are not followed
+        :rtype: StatResult
+        :raises: OSError
+        """
+        return StatResult(*self.call('lstat', path))
+
+    def stat_many(self, paths):
+        """
+        :param paths: paths
+        :type paths: list
+        :return: path to status mapping, None for missing paths
+        :rtype: dict
+        """
+        return dict(
+            (path, st if st is None else StatResult(*st))
+            for path, st in self.call('stat_many', list(paths)).items()
+        )
+
+    def exists(self, path):
+        return self.call('exists', path)
+
+    def isfile(self, path):
+        return self.call('isfile', path)
+
+    def isdir(self, path):
+        return self.call('isdir', path)
+
+    def listdir(self, path):
+        return self.call('listdir', path)
+
+    def walk(self, top):
+        """
+        :param top: directory to walk
+        :type top: str
+        :return: same entries as os.walk
+        :rtype: list of tuple(dirpath, dirnames, filenames)
+        """
+        return [tuple(entry) for entry in self.call('walk', top)]
+
+    def glob(self, pattern):
+        return self.call('glob', pattern)
+
+    def read(self, path):
+        """
+        :param path: path to file
+        :type path: str
+        :return: content of file
+        :rtype: str
+        :raises: OSError
+        """
+        return self.call('read', path)
+
+    def read_many(self, paths):
+        """
+        :param paths: paths to files
+        :type paths: list
+        :return: path to content mapping, None for unreadable files
+        :rtype: dict
+        """
+        return self.call('read_many', list(paths))
+
+    def read_tree(self, patterns):
+        """
+        :param patterns: glob patterns of files or directories, directories
+                         are read recursively
+        :type patterns: list
+        :return: pairs of path and content
+        :rtype: list of tuple(str, str)
+        """
+        return [tuple(entry) for entry in self.call('read_tree', patterns)]
+
+    def which(self, names):
+        """
+        :param names: names of binaries
+        :type names: list
+        :return: names of binaries available in PATH
+        :rtype: set
+        """
+        return set(self.call('which', list(names)))
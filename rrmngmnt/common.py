@@ -1,4 +1,9 @@
 import socket
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+
+from rrmngmnt import errors
 
 
 def fqdn2ip(fqdn):
@@ -19,3 +24,148 @@ def fqdn2ip(fqdn):
         ex.strerror = message
         ex.args = tuple(args)
         raise
+
+
+def trusted_file_check(path, digest=None, executable=False):
+    """
+    Shell condition which holds only when file can be trusted, it is meant
+    for files kept in world-writable directories (like /var/tmp) where any
+    user could place own file under the same name.
+
+    :param path: path to file
+    :type path: str
+    :param digest: expected sha256 hex digest of content, content is not
+                   checked when None
+    :type digest: str
+    :param executable: file has to be executable as well
+    :type executable: bool
+    :return: condition checking that file is owned by executor user
+             (and it is executable and its content matches)
+    :rtype: str
+    """
+    check = "[ -O %s ]" % path
+    if executable:
+        check += " && [ -x %s ]" % path
+    if digest is not None:
+        check += " && [ $(sha256sum < %s | cut -c1-64) = %s ]" % (
+            path, digest,
+        )
+    return check
+
+
+def upload_file(executor, session, path, content, mode=None):
+    """
+    Upload file under temporary name and rename it then, so concurrent
+    users of path never see partially written file, and file of other
+    user is replaced (when directory permits it).
+
+    :param executor: executor of session
+    :type executor: instance of Executor
+    :param session: open session of executor
+    :type session: instance of Executor.Session
+    :param path: destination path
+    :type path: str
+    :param content: content of file
+    :type content: bytes
+    :param mode: chmod mode applied before rename, like '+x'
+    :type mode: str
+    :raises: CommandExecutionFailure
+    """
+    tmp = "%s.%s" % (path, uuid.uuid4().hex)
+    with session.open_file(tmp, 'wb') as fh:
+        fh.write(content)
+    cmd = ['mv', '-f', tmp, path]
+    if mode is not None:
+        cmd = ['chmod', mode, tmp, '&&'] + cmd
+    rc, _, err = session.run_cmd(cmd)
+    if rc:
+        raise errors.CommandExecutionFailure(executor, cmd, rc, err)
+
+
+def parallel_map(func, items, workers=None):
+    """
+    Call func for each item in separate threads
+
+    :param func: function to call
+    :type func: callable
+    :param items: items to process
+    :type items: list
+    :param workers: max number of parallel calls, all at once if None
+    :type workers: int
+    :return: results in order of items
+    :rtype: list
+    :raises: first exception raised by func
+    """
+    items = list(items)
+    if not items:
+        return []
+    pool = ThreadPool(min(workers or len(items), len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class TimedCache(object):
+    """
+    Dictionary like storage where stored values expire after given time.
+    """
+    def __init__(self, ttl=None):
+        """
+        :param ttl: time in seconds after which values expire,
+                    values never expire when it is None
+        :type ttl: float
+        """
+        super(TimedCache, self).__init__()
+        self.ttl = ttl
+        self._data = dict()
+
+    def get(self, key, default=None):
+        """
+        :param key: key of value
+        :type key: hashable
+        :param default: returned when there is no valid value for key
+        :type default: anything
+        :return: stored value or default
+        :rtype: anything
+        """
+        try:
+            stored, value = self._data[key]
+        except KeyError:
+            return default
+        if self.ttl is not None and time.time() - stored > self.ttl:
+            del self._data[key]
+            return default
+        return value
+
+    def age(self, key):
+        """
+        :param key: key of value
+        :type key: hashable
+        :return: seconds since value was stored, None when there is no
+                 valid value for key
+        :rtype: float
+        """
+        if self.get(key, self) is self:
+            return None
+        return time.time() - self._data[key][0]
+
+    def set(self, key, value):
+        """
+        :param key: key of value
+        :type key: hashable
+        :param value: value to store
+        :type value: anything
+        """
+        self._data[key] = (time.time(), value)
+
+    def invalidate(self, key=None):
+        """
+        :param key: key of value to drop, all values are dropped when None
+        :type key: hashable
+        """
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
@@ -76,3 +76,28 @@ class UnsupportedOperation(GeneralResourceError):
         return "Operation '{0}' is not supported for {1}: {2}".format(
             self.operation, self.host, self.reason
         )
+
+
+class AgentError(GeneralResourceError):
+    """
+    This exception is used when agent of host fails to serve request.
+    """
+    def __init__(self, host, message):
+        """
+        :param host: relevant host
+        :type host: instance of Host
+        :param message: message
+        :type message: str
+        """
+        super(AgentError, self).__init__(host, message)
+
+    @property
+    def host(self):
+        return self.args[0]
+
+    @property
+    def message(self):
+        return self.args[1]
+
+    def __str__(self):
+        return "Agent of {0} failed: {1}".format(self.host, self.message)
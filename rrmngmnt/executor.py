@@ -51,6 +51,12 @@ class Executor(Resource):
             cmd = self.command(cmd)
             return cmd.run(input_)
 
+        def channel(self, cmd):
+            raise NotImplementedError()
+
+        def shell(self):
+            raise NotImplementedError()
+
     class Command(object):
         def __init__(self, cmd, session):
             super(Executor.Command, self).__init__()
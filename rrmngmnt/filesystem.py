@@ -1,4 +1,5 @@
 import os
+from rrmngmnt.agent import StatResult
 from rrmngmnt.service import Service
 from rrmngmnt import errors
 
@@ -8,6 +9,8 @@ class FileSystem(Service):
     Class for working with filesystem.
     It has same interface as 'os' module.
     """
+    _file_tests = {'e': 'exists', 'f': 'isfile', 'd': 'isdir'}
+
     def _exec_command(self, cmd):
         host_executor = self.host.executor()
         rc, _, err = host_executor.run_cmd(cmd)
@@ -17,6 +20,8 @@ class FileSystem(Service):
             )
 
     def _exec_file_test(self, op, path):
+        if self.agent:
+            return getattr(self.agent, self._file_tests[op])(path)
         return self.host.executor().run_cmd(
             ['[', '-%s' % op, path, ']']
         )[0] == 0
@@ -30,9 +35,9 @@ class FileSystem(Service):
     def isdir(self, path):
         return self._exec_file_test('d', path)
 
-    def remove(self, path):
+    def remove(self, path, *paths):
         return self.host.executor().run_cmd(
-            ['rm', '-f', path]
+            ['rm', '-f', path] + list(paths)
         )[0] == 0
     unlink = remove
 
@@ -44,6 +49,11 @@ class FileSystem(Service):
         )[0] == 0
 
     def listdir(self, path):
+        if self.agent:
+            try:
+                return self.agent.listdir(path)
+            except OSError:
+                return []
         return self.host.executor().run_cmd(
             ['ls', '-A1', path]
         )[1].split()
@@ -73,13 +83,45 @@ class FileSystem(Service):
         :return: Content of a file
         :rtype: str
         """
+        if self.agent:
+            try:
+                return self.agent.read(path)
+            except OSError:
+                return ""
         cmd = ["cat", path]
         rc, out, _ = self.host.run_command(cmd)
         return out if not rc else ""
 
+    def stat(self, path):
+        """
+        Get status of file, symlinks are followed
+
+        :param path: file or directory path
+        :type path: str
+        :return: status of file
+        :rtype: rrmngmnt.agent.StatResult
+        :raises: CommandExecutionFailure, if stat failed, or OSError when
+                 agent is running
+        """
+        if self.agent:
+            return self.agent.stat(path)
+        cmd = ['stat', '-L', '-c', '%f %i %d %h %u %g %s %X %Y %Z', path]
+        host_executor = self.host.executor()
+        rc, out, err = host_executor.run_cmd(cmd)
+        if rc:
+            raise errors.CommandExecutionFailure(
+                cmd=cmd, executor=host_executor, rc=rc, err=err
+            )
+        values = out.split()
+        return StatResult(
+            int(values[0], 16), *[int(value) for value in values[1:]]
+        )
+
     def create_script(self, content, path):
         """
-        Create script on filesystem, and make it executable.
+        Create script on filesystem, and make it executable within the same
+        session. See Host.run_script for running of scripts without
+        uploading them every time.
 
         :param content: content of the script
         :type content: str
@@ -90,7 +132,12 @@ class FileSystem(Service):
         with executor.session() as session:
             with session.open_file(path, 'wb') as fh:
                 fh.write(content)
-            self.chmod(path=path, mode="+x")
+            cmd = ['chmod', '+x', path]
+            rc, _, err = session.run_cmd(cmd)
+            if rc:
+                raise errors.CommandExecutionFailure(
+                    cmd=cmd, executor=executor, rc=rc, err=err
+                )
 
     def mkdir(self, path):
         """
@@ -4,23 +4,41 @@ It should hold methods / properties which returns you Instance of specific
 Service hosted on that Host.
 """
 import os
+import six
 import copy
 import socket
+import hashlib
 import netaddr
 import warnings
 
 from rrmngmnt import ssh
 from rrmngmnt import errors
 from rrmngmnt import power_manager
-from rrmngmnt.common import fqdn2ip
+from rrmngmnt.agent import Agent
+from rrmngmnt.common import (
+    fqdn2ip,
+    trusted_file_check,
+    upload_file,
+    TimedCache,
+)
 from rrmngmnt.network import Network
 from rrmngmnt.storage import NFSService, LVMService
-from rrmngmnt.service import Systemd, SysVinit, InitCtl
+from rrmngmnt.service import (
+    SystemService,
+    SystemServiceGroup,
+    Systemd,
+    SysVinit,
+    InitCtl,
+)
 from rrmngmnt.resource import Resource
 from rrmngmnt.filesystem import FileSystem
-from rrmngmnt.package_manager import PackageManagerProxy
+from rrmngmnt.package_manager import PackageManager, PackageManagerProxy
 from rrmngmnt.operatingsystem import OperatingSystem
 
+# printed by script command when script has to be uploaded
+SCRIPT_MISSING = 'RRMNGMNT_SCRIPT_MISSING'
+SCRIPT_MISSING_RC = 127
+
 
 class Host(Resource):
     """
@@ -31,6 +49,8 @@ class Host(Resource):
     # interesting resources in single place.
     inventory = list()
 
+    script_dir = '/var/tmp'
+
     default_service_providers = [
         Systemd,
         SysVinit,
@@ -66,7 +86,11 @@ class Host(Resource):
         self._executor_user = None
         self._power_managers = dict()
         self._service_provider = service_provider
+        self._service_indexes = TimedCache(ttl=SystemService.index_ttl)
+        self._package_indexes = TimedCache(ttl=PackageManager.index_ttl)
         self._package_manager = PackageManagerProxy(self)
+        self._agent = None
+        self._scripts = set()
         self.os = OperatingSystem(self)
         self.add()  # adding host to inventory
 
@@ -212,6 +236,22 @@ class Host(Resource):
             user = self.executor_user
         return ssh.RemoteExecutor(user, self.ip, use_pkey=pkey)
 
+    def agent(self, user=None):
+        """
+        Create agent of host, while it is running, filesystem, network and
+        operating system queries are served by it instead of executing
+        command per each query. See rrmngmnt.agent.Agent.
+
+        with h.agent():
+            h.fs.listdir('/etc')
+
+        :param user: user to run agent as, executor user by default
+        :type user: instance of rrmngmnt.User
+        :return: agent, not started yet
+        :rtype: instance of Agent
+        """
+        return Agent(self, user)
+
     def run_command(
         self, command, input_=None, tcp_timeout=None, io_timeout=None,
         user=None, pkey=False,
@@ -241,6 +281,70 @@ class Host(Resource):
             )
         return rc, out, err
 
+    def run_script(
+        self, content, args=(), input_=None, tcp_timeout=None,
+        io_timeout=None, user=None,
+    ):
+        """
+        Run script on host, it is uploaded under path derived from hash of
+        its content only when host doesn't have it yet (or it was removed
+        meanwhile), so repeated runs of the same script cost single command
+        execution.
+
+        :param content: content of the script
+        :type content: str
+        :param args: arguments of the script
+        :type args: list
+        :param input_: input data
+        :type input_: str
+        :param tcp_timeout: tcp timeout
+        :type tcp_timeout: float
+        :param io_timeout: timeout for data operation (read/write)
+        :type io_timeout: float
+        :return: tuple of (rc, out, err)
+        :rtype: tuple
+        :raises: CommandExecutionFailure, if script can't be uploaded
+        """
+        if isinstance(content, six.text_type):
+            content = content.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(
+            self.script_dir, "rrmngmnt-script-%s" % digest[:16],
+        )
+        executor = self.executor(user=user)
+        with executor.session(tcp_timeout) as session:
+            cmd = self._script_command(path, digest) + list(args)
+            self.logger.info("Executing script %s %s", path, ' '.join(args))
+            rc, out, err = session.run_cmd(cmd, input_, io_timeout)
+            if rc == SCRIPT_MISSING_RC and SCRIPT_MISSING in err:
+                self._scripts.discard(path)
+                upload_file(executor, session, path, content, '+x')
+                cmd = self._script_command(path, digest) + list(args)
+                rc, out, err = session.run_cmd(cmd, input_, io_timeout)
+        if rc:
+            # script is verified again next time
+            self._scripts.discard(path)
+            self.logger.error(
+                "Failed to run script %s ERR: %s OUT: %s", cmd, err, out
+            )
+        else:
+            self._scripts.add(path)
+        return rc, out, err
+
+    def _script_command(self, path, digest):
+        """
+        Command which executes script only when it can be trusted, content
+        is not checked again when it was verified already. Otherwise it
+        fails with SCRIPT_MISSING.
+        """
+        check = trusted_file_check(
+            path, None if path in self._scripts else digest, executable=True,
+        )
+        script = "%s || { echo %s >&2 ; exit %d ; } ; exec %s" % (
+            check, SCRIPT_MISSING, SCRIPT_MISSING_RC, path,
+        )
+        return script.split()
+
     def copy_to(self, resource, src, dst):
         """
         Copy to host from another resource
@@ -259,6 +363,12 @@ class Host(Resource):
                         host_file.write(resource_file.read())
 
     def _create_service(self, name, timeout):
+        # look up binaries of all providers at once, each provider
+        # checks its own binary in the cache then
+        self.os.find_binaries(
+            [provider.cmd for provider in self.default_service_providers],
+            SystemService.default_timeout if timeout is None else timeout,
+        )
         for provider in self.default_service_providers:
             try:
                 service = provider(self, name, timeout=timeout)
@@ -306,6 +416,36 @@ class Host(Resource):
             self._service_provider = service.__class__
             return service
 
+    def services(self, names, timeout=None):
+        """
+        Create group of services, which allows to perform action for all
+        of them at once
+
+        :param names: service names
+        :type names: list of strings
+        :param timeout: expected time to complete operations per service
+        :type timeout: int
+        :return: group of services
+        :rtype: instance of SystemServiceGroup
+        """
+        return SystemServiceGroup(
+            self, [self.service(name, timeout) for name in names]
+        )
+
+    def service_states(self, names, timeout=None):
+        """
+        Get detailed states of services, all services of same provider
+        are checked by single command
+
+        :param names: service names
+        :type names: list of strings
+        :param timeout: expected time to complete operations per service
+        :type timeout: int
+        :return: service name to state mapping
+        :rtype: dict of rrmngmnt.service.ServiceState
+        """
+        return self.services(names, timeout).states()
+
     def get_ssh_public_key(self, user=None):
         """
         Get SSH public key
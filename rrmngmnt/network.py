@@ -1,16 +1,56 @@
+import json
 import logging
+import math
 import netaddr
 import os
 import re
 import shlex
 import six
+import socket
 import subprocess
+import threading
+import time
+from array import array
+from collections import namedtuple
 
+from rrmngmnt import errors
+from rrmngmnt.common import parallel_map
 from rrmngmnt.service import Service
 
 logger = logging.getLogger(__name__)
 
 IFCFG_PATH = "/etc/sysconfig/network-scripts/"
+SECTION_SEPARATOR = "__SECTION_SEPARATOR__"
+
+Interface = namedtuple(
+    'Interface',
+    [
+        'name', 'index', 'mac', 'mtu', 'state', 'flags', 'master', 'kind',
+        'addresses',
+    ],
+)
+Address = namedtuple('Address', ['ip', 'prefixlen', 'family', 'interface'])
+PingStats = namedtuple(
+    'PingStats',
+    [
+        'dst', 'transmitted', 'received', 'loss', 'min', 'avg', 'max',
+        'mtu',
+    ],
+)
+Neighbor = namedtuple('Neighbor', ['ip', 'dev', 'mac', 'state'])
+Throughput = namedtuple(
+    'Throughput', ['stream', 'bytes', 'seconds', 'rate'],
+)
+Reachability = namedtuple(
+    'Reachability', ['address', 'reachable', 'rtt', 'method'],
+)
+Route = namedtuple(
+    'Route',
+    [
+        'dst', 'gateway', 'dev', 'table', 'metric', 'prefsrc', 'family',
+        'protocol', 'scope', 'type',
+    ],
+)
 
 
 class _session(object):
@@ -22,8 +62,8 @@ class _session(object):
         self._s = None
         self._c = 0
 
-    def runCmd(self, cmd):
-        return self._s.run_cmd(cmd)
+    def runCmd(self, cmd, input_=None):
+        return self._s.run_cmd(cmd, input_)
 
     def __enter__(self):
         self._c += 1
@@ -126,11 +166,1120 @@ class HostnameCtlHandler(HostnameHandler):
             raise Exception("Unable to set hostname: %s" % err)
 
 
+class PrefixIndex(object):
+    """
+    Longest prefix match index of IPv4 and IPv6 networks.
+    Lookup checks only prefix lengths present in index, so it costs at most
+    one dictionary lookup per prefix length.
+    """
+    _bits = {4: 32, 6: 128}
+
+    def __init__(self):
+        super(PrefixIndex, self).__init__()
+        # version -> prefix length -> network address -> values
+        self._networks = {4: dict(), 6: dict()}
+        # version -> prefix lengths in descending order
+        self._prefixlens = {4: list(), 6: list()}
+
+    def add(self, network, value):
+        """
+        :param network: network address with prefix length (x.x.x.x/xx),
+                        host address or 'default' (IPv4) / 'default6'
+        :type network: str
+        :param value: value to store
+        :type value: anything
+        """
+        if network == 'default':
+            network = '0.0.0.0/0'
+        elif network == 'default6':
+            network = '::/0'
+        net = netaddr.IPNetwork(network)
+        networks = self._networks[net.version]
+        if net.prefixlen not in networks:
+            networks[net.prefixlen] = dict()
+            self._prefixlens[net.version] = sorted(networks, reverse=True)
+        networks[net.prefixlen].setdefault(net.first, list()).append(value)
+
+    def lookup(self, ip):
+        """
+        :param ip: IP address
+        :type ip: str
+        :return: values of longest matching network, empty list if none
+        :rtype: list
+        """
+        address = netaddr.IPAddress(ip)
+        bits = self._bits[address.version]
+        value = int(address)
+        networks = self._networks[address.version]
+        for prefixlen in self._prefixlens[address.version]:
+            mask = ((1 << bits) - 1) ^ ((1 << (bits - prefixlen)) - 1)
+            values = networks[prefixlen].get(value & mask)
+            if values:
+                return values
+        return []
+
+
+class RouteTable(object):
+    """
+    Routes and addresses of host indexed for longest prefix match lookups.
+    """
+    def __init__(self, routes, addresses):
+        """
+        :param routes: routes of host
+        :type routes: list of Route
+        :param addresses: addresses of host
+        :type addresses: list of Address
+        """
+        super(RouteTable, self).__init__()
+        self._tables = dict()
+        for route in routes:
+            if route.type != 'unicast' or not route.dst:
+                continue
+            dst = route.dst
+            if dst == 'default' and route.family == 'inet6':
+                dst = 'default6'
+            index = self._tables.setdefault(route.table, PrefixIndex())
+            index.add(dst, route)
+        self._connected = PrefixIndex()
+        self._addresses = dict()
+        for address in addresses:
+            self._connected.add(
+                "%s/%s" % (address.ip, address.prefixlen), address,
+            )
+            self._addresses.setdefault(address.interface, list()).append(
+                address
+            )
+
+    def lookup(self, dst, table='main'):
+        """
+        Find route used to reach destination
+
+        :param dst: destination IP address
+        :type dst: str
+        :param table: routing table
+        :type table: str
+        :return: longest matching route with lowest metric or None
+        :rtype: Route
+        """
+        try:
+            routes = self._tables[table].lookup(dst)
+        except KeyError:
+            return None
+        if not routes:
+            return None
+        return min(routes, key=lambda r: r.metric)
+
+    def connected_addresses(self, ip):
+        """
+        :param ip: IP address
+        :type ip: str
+        :return: local addresses of most specific network containing ip
+        :rtype: list of Address
+        """
+        return list(self._connected.lookup(ip))
+
+    def source(self, dst, table='main'):
+        """
+        Find which local address and interface reach destination
+
+        :param dst: destination IP address
+        :type dst: str
+        :param table: routing table
+        :type table: str
+        :return: tuple(local IP, interface), (None, None) when unreachable
+        :rtype: tuple
+        """
+        route = self.lookup(dst, table)
+        if route is None:
+            return None, None
+        if route.prefsrc:
+            return route.prefsrc, route.dev
+        for address in self.connected_addresses(route.gateway or dst):
+            if address.interface == route.dev:
+                return address.ip, route.dev
+        for address in self._addresses.get(route.dev, []):
+            if address.family == route.family:
+                return address.ip, route.dev
+        return None, route.dev
+
+
+class NetworkSnapshot(object):
+    """
+    Network configuration of host taken at one moment, indexed for local
+    lookups.
+
+    It is built from JSON output of 'ip -d -j addr show' and
+    'ip -j route show table all' (for both IPv4 and IPv6).
+    """
+    def __init__(self, links, routes, routes6=()):
+        """
+        :param links: decoded output of 'ip -d -j addr show'
+        :type links: list of dicts
+        :param routes: decoded output of 'ip -j route show table all'
+        :type routes: list of dicts
+        :param routes6: decoded output of 'ip -6 -j route show table all'
+        :type routes6: list of dicts
+        """
+        super(NetworkSnapshot, self).__init__()
+        self.interfaces = dict()
+        self.addresses = dict()
+        self.routes = list()
+        self._bridge_info = dict()
+        self._route_table = None
+        for link in links:
+            self._add_link(link)
+        for route in routes:
+            self.routes.append(self._route(route, 'inet'))
+        for route in routes6:
+            self.routes.append(self._route(route, 'inet6'))
+
+    def _add_link(self, link):
+        name = link['ifname']
+        addresses = list()
+        for info in link.get('addr_info', []):
+            if 'local' not in info:
+                continue
+            address = Address(
+                info['local'], info.get('prefixlen'), info.get('family'), name,
+            )
+            addresses.append(address)
+            self.addresses.setdefault(address.ip, address)
+        linkinfo = link.get('linkinfo', {})
+        self.interfaces[name] = Interface(
+            name=name,
+            index=link.get('ifindex'),
+            mac=link.get('permaddr', link.get('address')),
+            mtu=link.get('mtu'),
+            state=link.get('operstate'),
+            flags=tuple(link.get('flags', [])),
+            master=link.get('master'),
+            kind=linkinfo.get('info_kind'),
+            addresses=tuple(addresses),
+        )
+        if linkinfo.get('info_kind') == 'bridge':
+            self._bridge_info[name] = linkinfo.get('info_data', {})
+
+    @staticmethod
+    def _route(route, family):
+        return Route(
+            dst=route.get('dst'),
+            gateway=route.get('gateway'),
+            dev=route.get('dev'),
+            table=route.get('table', 'main'),
+            metric=route.get('metric', 0),
+            prefsrc=route.get('prefsrc'),
+            family=family,
+            protocol=route.get('protocol'),
+            scope=route.get('scope'),
+            type=route.get('type', 'unicast'),
+        )
+
+    def update_link(self, name, **fields):
+        """
+        Add interface or update its fields, addresses are kept.
+
+        :param name: interface name
+        :type name: str
+        :param fields: fields of Interface to set
+        :type fields: dict
+        """
+        interface = self.interfaces.get(name)
+        if interface is None:
+            interface = Interface(
+                name, None, None, None, None, (), None, None, (),
+            )
+        self.interfaces[name] = interface._replace(**fields)
+
+    def remove_link(self, name):
+        interface = self.interfaces.pop(name, None)
+        if interface is not None:
+            for address in interface.addresses:
+                self.remove_address(address.ip, name)
+
+    def add_address(self, address):
+        """
+        :param address: address to add
+        :type address: Address
+        """
+        self.remove_address(address.ip, address.interface)
+        self.addresses.setdefault(address.ip, address)
+        self.update_link(address.interface)
+        interface = self.interfaces[address.interface]
+        self.interfaces[address.interface] = interface._replace(
+            addresses=interface.addresses + (address,),
+        )
+        self._route_table = None
+
+    def remove_address(self, ip, interface):
+        if interface in self.interfaces:
+            link = self.interfaces[interface]
+            self.interfaces[interface] = link._replace(
+                addresses=tuple(a for a in link.addresses if a.ip != ip),
+            )
+        address = self.addresses.get(ip)
+        if address is not None and address.interface == interface:
+            del self.addresses[ip]
+            # NOTE: the same IP can be configured on other interface
+            for link in self.interfaces.values():
+                for other in link.addresses:
+                    if other.ip == ip:
+                        self.addresses.setdefault(ip, other)
+        self._route_table = None
+
+    @staticmethod
+    def _route_key(route):
+        return route.dst, route.dev, route.table, route.gateway, route.family
+
+    def add_route(self, route):
+        """
+        :param route: route to add
+        :type route: Route
+        """
+        self.remove_route(route)
+        self.routes.append(route)
+        self._route_table = None
+
+    def remove_route(self, route):
+        key = self._route_key(route)
+        self.routes = [r for r in self.routes if self._route_key(r) != key]
+        self._route_table = None
+
+    @staticmethod
+    def _bridge_id(bridge_id):
+        # ip prints e.g. 8000.0:9c:2:b0:bf:a0, brctl prints 8000.009c02b0bfa0
+        if not bridge_id or '.' not in bridge_id:
+            return bridge_id
+        prio, mac = bridge_id.split('.', 1)
+        return "%s.%s" % (
+            prio, ''.join(["%02x" % int(b, 16) for b in mac.split(':')]),
+        )
+
+    @property
+    def route_table(self):
+        """
+        :return: routes and addresses indexed for longest prefix match
+        :rtype: RouteTable
+        """
+        if self._route_table is None:
+            self._route_table = RouteTable(
+                self.routes, list(self.addresses.values()),
+            )
+        return self._route_table
+
+    def default_gateway(self, family='inet'):
+        """
+        :param family: inet or inet6
+        :type family: str
+        :return: gateway of default route with lowest metric in main table
+        :rtype: str or None
+        """
+        routes = [
+            r for r in self.routes
+            if r.dst == 'default' and r.table == 'main' and r.gateway and
+            r.family == family
+        ]
+        if not routes:
+            return None
+        return min(routes, key=lambda r: r.metric).gateway
+
+    def _sorted_interfaces(self):
+        # interfaces known only from address events have no index yet,
+        # they go last
+        return sorted(
+            self.interfaces.values(),
+            key=lambda i: (i.index is None, i.index or 0, i.name),
+        )
+
+    def ipv4_addresses(self):
+        """
+        :return: IPv4 addresses except host scoped ones (loopback)
+        :rtype: list of Address
+        """
+        addresses = list()
+        for interface in self._sorted_interfaces():
+            for address in interface.addresses:
+                if address.family == 'inet' and not netaddr.IPAddress(
+                    address.ip
+                ).is_loopback():
+                    addresses.append(address)
+        return addresses
+
+    def bridges(self):
+        """
+        :return: bridge name to list of its ports mapping
+        :rtype: dict
+        """
+        bridges = dict([(name, list()) for name in self._bridge_info])
+        for interface in self._sorted_interfaces():
+            if interface.master in bridges:
+                bridges[interface.master].append(interface.name)
+        return bridges
+
+    def list_bridges(self):
+        """
+        :return: bridges in same format as Network.list_bridges
+        :rtype: list of dict(name, id, stp, interfaces)
+        """
+        bridges = self.bridges()
+        result = list()
+        for interface in self._sorted_interfaces():
+            if interface.name not in bridges:
+                continue
+            info = self._bridge_info[interface.name]
+            result.append(
+                {
+                    'name': interface.name,
+                    'id': self._bridge_id(info.get('bridge_id')),
+                    'stp': 'yes' if info.get('stp_state') else 'no',
+                    'interfaces': bridges[interface.name],
+                }
+            )
+        return result
+
+
+class NetworkTransaction(object):
+    """
+    Accumulates network changes and applies them by single
+    'ip -batch -' command.
+
+    Every operation remembers its inverse, so when the batch fails
+    the operations which were already applied are reverted (unless
+    rollback is disabled).
+
+    with h.network.transaction() as t:
+        t.add_bridge('br1', ['eth1'])
+        t.set_mtu(['eth1', 'br1'], 9000)
+        t.link_up('br1')
+    """
+    failed_line_re = re.compile(r'Command failed .*:(?P<line>[0-9]+)')
+
+    def __init__(self, network, rollback=True):
+        """
+        :param network: network service of host
+        :type network: instance of Network
+        :param rollback: revert applied operations on failure
+        :type rollback: bool
+        """
+        super(NetworkTransaction, self).__init__()
+        self._network = network
+        self.rollback = rollback
+        self._ops = list()
+
+    def __len__(self):
+        return len(self._ops)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self._ops = list()
+
+    def _add(self, cmd, undo=None):
+        self._ops.append((cmd, undo))
+        return self
+
+    @staticmethod
+    def _route_args(dst, gateway=None, dev=None, table=None, metric=None):
+        args = [dst]
+        if gateway:
+            args.extend(['via', gateway])
+        if dev:
+            args.extend(['dev', dev])
+        if table:
+            args.extend(['table', table])
+        if metric is not None:
+            args.extend(['metric', metric])
+        return args
+
+    def add_link(self, name, kind, link=None, **options):
+        """
+        Create link of given type, ip link add [link LINK] NAME type KIND
+
+        :param name: name of link
+        :type name: str
+        :param kind: type of link (bridge, vlan, bond, dummy, ...)
+        :type kind: str
+        :param link: parent link
+        :type link: str
+        :param options: type specific options, e.g. id=10 for vlan
+        :type options: dict
+        """
+        cmd = ['link', 'add']
+        if link:
+            cmd.extend(['link', link])
+        cmd.extend(['name', name, 'type', kind])
+        for key in sorted(options):
+            cmd.extend([key, options[key]])
+        return self._add(cmd, ['link', 'del', name])
+
+    def delete_link(self, name):
+        """
+        Delete link, it can not be reverted.
+
+        :param name: name of link
+        :type name: str
+        """
+        return self._add(['link', 'del', name])
+
+    def link_up(self, name):
+        return self._add(
+            ['link', 'set', 'up', name], ['link', 'set', 'down', name]
+        )
+
+    def link_down(self, name):
+        return self._add(
+            ['link', 'set', 'down', name], ['link', 'set', 'up', name]
+        )
+
+    def set_mtu(self, nics, mtu):
+        """
+        Set MTU on NICs, the previous MTU is restored on rollback
+        only when it is known from network snapshot.
+
+        :param nics: list of NICs
+        :type nics: list
+        :param mtu: MTU size
+        :type mtu: str or int
+        """
+        snapshot = self._network._snapshot
+        for nic in nics:
+            undo = None
+            if snapshot is not None and nic in snapshot.interfaces:
+                undo = [
+                    'link', 'set', 'mtu',
+                    snapshot.interfaces[nic].mtu, nic,
+                ]
+            self._add(['link', 'set', 'mtu', mtu, nic], undo)
+        return self
+
+    def set_master(self, name, master):
+        return self._add(
+            ['link', 'set', name, 'master', master],
+            ['link', 'set', name, 'nomaster'],
+        )
+
+    def add_bridge(self, bridge, interfaces=()):
+        """
+        Create bridge and attach interfaces to it
+
+        :param bridge: bridge name
+        :type bridge: str
+        :param interfaces: interfaces to attach
+        :type interfaces: list
+        """
+        self.add_link(bridge, 'bridge')
+        for interface in interfaces:
+            self.set_master(interface, bridge)
+        return self
+
+    def delete_bridge(self, bridge):
+        self.link_down(bridge)
+        return self.delete_link(bridge)
+
+    def add_vlan(self, link, vlan_id, name=None):
+        """
+        Create VLAN on top of link
+
+        :param link: parent link
+        :type link: str
+        :param vlan_id: VLAN id
+        :type vlan_id: int
+        :param name: name of VLAN link, default is LINK.ID
+        :type name: str
+        """
+        name = name or "%s.%s" % (link, vlan_id)
+        return self.add_link(name, 'vlan', link=link, id=vlan_id)
+
+    def add_bond(self, bond, slaves=(), mode=None):
+        """
+        Create bond and enslave interfaces to it
+
+        :param bond: bond name
+        :type bond: str
+        :param slaves: interfaces to enslave, they are brought down
+        :type slaves: list
+        :param mode: bonding mode, e.g. active-backup
+        :type mode: str
+        """
+        options = {'mode': mode} if mode else {}
+        self.add_link(bond, 'bond', **options)
+        for slave in slaves:
+            self.link_down(slave)
+            self.set_master(slave, bond)
+        return self
+
+    def add_address(self, ip, dev):
+        """
+        :param ip: address with prefix, e.g. 10.0.0.1/24
+        :type ip: str
+        :param dev: interface name
+        :type dev: str
+        """
+        return self._add(
+            ['address', 'add', ip, 'dev', dev],
+            ['address', 'del', ip, 'dev', dev],
+        )
+
+    def delete_address(self, ip, dev):
+        return self._add(
+            ['address', 'del', ip, 'dev', dev],
+            ['address', 'add', ip, 'dev', dev],
+        )
+
+    def add_route(self, dst, gateway=None, dev=None, table=None, metric=None):
+        args = self._route_args(dst, gateway, dev, table, metric)
+        return self._add(['route', 'add'] + args, ['route', 'del'] + args)
+
+    def delete_route(
+        self, dst, gateway=None, dev=None, table=None, metric=None
+    ):
+        args = self._route_args(dst, gateway, dev, table, metric)
+        return self._add(['route', 'del'] + args, ['route', 'add'] + args)
+
+    @staticmethod
+    def render(cmds):
+        """
+        Render commands into input of 'ip -batch -'
+
+        :param cmds: commands
+        :type cmds: list of lists
+        :return: batch content
+        :rtype: str
+        """
+        return "".join(
+            "%s\n" % " ".join(str(arg) for arg in cmd) for cmd in cmds
+        )
+
+    def _failed_line(self, err):
+        match = self.failed_line_re.search(err)
+        if match:
+            return int(match.group('line'))
+        return None
+
+    def _revert(self, applied):
+        undo = [u for _, u in reversed(applied) if u is not None]
+        if not undo:
+            return
+        logger.info(
+            "Reverting %d network operations on %s",
+            len(undo), self._network.host,
+        )
+        # NOTE: -force, revert as much as possible
+        rc, _, err = self._network._m.runCmd(
+            ['ip', '-force', '-batch', '-'], input_=self.render(undo),
+        )
+        if rc:
+            logger.error("Fail to revert network operations: %s", err)
+
+    def _apply(self):
+        ops, self._ops = self._ops, list()
+        self._network.drop_snapshot()
+        with self._network._m:
+            rc, out, err = self._network._m.runCmd(
+                ['ip', '-batch', '-'],
+                input_=self.render([c for c, _ in ops]),
+            )
+            if not rc:
+                return True
+            line = self._failed_line(err)
+            if self.rollback and line:
+                self._revert(ops[:line - 1])
+        failed = " ".join(str(a) for a in ops[line - 1][0]) if line else None
+        raise Exception(
+            "Fail to run command ip -batch - at '%s': %s ; %s" % (
+                failed, out, err,
+            )
+        )
+
+    def commit(self):
+        """
+        Apply all accumulated operations by single command
+
+        :return: True or raise Exception
+        :rtype: bool or Exception
+        """
+        if not self._ops:
+            return True
+        return self._apply()
+
+
+class NetworkWatcher(object):
+    """
+    Streams 'ip -o monitor link address route' events from host over
+    single channel and keeps network snapshot of host up to date.
+
+    with h.network.watch() as watcher:
+        h.network.if_up('eth1')
+        watcher.wait_for_link_state('eth1', 'UP', timeout=30)
+    """
+    monitor_cmd = ['ip', '-o', 'monitor', 'link', 'address', 'route']
+    route_types = (
+        'unicast', 'local', 'broadcast', 'multicast', 'anycast',
+        'unreachable', 'blackhole', 'prohibit', 'throw', 'nat',
+    )
+    link_re = re.compile(
+        r'^(?P<deleted>Deleted )?(?P<index>[0-9]+): '
+        r'(?P<name>[^:@ ]+)(@\S+)?: <(?P<flags>[^>]*)>(?P<rest>.*)$'
+    )
+    address_re = re.compile(
+        r'^(?P<deleted>Deleted )?[0-9]+: (?P<name>\S+)\s+'
+        r'(?P<family>inet6?) (?P<ip>[^/ ]+)(/(?P<prefixlen>[0-9]+))?'
+    )
+
+    def __init__(self, network):
+        """
+        :param network: network service of host
+        :type network: instance of Network
+        """
+        super(NetworkWatcher, self).__init__()
+        self._network = network
+        self._cond = threading.Condition()
+        self._started = threading.Event()
+        self._pending = list()
+        self._session = None
+        self._thread = None
+        self._out = None
+        self.snapshot = None
+        self.running = False
+        self.error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Start monitor on host and take initial snapshot
+        """
+        self._session = self._network.host.executor().session()
+        self._session.__enter__()
+        self.running = True
+        self._thread = threading.Thread(target=self._watch)
+        self._thread.daemon = True
+        self._thread.start()
+        self._started.wait()
+        # NOTE: events received in meantime are applied to the snapshot,
+        # so nothing between start of monitor and snapshot is missed
+        snapshot = self._network.snapshot()
+        with self._cond:
+            self.snapshot = snapshot
+            for line in self._pending:
+                self._apply(line)
+            self._pending = list()
+            self._cond.notify_all()
+
+    def stop(self):
+        """
+        Stop monitor, the snapshot is not updated anymore
+        """
+        with self._cond:
+            if self._session is None:
+                return
+            session, self._session = self._session, None
+            self.running = False
+        # NOTE: closing of channel ends the monitor, then session is closed
+        channel = getattr(self._out, 'channel', None)
+        if channel is not None:
+            channel.close()
+        self._thread.join()
+        try:
+            session.__exit__(None, None, None)
+        except Exception as ex:
+            logger.debug("Can not close monitor session: %s", ex)
+
+    def _watch(self):
+        command = self._session.command(self.monitor_cmd)
+        try:
+            with command.execute() as (_, out, _):
+                self._out = out
+                self._started.set()
+                for line in iter(out.readline, ''):
+                    with self._cond:
+                        if self.snapshot is None:
+                            self._pending.append(line)
+                        else:
+                            self._apply(line)
+                        self._cond.notify_all()
+        except Exception as ex:
+            if self.running:
+                logger.error("Network monitor failed: %s", ex)
+                self.error = ex
+        finally:
+            self._started.set()
+            with self._cond:
+                self.running = False
+                self._cond.notify_all()
+
+    @staticmethod
+    def _option(tokens, key, default=None):
+        if key in tokens[:-1]:
+            return tokens[tokens.index(key) + 1]
+        return default
+
+    def _apply(self, line):
+        line = line.strip()
+        if line.startswith('['):
+            line = line.split(']', 1)[-1].strip()
+        if not line:
+            return
+        match = self.link_re.match(line)
+        if match:
+            return self._apply_link(match)
+        match = self.address_re.match(line)
+        if match:
+            return self._apply_address(match)
+        self._apply_route(line)
+
+    def _apply_link(self, match):
+        name = match.group('name')
+        if match.group('deleted'):
+            self.snapshot.remove_link(name)
+            return
+        tokens = match.group('rest').split()
+        mtu = self._option(tokens, 'mtu')
+        self.snapshot.update_link(
+            name,
+            index=int(match.group('index')),
+            flags=tuple(match.group('flags').split(',')),
+            mtu=int(mtu) if mtu else None,
+            state=self._option(tokens, 'state'),
+            master=self._option(tokens, 'master'),
+        )
+        mac = self._option(tokens, 'link/ether')
+        if mac and not self.snapshot.interfaces[name].mac:
+            self.snapshot.update_link(name, mac=mac)
+
+    def _apply_address(self, match):
+        name = match.group('name')
+        if match.group('deleted'):
+            self.snapshot.remove_address(match.group('ip'), name)
+            return
+        prefixlen = match.group('prefixlen')
+        self.snapshot.add_address(
+            Address(
+                match.group('ip'),
+                int(prefixlen) if prefixlen else None,
+                match.group('family'),
+                name,
+            )
+        )
+
+    def _apply_route(self, line):
+        tokens = line.split()
+        deleted = tokens[0] == 'Deleted'
+        if deleted:
+            tokens = tokens[1:]
+        type_ = 'unicast'
+        if tokens and tokens[0] in self.route_types:
+            type_ = tokens.pop(0)
+        if not tokens:
+            return
+        gateway = self._option(tokens, 'via')
+        metric = self._option(tokens, 'metric', 0)
+        route = Route(
+            dst=tokens[0],
+            gateway=gateway,
+            dev=self._option(tokens, 'dev'),
+            table=self._option(tokens, 'table', 'main'),
+            metric=int(metric),
+            prefsrc=self._option(tokens, 'src'),
+            family='inet6' if ':' in tokens[0] + (gateway or '') else 'inet',
+            protocol=self._option(tokens, 'proto'),
+            scope=self._option(tokens, 'scope'),
+            type=type_,
+        )
+        if deleted:
+            self.snapshot.remove_route(route)
+        else:
+            self.snapshot.add_route(route)
+
+    def wait_for(self, predicate, timeout=None):
+        """
+        Wait until predicate is satisfied by snapshot
+
+        :param predicate: called with NetworkSnapshot on every event
+        :type predicate: callable
+        :param timeout: max time to wait in seconds, no limit if None
+        :type timeout: float
+        :return: True if predicate was satisfied, False otherwise
+        :rtype: bool
+        :raises: Exception when monitor failed
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if self.error is not None:
+                    raise Exception(
+                        "Network monitor failed: %s" % self.error
+                    )
+                if self.snapshot is not None and predicate(self.snapshot):
+                    return True
+                if not self.running:
+                    return False
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+
+    def wait_for_link_state(self, nic, state, timeout=None):
+        """
+        :param nic: NIC name
+        :type nic: str
+        :param state: operational state, e.g. UP or DOWN
+        :type state: str
+        :param timeout: max time to wait in seconds, no limit if None
+        :type timeout: float
+        :return: True if NIC reached the state, False otherwise
+        :rtype: bool
+        """
+        return self.wait_for(
+            lambda s: nic in s.interfaces and
+            s.interfaces[nic].state == state,
+            timeout,
+        )
+
+    def wait_for_address(self, ip, nic=None, timeout=None, present=True):
+        """
+        :param ip: IP address
+        :type ip: str
+        :param nic: NIC which should hold the address, any if None
+        :type nic: str
+        :param timeout: max time to wait in seconds, no limit if None
+        :type timeout: float
+        :param present: wait for removal of address if False
+        :type present: bool
+        :return: True if address appeared (or disappeared), False otherwise
+        :rtype: bool
+        """
+        def predicate(snapshot):
+            found = any(
+                a.ip == ip
+                for link in snapshot.interfaces.values()
+                if nic is None or link.name == nic
+                for a in link.addresses
+            )
+            return found == present
+        return self.wait_for(predicate, timeout)
+
+
+class LinkStats(object):
+    """
+    Traffic counters of all interfaces taken at one moment, stored in
+    single array of doubles, row per interface.
+
+    Two samples diff into per second rates:
+
+    before = h.network.link_stats()
+    ...
+    print h.network.link_stats().rates(before)
+    """
+    counters = (
+        'rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets',
+        'rx_errors', 'tx_errors', 'rx_dropped', 'tx_dropped',
+    )
+    _counter_index = dict((c, i) for i, c in enumerate(counters))
+
+    def __init__(self, uptime, interfaces, values, neighbors=None):
+        """
+        :param uptime: uptime of host when sample was taken
+        :type uptime: float
+        :param interfaces: interface names in order of rows
+        :type interfaces: list
+        :param values: counters, row per interface
+        :type values: array('d')
+        :param neighbors: neighbor table taken with sample
+        :type neighbors: list of Neighbor
+        """
+        super(LinkStats, self).__init__()
+        self.uptime = uptime
+        self.interfaces = tuple(interfaces)
+        self.values = values
+        self.neighbors = neighbors
+        self._rows = dict((n, i) for i, n in enumerate(self.interfaces))
+
+    @classmethod
+    def parse(cls, out, neighbors=None):
+        """
+        :param out: output of 'grep -r . /proc/uptime
+                    /sys/class/net/*/statistics'
+        :type out: str
+        :param neighbors: neighbor table taken with sample
+        :type neighbors: list of Neighbor
+        :return: link statistics
+        :rtype: LinkStats
+        """
+        uptime = None
+        names = list()
+        rows = dict()
+        width = len(cls.counters)
+        for line in out.splitlines():
+            path, _, value = line.partition(':')
+            if path == '/proc/uptime':
+                uptime = float(value.split()[0])
+                continue
+            parts = path.split('/')
+            # /sys/class/net/NAME/statistics/COUNTER
+            if len(parts) != 7 or parts[6] not in cls._counter_index:
+                continue
+            if parts[4] not in rows:
+                names.append(parts[4])
+                rows[parts[4]] = [0.0] * width
+            rows[parts[4]][cls._counter_index[parts[6]]] = float(value)
+        values = array('d')
+        for name in names:
+            values.extend(rows[name])
+        return cls(uptime, names, values, neighbors)
+
+    def get(self, nic, counter):
+        """
+        :param nic: interface name
+        :type nic: str
+        :param counter: name of counter, see LinkStats.counters
+        :type counter: str
+        :return: value of counter
+        :rtype: float
+        """
+        row = self._rows[nic]
+        return self.values[
+            row * len(self.counters) + self._counter_index[counter]
+        ]
+
+    def __getitem__(self, nic):
+        row = self._rows[nic] * len(self.counters)
+        return dict(
+            zip(self.counters, self.values[row:row + len(self.counters)])
+        )
+
+    def __contains__(self, nic):
+        return nic in self._rows
+
+    def rates(self, previous):
+        """
+        Per second rates of counters since previous sample, interfaces
+        missing in any of samples are skipped.
+
+        :param previous: older sample of same host
+        :type previous: LinkStats
+        :return: interface name to dict(counter name, rate)
+        :rtype: dict
+        """
+        elapsed = self.uptime - previous.uptime
+        if elapsed <= 0:
+            raise ValueError("Samples are not in chronological order")
+        width = len(self.counters)
+        result = dict()
+        for nic, row in six.iteritems(self._rows):
+            if nic not in previous:
+                continue
+            old = previous._rows[nic] * width
+            new = row * width
+            result[nic] = dict(
+                (
+                    counter,
+                    (self.values[new + i] - previous.values[old + i]) /
+                    elapsed,
+                )
+                for i, counter in enumerate(self.counters)
+            )
+        return result
+
+
 class Network(Service):
     def __init__(self, host):
         super(Network, self).__init__(host)
         self._m = _session(host)
         self._hnh = None
+        self._snapshot = None
+        self._bridges = None
+
+    @keep_session
+    def _cmd_sections(self, cmds):
+        """
+        Run several commands by single call and split their outputs
+
+        :param cmds: commands to run
+        :type cmds: list of lists
+        :return: outputs of commands
+        :rtype: list of strings
+        """
+        cmd = list()
+        for c in cmds:
+            if cmd:
+                cmd.extend([';', 'echo', SECTION_SEPARATOR, ';'])
+            cmd.extend(c)
+        rc, out, err = self._m.runCmd(cmd)
+        sections = out.split("%s\n" % SECTION_SEPARATOR)
+        if len(sections) != len(cmds):
+            raise Exception(
+                "Fail to run command %s: %s ; %s" % (" ".join(cmd), out, err)
+            )
+        return sections
+
+    @keep_session
+    def snapshot(self):
+        """
+        Collect interfaces, addresses and routes by single command.
+        The snapshot is kept, and find_* methods and list_bridges answer
+        from it until next change done via this instance.
+
+        :return: network snapshot
+        :rtype: NetworkSnapshot
+        """
+        sections = self._cmd_sections(
+            [
+                ['ip', '-d', '-j', 'addr', 'show'],
+                ['ip', '-j', 'route', 'show', 'table', 'all'],
+                ['ip', '-6', '-j', 'route', 'show', 'table', 'all'],
+            ]
+        )
+        try:
+            links = json.loads(sections[0])
+            routes = json.loads(sections[1])
+        except ValueError as ex:
+            raise Exception("Fail to parse network snapshot: %s" % ex)
+        try:
+            routes6 = json.loads(sections[2])
+        except ValueError:
+            self.logger.debug("IPv6 routes are not available")
+            routes6 = []
+        self._snapshot = NetworkSnapshot(links, routes, routes6)
+        self._bridges = None
+        return self._snapshot
+
+    def drop_snapshot(self):
+        """
+        Forget snapshot, find_* methods query host again
+        """
+        self._snapshot = None
+        self._bridges = None
+
+    def watch(self):
+        """
+        Create network watcher, see NetworkWatcher
+
+        :return: network watcher, not started yet
+        :rtype: instance of NetworkWatcher
+        """
+        return NetworkWatcher(self)
+
+    def transaction(self, rollback=True):
+        """
+        Start network transaction, see NetworkTransaction
+
+        :param rollback: revert applied operations on failure
+        :type rollback: bool
+        :return: network transaction
+        :rtype: instance of NetworkTransaction
+        """
+        return NetworkTransaction(self, rollback)
 
     @keep_session
     def _cmd(self, cmd):
@@ -147,8 +1296,7 @@ class Network(Service):
         if self._hnh is None:
             # NOTE: this strategy can be changed, but right now there are
             # no other Handlers
-            rc, out, err = self._m.runCmd(['which', 'hostnamectl'])
-            if not rc:
+            if self.host.os.has_binary('hostnamectl'):
                 self._hnh = HostnameCtlHandler(self._m)
             else:
                 self._hnh = HostnameHandler(self._m)
@@ -196,6 +1344,8 @@ class Network(Service):
         :return: default gateway
         :rtype: string
         """
+        if self._snapshot is not None:
+            return self._snapshot.default_gateway()
         out = self._cmd(["ip", "route"]).splitlines()
         for i in out:
             if re.search("default", i):
@@ -214,6 +1364,13 @@ class Network(Service):
         """
         ips = []
         ip_and_netmask = []
+        if self._snapshot is not None:
+            for address in self._snapshot.ipv4_addresses():
+                ips.append(address.ip)
+                ip_and_netmask.append(
+                    "%s/%s" % (address.ip, address.prefixlen)
+                )
+            return ips, ip_and_netmask
         out = self._cmd(["ip", "addr"]).splitlines()
         for i in out:
             cidr = re.findall(r'[0-9]+(?:\.[0-9]+){3}[/]+[0-9]{2}', i)
@@ -236,6 +1393,17 @@ class Network(Service):
         :return: ip
         :rtype: string
         """
+        if self._snapshot is not None:
+            route_table = self._snapshot.route_table
+            candidates = set(
+                [
+                    "%s/%s" % (address.ip, address.prefixlen)
+                    for address in route_table.connected_addresses(default_gw)
+                ]
+            )
+            for ip_mask in ips_and_mask:
+                if ip_mask in candidates:
+                    return ip_mask.split("/")[0]
         dgw = netaddr.IPAddress(default_gw)
         for ip_mask in ips_and_mask:
             ipnet = netaddr.IPNetwork(ip_mask)
@@ -244,6 +1412,23 @@ class Network(Service):
                 return ip
         return None
 
+    @keep_session
+    def find_source(self, dst, table='main'):
+        """
+        Find local IP and interface used to reach destination, it is answered
+        from network snapshot (taken when there is none yet).
+
+        :param dst: destination IP address
+        :type dst: string
+        :param table: routing table to look into
+        :type table: string
+        :return: tuple(local IP, interface), (None, None) if unreachable
+        :rtype: tuple
+        """
+        if self._snapshot is None:
+            self.snapshot()
+        return self._snapshot.route_table.source(dst, table)
+
     @keep_session
     def find_int_by_ip(self, ip):
         """
@@ -254,6 +1439,9 @@ class Network(Service):
         :return: interface
         :rtype: string
         """
+        if self._snapshot is not None:
+            address = self._snapshot.addresses.get(ip)
+            return address.interface if address else None
         out = self._cmd(["ip", "addr", "show", "to", ip])
         return out.split(":")[1].strip()
 
@@ -267,6 +1455,15 @@ class Network(Service):
         :return: IP or None
         :rtype: string or None
         """
+        if self._snapshot is not None:
+            try:
+                addresses = self._snapshot.interfaces[interface].addresses
+            except KeyError:
+                raise Exception("Interface %s doesn't exist" % interface)
+            for address in addresses:
+                if address.family == 'inet':
+                    return address.ip
+            return None
         out = self._cmd(["ip", "addr", "show", interface])
         match_ip = re.search(r'[0-9]+(?:\.[0-9]+){3}', out)
         if match_ip:
@@ -305,8 +1502,15 @@ class Network(Service):
         :rtype: list of strings
         """
         mac_list = list()
+        if self._snapshot is not None:
+            for interface in interfaces:
+                if interface not in self._snapshot.interfaces:
+                    return False
+                mac_list.append(self._snapshot.interfaces[interface].mac)
+            return mac_list
+        all_interfaces = self.all_interfaces()
         for interface in interfaces:
-            if interface not in self.all_interfaces():
+            if interface not in all_interfaces:
                 return False
             out = self._cmd(["ethtool", "-P", interface])
             mac = out.split(": ")[1]
@@ -329,6 +1533,67 @@ class Network(Service):
         return mgmt_int
 
     @keep_session
+    def _get_bridges(self):
+        """
+        Bridges read from sysfs by single command, and the same bridges
+        indexed by name. They are kept only while snapshot is kept, see
+        snapshot.
+
+        :return: tuple(list of bridges, name to bridge mapping)
+        :rtype: tuple(list, dict)
+        """
+        if self._bridges is not None:
+            return self._bridges
+        if self._snapshot is not None:
+            bridges = self._snapshot.list_bridges()
+            self._bridges = (
+                bridges, dict((b['name'], b) for b in bridges),
+            )
+            return self._bridges
+        if self.agent:
+            bridges = self._agent_bridges()
+        else:
+            script = (
+                "for b in /sys/class/net/*/bridge ; do "
+                "[ -d $b ] || continue ; d=${b%/bridge} ; "
+                "echo ${d##*/} $(cat $b/bridge_id) $(cat $b/stp_state) "
+                "$(ls $d/brif) ; done"
+            )
+            bridges = list()
+            for line in self._cmd(script.split()).splitlines():
+                line = line.split()
+                if len(line) < 3:
+                    continue
+                bridges.append(
+                    {
+                        'name': line[0],
+                        'id': line[1],
+                        'stp': 'no' if line[2] == '0' else 'yes',
+                        'interfaces': line[3:],
+                    }
+                )
+        return bridges, dict((b['name'], b) for b in bridges)
+
+    def _agent_bridges(self):
+        bridges = list()
+        for path in self.agent.glob('/sys/class/net/*/bridge'):
+            d = path[:-len('/bridge')]
+            files = self.agent.read_many(
+                ['%s/bridge_id' % path, '%s/stp_state' % path]
+            )
+            if files['%s/bridge_id' % path] is None:
+                continue
+            stp = (files['%s/stp_state' % path] or '0').strip()
+            bridges.append(
+                {
+                    'name': d.rsplit('/', 1)[1],
+                    'id': files['%s/bridge_id' % path].strip(),
+                    'stp': 'no' if stp == '0' else 'yes',
+                    'interfaces': self.agent.listdir('%s/brif' % d),
+                }
+            )
+        return bridges
+
     def list_bridges(self):
         """
         List of bridges on host
@@ -336,33 +1601,7 @@ class Network(Service):
         :return: list of bridges
         :rtype: list of dict(name, id, stp, interfaces)
         """
-        bridges = []
-        cmd = [
-            'brctl', 'show', '|',
-            'sed', '-e', '/^bridge name/ d',  # remove header
-            # deal with multiple interfaces
-            '-e', "'s/^\s\s*\(\S\S*\)$/CONT:\\1/I'"
-        ]
-        out = self._cmd(cmd).strip()
-        if not out:
-            # Empty list
-            return bridges
-        lines = out.splitlines()
-        for line in lines:
-            if line.startswith("CONT:"):
-                bridge = bridges[-1]
-                bridge['interfaces'].append(line[5:])
-            else:
-                line = line.split()
-                bridge = {}
-                bridge['name'] = line[0]
-                bridge['id'] = line[1]
-                bridge['stp'] = line[2]
-                bridge['interfaces'] = []
-                if len(line) == 4:
-                    bridge['interfaces'].append(line[3])
-                bridges.append(bridge)
-        return bridges
+        return list(self._get_bridges()[0])
 
     def get_bridge(self, name):
         """
@@ -371,13 +1610,7 @@ class Network(Service):
         :return: bridge
         :rtype: dict(name, id, stp, interfaces)
         """
-        bridges = [
-            bridge for bridge in self.list_bridges()
-            if bridge['name'] == name
-        ]
-        if bridges:
-            return bridges[0]
-        return None
+        return self._get_bridges()[1].get(name)
 
     @keep_session
     def add_bridge(self, bridge, network):
@@ -391,11 +1624,7 @@ class Network(Service):
         :return: True/False
         :rtype: bool
         """
-        cmd_add_br = ["brctl", "addbr", bridge]
-        cmd_add_if = ["brctl", "addif", bridge, network]
-        self._cmd(cmd_add_br)
-        self._cmd(cmd_add_if)
-        return True
+        return self.transaction().add_bridge(bridge, [network]).commit()
 
     @keep_session
     def delete_bridge(self, bridge):
@@ -407,11 +1636,7 @@ class Network(Service):
         :return: True/False
         :rtype: bool
         """
-        cmd_br_down = ["ip", "link", "set", "down", bridge]
-        cmd_del_br = ["brctl", "delbr", bridge]
-        self._cmd(cmd_br_down)
-        self._cmd(cmd_del_br)
-        return True
+        return self.transaction().delete_bridge(bridge).commit()
 
     @keep_session
     def get_info(self):
@@ -440,8 +1665,12 @@ class Network(Service):
                 bridge = self.get_bridge(interface)
                 if bridge is not None:
                     net_info["bridge"] = bridge['name']
-                    interface = self.find_int_by_bridge(bridge['name'])
-                    net_info["interface"] = interface
+                    # same as find_int_by_bridge, without reading
+                    # bridges again
+                    interfaces = bridge['interfaces']
+                    net_info["interface"] = (
+                        interfaces[0] if interfaces else None
+                    )
                 else:
                     net_info["bridge"] = "N/A"
                     net_info["interface"] = interface
@@ -459,13 +1688,49 @@ class Network(Service):
         :param ifcfg_path: Ifcfg files path
         :type ifcfg_path: str
         """
-        dst = os.path.join(ifcfg_path, "ifcfg-%s" % nic)
-        self.logger.info("Creating %s on %s", dst, self.host.fqdn)
-        with self.host.executor().session() as resource_session:
-            with resource_session.open_file(dst, 'w') as resource_file:
-                resource_file.write("DEVICE=%s\n" % nic)
-                for k, v in six.iteritems(params):
-                    resource_file.write("%s=%s\n" % (k, v))
+        self.write_ifcfg_files({nic: params}, ifcfg_path)
+
+    @staticmethod
+    def _render_ifcfg(nic, params):
+        lines = ["DEVICE=%s\n" % nic]
+        for k, v in six.iteritems(params):
+            lines.append("%s=%s\n" % (k, v))
+        return "".join(lines)
+
+    def write_ifcfg_files(self, ifcfgs, ifcfg_path=IFCFG_PATH):
+        """
+        Create ifcfg files over single session
+
+        Files are rendered locally, uploaded into temporary files and
+        then moved to their places by single command, so readers never
+        see partially written file.
+
+        :param ifcfgs: NIC name to ifcfg file content
+        :type ifcfgs: dict of dicts
+        :param ifcfg_path: Ifcfg files path
+        :type ifcfg_path: str
+        """
+        if not ifcfgs:
+            return
+        cmd = list()
+        executor = self.host.executor()
+        with executor.session() as resource_session:
+            for nic in sorted(ifcfgs):
+                dst = os.path.join(ifcfg_path, "ifcfg-%s" % nic)
+                tmp = os.path.join(ifcfg_path, ".ifcfg-%s.tmp" % nic)
+                self.logger.info("Creating %s on %s", dst, self.host.fqdn)
+                with resource_session.open_file(tmp, 'w') as resource_file:
+                    resource_file.write(
+                        self._render_ifcfg(nic, ifcfgs[nic])
+                    )
+                if cmd:
+                    cmd.append('&&')
+                cmd.extend(['mv', '-f', tmp, dst])
+            rc, _, err = resource_session.run_cmd(cmd)
+        if rc:
+            raise errors.CommandExecutionFailure(
+                executor=executor, cmd=cmd, rc=rc, err=err
+            )
 
     def delete_ifcfg_file(self, nic, ifcfg_path=IFCFG_PATH):
         """
@@ -478,10 +1743,25 @@ class Network(Service):
         :return: True/False
         :rtype: bool
         """
-        dst = os.path.join(ifcfg_path, "ifcfg-%s" % nic)
-        logger.info("Delete %s ", dst)
-        if not self.host.fs.remove(dst):
-            logger.error("Failed to delete %s", dst)
+        return self.delete_ifcfg_files([nic], ifcfg_path)
+
+    def delete_ifcfg_files(self, nics, ifcfg_path=IFCFG_PATH):
+        """
+        Delete ifcfg files by single command
+
+        :param nics: NIC names
+        :type nics: list
+        :param ifcfg_path: Ifcfg files path
+        :type ifcfg_path: str
+        :return: True/False
+        :rtype: bool
+        """
+        if not nics:
+            return True
+        dsts = [os.path.join(ifcfg_path, "ifcfg-%s" % nic) for nic in nics]
+        logger.info("Delete %s ", " ".join(dsts))
+        if not self.host.fs.remove(*dsts):
+            logger.error("Failed to delete %s", " ".join(dsts))
             return False
         return True
 
@@ -513,6 +1793,211 @@ class Network(Service):
             return False
         return True
 
+    @staticmethod
+    def _parse_ping_stats(dst, out):
+        counts = re.search(
+            r'(?P<tx>[0-9]+) packets transmitted, (?P<rx>[0-9]+) '
+            r'(packets )?received.*?(?P<loss>[0-9.]+)% packet loss',
+            out,
+        )
+        if not counts:
+            return None
+        rtt = re.search(
+            r'= (?P<min>[0-9.]+)/(?P<avg>[0-9.]+)/(?P<max>[0-9.]+)', out,
+        )
+        mtu = re.search(r'^MTU (?P<size>[0-9]+)$', out, re.MULTILINE)
+        return PingStats(
+            dst=dst,
+            transmitted=int(counts.group('tx')),
+            received=int(counts.group('rx')),
+            loss=float(counts.group('loss')),
+            min=float(rtt.group('min')) if rtt else None,
+            avg=float(rtt.group('avg')) if rtt else None,
+            max=float(rtt.group('max')) if rtt else None,
+            mtu=int(mtu.group('size')) + 28 if mtu else None,
+        )
+
+    @keep_session
+    def ping(self, dst, count=5, timeout=None, mtus=None):
+        """
+        Send ICMP to destination and collect statistics
+
+        When mtus are given, the largest of them which passes to
+        destination without fragmentation (ping -M do) is found
+        by the same command.
+
+        :param dst: IP/FQDN to send ICMP to
+        :type dst: str
+        :param count: number of ICMP packets to send
+        :type count: int
+        :param timeout: deadline of ping in seconds
+        :type timeout: int
+        :param mtus: MTU sizes to probe
+        :type mtus: list of int
+        :return: ping statistics, rtt in milliseconds
+        :rtype: PingStats
+        """
+        cmd = ["ping", "-c", str(count)]
+        if timeout is not None:
+            cmd.extend(_ping_timeout_args(timeout))
+        cmd.append(dst)
+        if mtus:
+            sizes = [str(mtu - 28) for mtu in sorted(mtus, reverse=True)]
+            script = (
+                "; for s in %s ; do ping -c 1 -w %s -M do -s $s %s "
+                ">/dev/null 2>&1 && break ; s= ; done ; "
+                "[ x$s != x ] && echo MTU $s"
+            ) % (" ".join(sizes), int(math.ceil(timeout or 5)), dst)
+            cmd.extend(script.split())
+        rc, out, err = self._m.runCmd(cmd)
+        stats = self._parse_ping_stats(dst, out)
+        if stats is None:
+            raise Exception(
+                "Fail to run command %s: %s ; %s" % (" ".join(cmd), out, err)
+            )
+        return stats
+
+    @staticmethod
+    def _parse_dd_stats(err):
+        match = re.search(
+            r'(?P<bytes>[0-9]+) bytes .*copied, (?P<seconds>[0-9.e+-]+) s',
+            err,
+        )
+        if not match:
+            return None
+        return int(match.group('bytes')), float(match.group('seconds'))
+
+    def _receive(self, port, timeout):
+        # NOTE: traditional netcat needs -p, BSD netcat refuses it
+        cmd = (
+            "timeout %(t)s nc -l -p %(p)s >/dev/null 2>&1 || "
+            "timeout %(t)s nc -l %(p)s >/dev/null"
+        ) % {'t': timeout, 'p': port}
+        return self.host.executor().run_cmd(cmd.split())
+
+    def _send(self, ip, port, count, timeout, retries=10):
+        cmd = [
+            "timeout", str(timeout), "bash", "-c",
+            "dd if=/dev/zero bs=1M count=%s >/dev/tcp/%s/%s" % (
+                count, ip, port,
+            ),
+        ]
+        executor = self.host.executor()
+        for _ in range(retries):
+            rc, _, err = executor.run_cmd(cmd)
+            if not rc or "refused" not in err:
+                break
+            # listener is not ready yet
+            time.sleep(0.5)
+        if rc:
+            raise errors.CommandExecutionFailure(
+                executor=executor, cmd=cmd, rc=rc, err=err
+            )
+        return err
+
+    def measure_throughput(
+        self, peer_host, bytes_=100 * 1024 ** 2, streams=1, port=5201,
+        timeout=60,
+    ):
+        """
+        Measure throughput from this host to peer host
+
+        Peer receives data by netcat, this host sends zeros by dd into
+        bash /dev/tcp, each stream over its own port.
+
+        :param peer_host: receiving host
+        :type peer_host: instance of Host
+        :param bytes_: amount of data sent by each stream
+        :type bytes_: int
+        :param streams: number of parallel streams
+        :type streams: int
+        :param port: port of first stream, next streams use following ports
+        :type port: int
+        :param timeout: max time of transfer in seconds
+        :type timeout: int
+        :return: result per stream, rate in MB/s
+        :rtype: list of Throughput
+        """
+        count = max(1, bytes_ // 1024 ** 2)
+        peer = peer_host.network
+
+        def stream(index):
+            received = list()
+            listener = threading.Thread(
+                target=lambda: received.append(
+                    peer._receive(port + index, timeout)
+                )
+            )
+            listener.daemon = True
+            listener.start()
+            try:
+                err = self._send(peer_host.ip, port + index, count, timeout)
+            finally:
+                listener.join()
+            stats = self._parse_dd_stats(err)
+            if stats is None:
+                raise Exception("Can not parse dd output: %s" % err)
+            sent, seconds = stats
+            rate = sent / seconds / 1000 ** 2 if seconds else None
+            return Throughput(index, sent, seconds, rate)
+
+        self.logger.info(
+            "Measure throughput to %s by %s streams", peer_host, streams,
+        )
+        return parallel_map(stream, range(streams))
+
+    @staticmethod
+    def _parse_neighbors(out):
+        try:
+            entries = json.loads(out)
+        except ValueError as ex:
+            raise Exception("Fail to parse neighbors: %s" % ex)
+        return [
+            Neighbor(
+                ip=entry.get('dst'),
+                dev=entry.get('dev'),
+                mac=entry.get('lladdr'),
+                state=tuple(entry.get('state', [])),
+            ) for entry in entries
+        ]
+
+    @keep_session
+    def link_stats(self, neighbors=False):
+        """
+        Read traffic counters of all interfaces by single command
+
+        :param neighbors: collect neighbor table by the same command
+        :type neighbors: bool
+        :return: link statistics
+        :rtype: LinkStats
+        """
+        cmd = [
+            'grep', '-rs', '.', '/proc/uptime', '/sys/class/net/*/statistics',
+        ]
+        if not neighbors and self.agent:
+            lines = list()
+            for path, content in self.agent.read_tree(cmd[3:]):
+                lines.extend(
+                    "%s:%s" % (path, line) for line in content.splitlines()
+                    if line
+                )
+            return LinkStats.parse("\n".join(lines))
+        if not neighbors:
+            return LinkStats.parse(self._cmd(cmd))
+        sections = self._cmd_sections([cmd, ['ip', '-j', 'neigh', 'show']])
+        return LinkStats.parse(
+            sections[0], self._parse_neighbors(sections[1]),
+        )
+
+    def neighbors(self):
+        """
+        Neighbor (ARP/NDP) table of host
+
+        :return: neighbors
+        :rtype: list of Neighbor
+        """
+        return self._parse_neighbors(self._cmd(['ip', '-j', 'neigh', 'show']))
+
     def set_mtu(self, nics, mtu="1500"):
         """
         Set MTU on NICs
@@ -524,11 +2009,7 @@ class Network(Service):
         :return: True or raise Exception
         :rtype: bool or Exception
         """
-        base_cmd = "ip link set mtu %s %s"
-        for nic in nics:
-            str_cmd = base_cmd % (mtu, nic)
-            self._cmd(shlex.split(str_cmd))
-        return True
+        return self.transaction().set_mtu(nics, mtu).commit()
 
     def delete_interface(self, interface):
         """
@@ -539,10 +2020,9 @@ class Network(Service):
         :return: True/False
         :rtype: bool
         """
-        cmd = "ip link del %s" % interface
         try:
             logger.info("Delete %s interface", interface)
-            self._cmd(shlex.split(cmd))
+            self.transaction().delete_link(interface).commit()
         except Exception as e:
             logger.error(e)
             return False
@@ -570,6 +2050,7 @@ class Network(Service):
         :rtype: bool
         """
         cmd = "ip link set up %s" % nic
+        self.drop_snapshot()
         rc, _, _ = self.host.run_command(shlex.split(cmd))
         return not bool(rc)
 
@@ -583,6 +2064,7 @@ class Network(Service):
         :rtype: bool
         """
         cmd = "ip link set down %s" % nic
+        self.drop_snapshot()
         rc, _, _ = self.host.run_command(shlex.split(cmd))
         return not bool(rc)
 
@@ -596,26 +2078,188 @@ class Network(Service):
             False otherwise
         :rtype: bool
         """
-        host_address = self.host.ip
-        # Leave it for future support of IPV6
-        ping_cmd = "ping6" if netaddr.valid_ipv6(self.host.ip) else "ping"
         self.logger.info(
             "Check if address is connective via ping in given timeout %s",
             ping_timeout
         )
-        command = [
-            ping_cmd,
-            "-c", "1",
-            "-w", str(ping_timeout),
-            host_address
-        ]
-        p = subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        out, _ = p.communicate()
-        if p.returncode:
-            self.logger.debug(
-                "Failed to ping address %s: %s", host_address, out
-            )
-            return False
-        return True
+        return ping_probe(self.host.ip, ping_timeout).reachable
+
+
+def find_sources(hosts, dst, table='main', workers=None):
+    """
+    Find local IP and interface used to reach destination on many hosts,
+    network snapshots of hosts are collected in parallel.
+
+    :param hosts: hosts to look at
+    :type hosts: list of Host
+    :param dst: destination IP address
+    :type dst: str
+    :param table: routing table to look into
+    :type table: str
+    :param workers: number of parallel connections, all hosts at once if None
+    :type workers: int
+    :return: list of tuple(local IP, interface) in order of hosts
+    :rtype: list
+    """
+    return parallel_map(
+        lambda h: h.network.find_source(dst, table), hosts, workers,
+    )
+
+
+def _parse_ping_rtt(out):
+    match = re.search(r'time[=<](?P<rtt>[0-9.]+) ?ms', out)
+    if match:
+        return float(match.group('rtt'))
+    return None
+
+
+def _ping_timeout_args(timeout):
+    """
+    ping accepts only whole seconds as deadline (-w), sub-second timeout
+    is passed as time to wait for reply (-W) in addition.
+
+    :param timeout: timeout in seconds
+    :type timeout: float
+    :return: arguments of ping
+    :rtype: list
+    """
+    args = ["-w", str(int(math.ceil(timeout)))]
+    if timeout < 1:
+        args.extend(["-W", str(timeout)])
+    return args
+
+
+def ping_probe(address, timeout=20.0):
+    """
+    Send single ICMP echo request to address from local machine
+
+    :param address: IP/FQDN to probe
+    :type address: str
+    :param timeout: time to wait for response
+    :type timeout: float
+    :return: result of probe, rtt in milliseconds
+    :rtype: Reachability
+    :raises: OSError when ping command is not available
+    """
+    # Leave it for future support of IPV6
+    ping_cmd = "ping6" if netaddr.valid_ipv6(address) else "ping"
+    command = [ping_cmd, "-c", "1"] + _ping_timeout_args(timeout)
+    command.append(address)
+    p = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    out, _ = p.communicate()
+    out = out.decode('utf-8', 'replace') if isinstance(out, bytes) else out
+    if p.returncode:
+        logger.debug("Failed to ping address %s: %s", address, out)
+        return Reachability(address, False, None, 'icmp')
+    return Reachability(address, True, _parse_ping_rtt(out), 'icmp')
+
+
+def tcp_probe(address, port=22, timeout=20.0):
+    """
+    Try to open TCP connection to address from local machine
+
+    :param address: IP/FQDN to probe
+    :type address: str
+    :param port: TCP port to connect to
+    :type port: int
+    :param timeout: time to wait for connection
+    :type timeout: float
+    :return: result of probe, rtt in milliseconds
+    :rtype: Reachability
+    """
+    start = time.time()
+    try:
+        sock = socket.create_connection((address, port), timeout)
+    except (socket.error, socket.timeout) as ex:
+        logger.debug("Failed to connect to %s:%s: %s", address, port, ex)
+        return Reachability(address, False, None, 'tcp')
+    rtt = (time.time() - start) * 1000
+    sock.close()
+    return Reachability(address, True, rtt, 'tcp')
+
+
+def sweep(targets, timeout=5.0, method='icmp', port=22, workers=64):
+    """
+    Probe reachability of many addresses concurrently from local machine
+
+    ICMP probes fall back to TCP connect probes when ping command
+    is not available.
+
+    :param targets: addresses or hosts to probe
+    :type targets: list of str or Host
+    :param timeout: deadline of each probe in seconds
+    :type timeout: float
+    :param method: 'icmp' or 'tcp'
+    :type method: str
+    :param port: TCP port used by 'tcp' probes
+    :type port: int
+    :param workers: number of probes running at once
+    :type workers: int
+    :return: results in order of targets
+    :rtype: list of Reachability
+    """
+    if method not in ('icmp', 'tcp'):
+        raise ValueError("Unknown probe method: %s" % method)
+    methods = [method]
+
+    def probe(target):
+        address = getattr(target, 'ip', target)
+        if methods[0] == 'icmp':
+            try:
+                return ping_probe(address, timeout)
+            except OSError as ex:
+                logger.warning(
+                    "Can not run ping, use TCP probes instead: %s", ex
+                )
+                methods[0] = 'tcp'
+        return tcp_probe(address, port, timeout)
+
+    return parallel_map(probe, targets, workers)
+
+
+def connectivity_matrix(hosts, count=3, timeout=None, mtus=None, max_probes=2):
+    """
+    Ping from each host to every other host in parallel
+
+    Probes are scheduled so that no host takes part in more than
+    max_probes probes at once, either as source or destination.
+
+    :param hosts: hosts to probe
+    :type hosts: list of Host
+    :param count: number of ICMP packets to send for each pair
+    :type count: int
+    :param timeout: deadline of each ping in seconds
+    :type timeout: int
+    :param mtus: MTU sizes to probe, see Network.ping
+    :type mtus: list of int
+    :param max_probes: max number of probes per host at once
+    :type max_probes: int
+    :return: N x N matrix of PingStats, None on diagonal
+    :rtype: list of lists
+    """
+    hosts = list(hosts)
+    locks = [threading.BoundedSemaphore(max_probes) for _ in hosts]
+    pairs = [
+        (src, dst)
+        for src in range(len(hosts))
+        for dst in range(len(hosts))
+        if src != dst
+    ]
+
+    def probe(pair):
+        # NOTE: always acquire in the same order to avoid deadlock
+        first, second = sorted(pair)
+        with locks[first]:
+            with locks[second]:
+                src, dst = pair
+                return hosts[src].network.ping(
+                    hosts[dst].ip, count, timeout, mtus,
+                )
+
+    results = parallel_map(probe, pairs, len(hosts) * max_probes)
+    matrix = [[None] * len(hosts) for _ in hosts]
+    for (src, dst), stats in zip(pairs, results):
+        matrix[src][dst] = stats
+    return matrix
@@ -1,6 +1,7 @@
 """
 This module provides interface to obtain operating system information.
 """
+import os
 from collections import namedtuple
 from rrmngmnt.service import Service
 from rrmngmnt import errors
@@ -13,10 +14,19 @@ class OperatingSystem(Service):
         self._release_str = None
         self._release_info = None
         self._dist = None
+        self._binaries = dict()
 
     def get_release_str(self):
         cmd = ['cat', '/etc/system-release']
         executor = self.host.executor()
+        if self.agent:
+            try:
+                return self.agent.read(cmd[1]).strip()
+            except OSError as ex:
+                raise errors.CommandExecutionFailure(
+                    executor, cmd, 1,
+                    "Failed to obtain release string: {0}".format(ex)
+                )
         rc, out, err = executor.run_cmd(cmd)
         if rc:
             raise errors.CommandExecutionFailure(
@@ -41,6 +51,14 @@ class OperatingSystem(Service):
         :raises: UnsupportedOperation
         """
         os_release_file = '/etc/os-release'
+        if self.agent:
+            out = self.agent.read_many([os_release_file])[os_release_file]
+            if out is None:
+                raise errors.UnsupportedOperation(
+                    self.host, "OperatingSystem.release_info",
+                    "Requires 'systemd' based operating system.",
+                )
+            return self._parse_release_info(out)
         cmd = ['cat', os_release_file]
         executor = self.host.executor()
         rc, out, err = executor.run_cmd(cmd)
@@ -60,6 +78,10 @@ class OperatingSystem(Service):
                 "Failed to obtain release info, system doesn't follow "
                 "systemd standards: {0}".format(err)
             )
+        return self._parse_release_info(out)
+
+    @staticmethod
+    def _parse_release_info(out):
         release_info = dict()
         for line in out.strip().splitlines():
             values = line.split("=", 1)
@@ -107,3 +129,69 @@ class OperatingSystem(Service):
         if not self._dist:
             self._dist = self.get_distribution()
         return self._dist
+
+    def find_binaries(self, binaries, timeout=None):
+        """
+        Find out which of given binaries are available on host.
+
+        Binaries which were not looked up yet are checked by single
+        command ('command -v' per binary), results are cached until
+        forget_binaries is called.
+
+        :param binaries: names of binaries
+        :type binaries: list
+        :param timeout: timeout of lookup command
+        :type timeout: float
+        :return: names of available binaries
+        :rtype: set
+        :raises: CommandExecutionFailure
+        """
+        missing = list()
+        for binary in binaries:
+            if binary not in self._binaries and binary not in missing:
+                missing.append(binary)
+        if missing and self.agent:
+            found = self.agent.which(missing)
+            for binary in missing:
+                self._binaries[binary] = binary in found
+        elif missing:
+            cmd = ['command', '-v'] + missing
+            if len(missing) > 1:
+                # POSIX 'command -v' takes single name, bash only looks up
+                # all of them
+                cmd = ['for', 'b', 'in'] + missing + [
+                    ';', 'do', 'command', '-v', '$b', ';', 'done',
+                ]
+            executor = self.host.executor()
+            rc, out, err = executor.run_cmd(cmd, io_timeout=timeout)
+            if rc and err.strip():
+                raise errors.CommandExecutionFailure(
+                    executor, cmd, rc,
+                    "Failed to look up binaries: {0}".format(err)
+                )
+            found = set(
+                [os.path.basename(line.strip()) for line in out.splitlines()]
+            )
+            for binary in missing:
+                self._binaries[binary] = binary in found
+        return set([binary for binary in binaries if self._binaries[binary]])
+
+    def has_binary(self, binary, timeout=None):
+        """
+        Check if binary is available on host, see find_binaries.
+
+        :param binary: name of binary
+        :type binary: str
+        :param timeout: timeout of lookup command
+        :type timeout: float
+        :return: True if binary is available, False otherwise
+        :rtype: bool
+        """
+        return binary in self.find_binaries([binary], timeout)
+
+    def forget_binaries(self):
+        """
+        Drop cached results of find_binaries, it should be called whenever
+        set of installed binaries could change.
+        """
+        self._binaries.clear()
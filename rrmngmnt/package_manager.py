@@ -1,8 +1,24 @@
+import hashlib
+import os
+import six
+from collections import namedtuple
+
 from rrmngmnt import errors
-from rrmngmnt.service import Service
+from rrmngmnt import versions
+from rrmngmnt.common import parallel_map, trusted_file_check, upload_file
+from rrmngmnt.service import Service, SystemService
 
 PIPE_GREP_COMMAND_D = ('|', 'grep', '-E')
 PIPE_XARGS_COMMAND_D = ('|', 'xargs')
+RPM_QUERY_FORMAT = (
+    '--queryformat',
+    "'%{NAME}\\t%{EPOCH}\\t%{VERSION}\\t%{RELEASE}\\t%{ARCH}\\n'",
+)
+
+Package = namedtuple(
+    'Package', ['name', 'epoch', 'version', 'release', 'arch'],
+)
+PackageDrift = namedtuple('PackageDrift', ['missing', 'extra', 'different'])
 
 
 class PackageManager(Service):
@@ -14,17 +30,138 @@ class PackageManager(Service):
     install_command_d = None
     remove_command_d = None
     update_command_d = None
+    # commands printing installed packages as tab separated fields
+    # of Package, all of them, or the given ones
+    index_command_d = None
+    query_command_d = None
+    index_ttl = 300
+    local_install_command_d = None
+    # used only when it is private directory of executor user, see
+    # _staging_command
+    staging_dir = '/var/tmp/rrmngmnt-packages'
+    version_scheme = versions.RPM
 
     @classmethod
     def is_available(cls, h):
         if not cls.binary:
             raise NotImplementedError("Name of binary file is not available.")
-        rc, _, _ = h.executor().run_cmd(
-            [
-                'which', cls.binary,
-            ]
-        )
-        return not rc
+        return h.os.has_binary(cls.binary)
+
+    def _packages_changed(self):
+        """
+        Drop host caches which depend on installed packages, whole index
+        is dropped since transaction can install or remove dependencies
+        as well.
+        """
+        self.host.os.forget_binaries()
+        SystemService.invalidate_index(self.host)
+        if self.index_command_d:
+            self.host._package_indexes.invalidate(self.index_command_d)
+
+    def _not_installed(self, packages):
+        """
+        Find packages which are not in index. Packages which miss in
+        cached index are queried again by single command, they could be
+        installed after the index was fetched (e.g. via run_command).
+
+        :param packages: names of packages, see find
+        :type packages: list
+        :return: packages which are not installed
+        :rtype: list
+        """
+        index = self.host._package_indexes.get(self.index_command_d)
+        missing = [p for p in packages if not self.find(p)]
+        if not missing or index is None:
+            return missing
+        # NOTE: packages which are not installed are not printed
+        cmd = list(self.query_command_d) + missing
+        _, out, _ = self.host.executor().run_cmd(cmd)
+        index.update(self._parse_index(out))
+        return [p for p in missing if not self.find(p)]
+
+    @staticmethod
+    def _parse_package(fields):
+        """
+        :param fields: tab separated fields printed by index command
+        :type fields: list
+        :return: installed package, or None
+        :rtype: Package
+        """
+        if len(fields) != len(Package._fields):
+            return None
+        if fields[1] in ('(none)', ''):
+            fields[1] = None
+        return Package(*fields)
+
+    @classmethod
+    def _parse_index(cls, out):
+        index = dict()
+        for line in out.splitlines():
+            package = cls._parse_package(line.split('\t'))
+            if package is None:
+                continue
+            index[package.name] = index.get(package.name, ()) + (package,)
+        return index
+
+    def get_index(self):
+        """
+        Index of installed packages, it is collected by single command
+        and kept on host for index_ttl seconds.
+
+        :return: package name to installed packages of that name
+        :rtype: dict(str, tuple of Package)
+        :raise: NotImplementedError, CommandExecutionFailure
+        """
+        if not self.index_command_d:
+            raise NotImplementedError("There is no 'index' command defined.")
+        index = self.host._package_indexes.get(self.index_command_d)
+        if index is None:
+            cmd = list(self.index_command_d)
+            executor = self.host.executor()
+            self.logger.debug(
+                "Getting index of installed packages from host %s", self.host
+            )
+            rc, out, err = executor.run_cmd(cmd)
+            if rc:
+                raise errors.CommandExecutionFailure(
+                    cmd=cmd, executor=executor, rc=rc, err=err
+                )
+            index = self._parse_index(out)
+            self.host._package_indexes.set(self.index_command_d, index)
+        return index
+
+    def find(self, package):
+        """
+        Find installed packages in index
+
+        :param package: name of package, it can be followed by version,
+                        release and arch like name-version-release.arch
+        :type package: str
+        :return: installed packages which match
+        :rtype: list of Package
+        """
+        index = self.get_index()
+        if package in index:
+            return list(index[package])
+        candidates = [(package, None)]
+        if '.' in package:
+            name, arch = package.rsplit('.', 1)
+            candidates.append((name, arch))
+        found = list()
+        for name, arch in candidates:
+            parts = name.split('-')
+            for i in range(len(parts) - 1, max(len(parts) - 3, 0), -1):
+                tail = '-'.join(parts[i:])
+                for p in index.get('-'.join(parts[:i]), ()):
+                    if arch is not None and p.arch != arch:
+                        continue
+                    if tail in (p.version, "%s-%s" % (p.version, p.release)):
+                        found.append(p)
+            if arch is not None:
+                found.extend(
+                    p for p in index.get(name, ()) if p.arch == arch
+                )
+        return found
 
     def _run_command_on_host(self, cmd):
         """
@@ -47,6 +184,46 @@ class PackageManager(Service):
             return False
         return True
 
+    def installed_version(self, name):
+        """
+        Newest installed version of package, from index
+
+        :param name: name of package
+        :type name: str
+        :return: epoch, version, release or None if it is not installed
+        :rtype: tuple
+        """
+        evrs = [
+            (p.epoch, p.version, p.release)
+            for p in self.get_index().get(name, ())
+        ]
+        if not evrs:
+            return None
+        newest = evrs[0]
+        for evr in evrs[1:]:
+            if versions.compare_evr(evr, newest, self.version_scheme) > 0:
+                newest = evr
+        return newest
+
+    def compare_version(self, name, version):
+        """
+        Compare installed version of package with given version
+
+        :param name: name of package
+        :type name: str
+        :param version: [epoch:]version[-release]
+        :type version: str
+        :return: 1 if installed is newer, 0 if equal, -1 if it is older,
+                 None if package is not installed
+        :rtype: int
+        """
+        installed = self.installed_version(name)
+        if installed is None:
+            return None
+        return versions.compare_evr(
+            installed, versions.parse_evr(version), self.version_scheme,
+        )
+
     def exist(self, package):
         """
         Check if package exist on host
@@ -57,6 +234,8 @@ class PackageManager(Service):
         :rtype: bool
         :raise: NotImplementedError
         """
+        if self.index_command_d:
+            return not self._not_installed([package])
         if not self.exist_command_d:
             raise NotImplementedError("There is no 'exist' command defined.")
         cmd = list(self.exist_command_d)
@@ -93,41 +272,75 @@ class PackageManager(Service):
             cmd=cmd, executor=self.host.executor, rc=rc, err=err
         )
 
-    def install(self, package):
+    def _outcomes(self, packages, installed, succeeded):
+        """
+        Find out which of packages are (not) installed after transaction,
+        index has to be dropped already. Failed transaction can apply part
+        of it, successful one can skip unknown names (yum with
+        skip_missing_names_on_install).
         """
-        Install package on host
+        if self.index_command_d and (succeeded or len(packages) > 1):
+            return dict(
+                (p, bool(self.find(p)) == installed) for p in packages
+            )
+        return dict((p, succeeded) for p in packages)
 
-        :param package: name of package
-        :type package: str
-        :return: True, if package installation success, otherwise False
-        :rtype: bool
+    def install(self, package):
+        """
+        Install package(s) on host, packages which are not installed yet
+        are installed by single transaction
+
+        :param package: name of package, or list of names
+        :type package: str or list
+        :return: True, if package installation success, otherwise False,
+                 dict(name, bool) when list of packages was given
+        :rtype: bool or dict
         :raise: NotImplementedError
         """
         if not self.install_command_d:
             raise NotImplementedError("There is no 'install' command defined.")
-        cmd = list(self.install_command_d)
-        cmd.append(package)
-        if not self.exist(package):
-            self.logger.info(
-                "Install package %s on host %s", package, self.host
-            )
-            return self._run_command_on_host(cmd)
+        if isinstance(package, six.string_types):
+            return self.install([package])[package]
+        result = dict()
+        names = list()
+        for name in package:
+            if name not in names:
+                names.append(name)
+        if self.index_command_d:
+            missing = self._not_installed(names)
+        else:
+            missing = [name for name in names if not self.exist(name)]
+        for name in names:
+            if name not in missing:
+                self.logger.info(
+                    "Package %s already exist on host %s", name, self.host
+                )
+                result[name] = True
+        if not missing:
+            return result
+        cmd = list(self.install_command_d) + missing
         self.logger.info(
-            "Package %s already exist on host %s", package, self.host
+            "Install packages %s on host %s", missing, self.host
         )
-        return True
+        succeeded = self._run_command_on_host(cmd)
+        self._packages_changed()
+        result.update(self._outcomes(missing, True, succeeded))
+        return result
 
     def remove(self, package, pattern=False):
         """
-        Remove package from host, or packages which match pattern if pattern
-        is set to True
-
-        :param package: name of package or extended regular expression pattern
-                        take a look at -E option in man grep
-        :type package: str
+        Remove package(s) from host, or packages which match pattern if
+        pattern is set to True. Installed packages are removed by single
+        transaction.
+
+        :param package: name of package, list of names or extended regular
+                        expression pattern take a look at -E option in
+                        man grep
+        :type package: str or list
         :param pattern: If True package name is pattern
-        :return: True, if package(s) removal success, otherwise False
-        :rtype: bool
+        :return: True, if package(s) removal success, otherwise False,
+                 dict(name, bool) when list of packages was given
+        :rtype: bool or dict
         :raise: NotImplementedError
         """
         if not self.remove_command_d:
@@ -138,7 +351,6 @@ class PackageManager(Service):
             )
 
         cmd = list(self.remove_command_d)
-        package_exists = False
         if pattern:
             self.logger.info(
                 "Erase packages which match pattern %s on host %s", package,
@@ -153,20 +365,136 @@ class PackageManager(Service):
             )
             if not self._run_command_on_host(remove_pattern_command):
                 return False
+            self._packages_changed()
             return True
 
-        package_exists = self.exist(package)
-        if not package_exists:
-            self.logger.info(
-                "Package %s does not exist on host %s", package, self.host
-            )
-            return True
+        if isinstance(package, six.string_types):
+            return self.remove([package])[package]
+        result = dict()
+        names = list()
+        for name in package:
+            if name not in names:
+                names.append(name)
+        if self.index_command_d:
+            absent = self._not_installed(names)
+        else:
+            absent = [name for name in names if not self.exist(name)]
+        present = list()
+        for name in names:
+            if name in absent:
+                self.logger.info(
+                    "Package %s does not exist on host %s", name, self.host
+                )
+                result[name] = True
+            else:
+                present.append(name)
+        if not present:
+            return result
 
         self.logger.info(
-            "Erase package %s on host %s", package, self.host
+            "Erase packages %s on host %s", present, self.host
         )
-        cmd.append(package)
-        return self._run_command_on_host(cmd)
+        cmd.extend(present)
+        succeeded = self._run_command_on_host(cmd)
+        # NOTE: removal can take dependent packages as well
+        self._packages_changed()
+        if succeeded:
+            result.update((name, True) for name in present)
+        else:
+            result.update(self._outcomes(present, False, succeeded))
+        return result
+
+    def _staging_command(self, names):
+        """
+        Command which prints staging directory and checksums of packages
+        staged there already. staging_dir lies in world-writable directory,
+        so it is used only when it is directory owned by executor user,
+        private temporary directory is created otherwise.
+
+        :param names: file names of packages
+        :type names: list
+        :return: command
+        :rtype: list
+        """
+        script = (
+            "mkdir -p -m 700 {d} ; [ -d {d} ] && [ ! -h {d} ] && "
+            "[ -O {d} ] && chmod 700 {d} && d={d} || d=$(mktemp -d) || "
+            "exit 1 ; echo $d ; cd $d && sha256sum"
+        ).format(d=self.staging_dir)
+        return script.split() + list(names)
+
+    def _install_local(self, files):
+        """
+        :param files: packages to install, see _read_local_packages
+        :type files: list of tuple(name, content, sha256)
+        :raise: NotImplementedError, CommandExecutionFailure
+        """
+        if not self.local_install_command_d:
+            raise NotImplementedError(
+                "There is no 'local install' command defined."
+            )
+        executor = self.host.executor()
+        with executor.session() as session:
+            cmd = self._staging_command([f[0] for f in files])
+            rc, out, err = session.run_cmd(cmd)
+            lines = out.splitlines()
+            if not lines or not lines[0].startswith('/'):
+                raise errors.CommandExecutionFailure(
+                    executor, cmd, rc or 1,
+                    "Failed to prepare staging directory: {0}".format(err)
+                )
+            staging_dir = lines[0].strip()
+            staged = dict()
+            for line in lines[1:]:
+                fields = line.split(None, 1)
+                if len(fields) == 2:
+                    staged[fields[1]] = fields[0]
+            remote = list()
+            checks = list()
+            for name, content, checksum in files:
+                path = os.path.join(staging_dir, name)
+                remote.append(path)
+                checks.append(trusted_file_check(path, checksum))
+                if staged.get(name) == checksum:
+                    self.logger.debug(
+                        "Package %s is already staged on host %s",
+                        name, self.host,
+                    )
+                    continue
+                upload_file(executor, session, path, content)
+            # packages are verified by the same command which installs them
+            cmd = " && ".join(checks).split() + ['&&'] + list(
+                self.local_install_command_d
+            ) + remote
+            self.logger.info(
+                "Install local packages %s on host %s",
+                [f[0] for f in files], self.host,
+            )
+            rc, out, err = session.run_cmd(cmd)
+            if staging_dir != self.staging_dir:
+                session.run_cmd(['rm', '-rf', staging_dir])
+        if rc:
+            self.logger.error(
+                "Failed to execute command '%s' on host %s; out: %s; err: %s",
+                " ".join(cmd), self.host, out, err
+            )
+            return False
+        self._packages_changed()
+        return True
+
+    def install_local(self, paths):
+        """
+        Install packages from local files, files are uploaded over single
+        session unless they are staged on host already, and installed by
+        single transaction.
+
+        :param paths: local paths to .rpm or .deb files
+        :type paths: list
+        :return: True, if installation success, otherwise False
+        :rtype: bool
+        :raise: NotImplementedError
+        """
+        return self._install_local(_read_local_packages(paths))
 
     def update(self, packages=None):
         """
@@ -190,7 +518,10 @@ class PackageManager(Service):
             )
         else:
             self.logger.info("Updating system on host %s", self.host)
-        return self._run_command_on_host(cmd)
+        if not self._run_command_on_host(cmd):
+            return False
+        self._packages_changed()
+        return True
 
 
 class YumPackageManager(PackageManager):
@@ -206,6 +537,9 @@ class YumPackageManager(PackageManager):
     install_command_d = (binary, 'install', '-y')
     remove_command_d = (binary, 'remove', '-y')
     update_command_d = (binary, 'update', '-y')
+    local_install_command_d = (binary, 'install', '-y')
+    index_command_d = ('rpm', '-qa') + RPM_QUERY_FORMAT
+    query_command_d = ('rpm', '-q') + RPM_QUERY_FORMAT
 
 
 class DnfPackageManager(PackageManager):
@@ -222,6 +556,9 @@ class DnfPackageManager(PackageManager):
     install_command_d = (binary, 'install', '-y')
     remove_command_d = (binary, 'remove', '-y')
     update_command_d = (binary, 'update', '-y')
+    local_install_command_d = (binary, 'install', '-y')
+    index_command_d = ('rpm', '-qa') + RPM_QUERY_FORMAT
+    query_command_d = ('rpm', '-q') + RPM_QUERY_FORMAT
 
 
 class RPMPackageManager(PackageManager):
@@ -234,6 +571,9 @@ class RPMPackageManager(PackageManager):
     install_command_d = (binary, '-i')
     remove_command_d = (binary, '-e')
     update_command_d = (binary, '-U')
+    local_install_command_d = (binary, '-U', '--replacepkgs')
+    index_command_d = ('rpm', '-qa') + RPM_QUERY_FORMAT
+    query_command_d = ('rpm', '-q') + RPM_QUERY_FORMAT
 
 
 class APTPackageManager(PackageManager):
@@ -243,14 +583,35 @@ class APTPackageManager(PackageManager):
     binary = 'apt'
     binary_base = 'dpkg'
     list_command_d = (
-        binary_base, '--get-selections', '|', 'grep', 'install', '|', 'cut',
-        '-f1'
+        binary_base, '--get-selections', '|', 'grep', '-w', 'install', '|',
+        'cut', '-f1'
     )
-    # FIXME: Once apt will return correct return codes fix this
-    exist_command_d = (binary, 'list', '--installed', '|', 'grep')
+    exist_command_d = ('dpkg-query', '-W')
     install_command_d = (binary, 'install', '-y')
     remove_command_d = (binary, 'remove', '-y')
     update_command_d = (binary, 'update', '-y')
+    local_install_command_d = (binary_base, '-i')
+    version_scheme = versions.DEB
+    index_command_d = (
+        'dpkg-query', '-W', '-f',
+        "'${Package}\\t${Version}\\t${Architecture}\\t"
+        "${db:Status-Abbrev}\\n'",
+    )
+    query_command_d = index_command_d
+
+    @staticmethod
+    def _parse_package(fields):
+        # name, [epoch:]upstream[-revision], arch, status
+        if len(fields) != 4 or not fields[3].startswith('ii'):
+            return None
+        name, version, arch, _ = fields
+        epoch = None
+        if ':' in version:
+            epoch, version = version.split(':', 1)
+        release = ''
+        if '-' in version:
+            version, release = version.rsplit('-', 1)
+        return Package(name, epoch, version, release, arch)
 
 
 class PackageManagerProxy(Service):
@@ -268,6 +629,7 @@ class PackageManagerProxy(Service):
     def __init__(self, h):
         super(PackageManagerProxy, self).__init__(h)
         self._manager = None
+        self._manager_name = None
 
     def __call__(self, name):
         """
@@ -280,21 +642,44 @@ class PackageManagerProxy(Service):
         except KeyError:
             raise ValueError("Unknown package manager: %s" % name)
 
-    def __getattr__(self, name):
-        """
-        This method let you use implicit package manager.
+    # (ID, VERSION_ID) of os-release -> name of detected package manager
+    _shared = dict()
 
-        host.package_manager.install(...)
+    def _os_facts(self):
+        # NOTE: facts are used only when they were collected already,
+        # it would cost another round trip otherwise
+        info = self.host.os._release_info
+        if info and info.get('ID') and info.get('VERSION_ID'):
+            return info['ID'], info['VERSION_ID']
+        return None
+
+    def detect(self, share=False):
         """
-        if self._manager is None:
+        Determine package manager of host, all candidates are looked up
+        by single call.
+
+        :param share: use package manager detected on other host with
+                      same operating system (ID and VERSION_ID of
+                      os-release), when facts of host are known already
+        :type share: bool
+        :return: name of package manager
+        :rtype: str
+        :raises: RuntimeError
+        """
+        if self._manager is not None:
+            return self._manager_name
+        facts = self._os_facts()
+        name = self._shared.get(facts) if share and facts else None
+        if name is None:
+            # look up all candidates by single call, is_available
+            # answers from the cache then
+            self.host.os.find_binaries(
+                [self.managers[name_manager].binary
+                 for name_manager in self.order]
+            )
             for name_manager in self.order:
-                manager = self.managers[name_manager]
-                if manager.is_available(self.host):
-                    self.logger.info(
-                        "Using %s package manager for %s",
-                        name_manager, self.host,
-                    )
-                    self._manager = manager(self.host)
+                if self.managers[name_manager].is_available(self.host):
+                    name = name_manager
                     break
             else:
                 self.logger.error(
@@ -304,4 +689,189 @@ class PackageManagerProxy(Service):
                 raise RuntimeError(
                     "Can not determine package manager for %s" % self.host
                 )
+            if facts:
+                self._shared[facts] = name
+        self.logger.info("Using %s package manager for %s", name, self.host)
+        self._manager = self.managers[name](self.host)
+        self._manager_name = name
+        return name
+
+    def __getattr__(self, name):
+        """
+        This method let you use implicit package manager.
+
+        host.package_manager.install(...)
+        """
+        if self._manager is None:
+            self.detect()
         return getattr(self._manager, name)
+
+
+def _read_local_packages(paths):
+    files = list()
+    for path in paths:
+        with open(path, 'rb') as fh:
+            content = fh.read()
+        files.append(
+            (
+                os.path.basename(path), content,
+                hashlib.sha256(content).hexdigest(),
+            )
+        )
+    return files
+
+
+def install_local_packages(hosts, paths, workers=None):
+    """
+    Install packages from local files on many hosts in parallel, files
+    are read once, see PackageManager.install_local
+
+    :param hosts: hosts to install packages on
+    :type hosts: list of Host
+    :param paths: local paths to .rpm or .deb files
+    :type paths: list
+    :param workers: number of parallel connections, all hosts at once if None
+    :type workers: int
+    :return: results in order of hosts
+    :rtype: list of bool
+    """
+    files = _read_local_packages(paths)
+    return parallel_map(
+        lambda h: h.package_manager._install_local(files), hosts, workers,
+    )
+
+
+def compare_package_versions(hosts, name, version, workers=None):
+    """
+    Compare installed version of package on many hosts with given
+    version, indexes of installed packages are collected in parallel
+    and compared locally in one pass.
+
+    :param hosts: hosts to look at
+    :type hosts: list of Host
+    :param name: name of package
+    :type name: str
+    :param version: [epoch:]version[-release]
+    :type version: str
+    :param workers: number of parallel connections, all hosts at once if None
+    :type workers: int
+    :return: results in order of hosts, see PackageManager.compare_version
+    :rtype: list
+    """
+    hosts = list(hosts)
+    installed = parallel_map(
+        lambda h: (
+            h.package_manager.version_scheme,
+            h.package_manager.installed_version(name),
+        ),
+        hosts, workers,
+    )
+    results = [None] * len(hosts)
+    for scheme in set(s for s, _ in installed):
+        results_ = versions.compare_many(
+            version,
+            [
+                (i, evr) for i, (s, evr) in enumerate(installed)
+                if s == scheme and evr is not None
+            ],
+            scheme,
+        )
+        for i, result in six.iteritems(results_):
+            results[i] = result
+    return results
+
+
+def detect_package_managers(hosts, share=False, workers=None):
+    """
+    Determine package managers of many hosts in parallel, see
+    PackageManagerProxy.detect
+
+    :param hosts: hosts to look at
+    :type hosts: list of Host
+    :param share: share result among hosts with same operating system
+    :type share: bool
+    :param workers: number of parallel connections, all hosts at once if None
+    :type workers: int
+    :return: names of package managers in order of hosts
+    :rtype: list of str
+    """
+    return parallel_map(
+        lambda h: h.package_manager.detect(share), hosts, workers,
+    )
+
+
+def _versions(packages):
+    return tuple(
+        sorted(
+            "%s%s-%s.%s" % (
+                "%s:" % p.epoch if p.epoch else "", p.version, p.release,
+                p.arch,
+            ) for p in packages
+        )
+    )
+
+
+def compare_packages(hosts, reference=None, workers=None):
+    """
+    Compare installed packages of hosts, indexes of installed packages
+    are collected in parallel.
+
+    Each host is compared with reference, which is made of packages
+    installed on majority of hosts in their most common versions,
+    or taken from given reference host.
+
+    :param hosts: hosts to compare
+    :type hosts: list of Host
+    :param reference: host to compare with, majority of hosts if None
+    :type reference: instance of Host
+    :param workers: number of parallel connections, all hosts at once if None
+    :type workers: int
+    :return: drift of hosts in order of hosts, missing and extra are sets
+             of package names, different maps package name to tuple(host
+             versions, reference versions)
+    :rtype: list of PackageDrift
+    """
+    hosts = list(hosts)
+    indexes = parallel_map(
+        lambda h: h.package_manager.get_index(), hosts, workers,
+    )
+    host_versions_list = [
+        dict((name, _versions(p)) for name, p in six.iteritems(index))
+        for index in indexes
+    ]
+    if reference is not None:
+        expected = dict(
+            (name, _versions(p))
+            for name, p in six.iteritems(reference.package_manager.get_index())
+        )
+    else:
+        names = dict()
+        items = dict()
+        for host_versions in host_versions_list:
+            for item in six.iteritems(host_versions):
+                names[item[0]] = names.get(item[0], 0) + 1
+                items[item] = items.get(item, 0) + 1
+        expected = dict()
+        counts = dict()
+        for (name, version), count in six.iteritems(items):
+            if names[name] * 2 <= len(hosts):
+                continue
+            if count > counts.get(name, 0):
+                expected[name] = version
+                counts[name] = count
+    expected_names = set(expected)
+    result = list()
+    for host_versions in host_versions_list:
+        host_names = set(host_versions)
+        result.append(
+            PackageDrift(
+                missing=expected_names - host_names,
+                extra=host_names - expected_names,
+                different=dict(
+                    (name, (host_versions[name], expected[name]))
+                    for name in host_names & expected_names
+                    if host_versions[name] != expected[name]
+                ),
+            )
+        )
+    return result
@@ -0,0 +1,187 @@
+"""
+This module is uploaded to host and executed there by rrmngmnt.agent.Agent,
+so it must not depend on anything but python standard library.
+
+It reads requests from stdin and writes responses to stdout, every message
+is JSON document prefixed by its length (4 bytes, big endian).
+
+  request: {"id": 1, "method": "stat", "params": ["/etc/hosts"]}
+  response: {"id": 1, "result": [...]}
+        or: {"id": 1, "error": {"type": "OSError", "errno": 2, ...}}
+
+Once started, it sends response with id 0 holding its pid.
+"""
+import glob
+import json
+import os
+import stat
+import struct
+import sys
+
+HEADER = struct.Struct('>I')
+
+
+def _stat(st):
+    return [
+        st.st_mode, st.st_ino, st.st_dev, st.st_nlink, st.st_uid,
+        st.st_gid, st.st_size, st.st_atime, st.st_mtime, st.st_ctime,
+    ]
+
+
+def _read(path):
+    with open(path, 'rb') as fh:
+        return fh.read().decode('utf-8', 'replace')
+
+
+def _expand(patterns):
+    paths = list()
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+class Methods(object):
+    """
+    Methods which can be called by requests
+    """
+    def ping(self):
+        return True
+
+    def stat(self, path):
+        return _stat(os.stat(path))
+
+    def lstat(self, path):
+        return _stat(os.lstat(path))
+
+    def stat_many(self, paths):
+        """
+        Missing or inaccessible paths are mapped to None
+        """
+        results = dict()
+        for path in paths:
+            try:
+                results[path] = _stat(os.stat(path))
+            except OSError:
+                results[path] = None
+        return results
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def listdir(self, path):
+        return sorted(os.listdir(path))
+
+    def walk(self, top):
+        return [list(entry) for entry in os.walk(top)]
+
+    def glob(self, pattern):
+        return sorted(glob.glob(pattern))
+
+    def read(self, path):
+        return _read(path)
+
+    def read_many(self, paths):
+        """
+        Missing or unreadable files are mapped to None
+        """
+        results = dict()
+        for path in paths:
+            try:
+                results[path] = _read(path)
+            except (IOError, OSError):
+                results[path] = None
+        return results
+
+    def read_tree(self, patterns):
+        """
+        Read all readable regular files matching patterns, directories
+        are walked recursively (like 'grep -rs').
+        """
+        paths = list()
+        for path in _expand(patterns):
+            if not os.path.isdir(path):
+                paths.append(path)
+                continue
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                paths.extend(
+                    os.path.join(dirpath, f) for f in sorted(filenames)
+                )
+        results = list()
+        for path in paths:
+            try:
+                if stat.S_ISREG(os.stat(path).st_mode):
+                    results.append([path, _read(path)])
+            except (IOError, OSError):
+                pass
+        return results
+
+    def which(self, names):
+        found = list()
+        dirs = os.environ.get('PATH', os.defpath).split(os.pathsep)
+        for name in names:
+            for d in dirs:
+                path = os.path.join(d, name)
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    found.append(name)
+                    break
+        return found
+
+    def uname(self):
+        return list(os.uname())
+
+
+def _error(ex):
+    error = {'type': ex.__class__.__name__, 'message': str(ex)}
+    if isinstance(ex, EnvironmentError):
+        error['type'] = 'OSError'
+        error['errno'] = ex.errno
+        error['message'] = ex.strerror or str(ex)
+        error['filename'] = ex.filename
+    return error
+
+
+def _recv(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    size = HEADER.unpack(header)[0]
+    return json.loads(stream.read(size).decode('utf-8'))
+
+
+def _send(stream, message):
+    data = json.dumps(message).encode('utf-8')
+    stream.write(HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def main():
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    methods = Methods()
+    _send(stdout, {'id': 0, 'result': {'pid': os.getpid()}})
+    while True:
+        request = _recv(stdin)
+        if request is None:
+            break
+        response = {'id': request.get('id')}
+        try:
+            method = request['method']
+            if method.startswith('_') or not hasattr(methods, method):
+                raise ValueError("Unknown method: %s" % method)
+            response['result'] = getattr(methods, method)(
+                *request.get('params', [])
+            )
+        except Exception as ex:
+            response['error'] = _error(ex)
+        _send(stdout, response)
+
+
+if __name__ == '__main__':
+    main()
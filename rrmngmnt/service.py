@@ -1,6 +1,21 @@
+import math
+import six
+from collections import namedtuple
 from rrmngmnt.resource import Resource
 
 
+ServiceState = namedtuple(
+    'ServiceState', ['name', 'active', 'sub', 'pid', 'started'],
+)
+"""
+State of system service.
+  active: active, inactive, failed, ... (systemd ActiveState naming)
+  sub: provider specific state, e.g. systemd SubState or initctl goal/state
+  pid: main process id or None
+  started: time when main process was started (as reported) or None
+"""
+
+
 class Service(Resource):
     """
     General service provided by Host.
@@ -24,6 +39,13 @@ class Service(Resource):
         super(Service, self).__init__()
         self.host = host
 
+    @property
+    def agent(self):
+        """
+        Running agent of host or None, see Host.agent
+        """
+        return getattr(self.host, '_agent', None)
+
 
 class SystemService(Service):
     """
@@ -31,6 +53,9 @@ class SystemService(Service):
     for more info / differences between Systemd and SysVinit
     """
     default_timeout = 30
+    index_ttl = 300
+    # cached index is fetched again on miss only when it is older
+    index_refresh_age = 5
     cmd = None
 
     class CanNotHandle(Exception):
@@ -74,6 +99,67 @@ class SystemService(Service):
     def reload(self):
         raise NotImplementedError()
 
+    def get_state(self):
+        """
+        :return: detailed state of service
+        :rtype: ServiceState
+        """
+        return self._get_states(self.host, [self.name], self.timeout)[
+            self.name
+        ]
+
+    def wait_for(self, state, timeout=None, interval=1):
+        """
+        Wait until service gets into desired state.
+        Whole waiting is done on host by single command.
+
+        :param state: desired state (active, inactive, ...), see ServiceState
+        :type state: str
+        :param timeout: how long to wait in seconds, default is self.timeout
+        :type timeout: int
+        :param interval: time between checks in seconds, it can be fraction
+        :type interval: float
+        :return: tuple(elapsed seconds, final state)
+        :rtype: tuple(float, str)
+        :raises: Error
+        """
+        if timeout is None:
+            timeout = self.timeout
+        # deadline is kept in hundredths of second (/proc/uptime has two
+        # decimal places), '1' prefix avoids octal reading of fraction
+        script = (
+            "read t0 _ < /proc/uptime ; "
+            "d=$((${{t0%.*}}*100+1${{t0#*.}}-100+{timeout})) ; "
+            "while : ; do s=$({probe}) ; "
+            "[ x$s = x{state} ] && break ; "
+            "read t _ < /proc/uptime ; "
+            "[ $((${{t%.*}}*100+1${{t#*.}}-100)) -ge $d ] && break ; "
+            "sleep {interval} ; done ; "
+            "read t1 _ < /proc/uptime ; echo $s $t0 $t1"
+        ).format(
+            timeout=int(math.ceil(timeout * 100)),
+            probe=self._state_probe(self.name), state=state,
+            interval=interval,
+        )
+        self.logger.info(
+            "Waiting up to %ss for %s to be %s", timeout, self, state,
+        )
+        executor = self.host.executor()
+        rc, out, err = executor.run_cmd(
+            script.split(), io_timeout=timeout + interval + self.timeout,
+        )
+        fields = out.split()
+        if rc or len(fields) not in (2, 3):
+            raise self.Error(
+                "Failed to wait for %s to be %s: %s" % (self, state, err)
+            )
+        try:
+            elapsed = float(fields[-1]) - float(fields[-2])
+        except ValueError:
+            raise self.Error("Unexpected output: %s" % out)
+        final_state = fields[0] if len(fields) == 3 else None
+        return elapsed, final_state
+
     def mask(self):
         raise NotImplementedError("Method supported only under systemd")
 
@@ -84,18 +170,193 @@ class SystemService(Service):
         """
         :raises: CanNotHandle
         """
-        executor = self.host.executor()
-        rc, _, _ = executor.run_cmd(
-            ['which', self.cmd],
-            io_timeout=self.timeout,
-        )
-        if rc:
+        if not self.host.os.has_binary(self.cmd, self.timeout):
             raise self.CanNotHandle("Missing %s" % self.cmd)
 
+    @classmethod
+    def _fetch_index(cls, host, timeout):
+        """
+        Fetch services known to this provider from host
+
+        :param host: relevant host
+        :type host: instance of Host
+        :param timeout: expected time to complete operation
+        :type timeout: int
+        :return: service name to state mapping
+        :rtype: dict
+        :raises: CanNotHandle
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def get_index(cls, host, timeout=None):
+        """
+        Get services known to this provider, the index is fetched once and
+        kept on host for index_ttl seconds.
+
+        :param host: relevant host
+        :type host: instance of Host
+        :param timeout: expected time to complete operation
+        :type timeout: int
+        :return: service name to state mapping
+        :rtype: dict
+        :raises: CanNotHandle
+        """
+        index = host._service_indexes.get(cls.__name__)
+        if index is None:
+            if timeout is None:
+                timeout = cls.default_timeout
+            index = cls._fetch_index(host, timeout)
+            host._service_indexes.set(cls.__name__, index)
+        return index
+
+    @classmethod
+    def invalidate_index(cls, host):
+        """
+        Drop index of this provider, called on SystemService it drops
+        indexes of all providers.
+
+        :param host: relevant host
+        :type host: instance of Host
+        """
+        if cls is SystemService:
+            host._service_indexes.invalidate()
+        else:
+            host._service_indexes.invalidate(cls.__name__)
+
+    def _check_index(self):
+        """
+        Cached index is fetched again when it misses the service, the
+        service could be added after the index was fetched. It happens
+        only when the index is older than index_refresh_age, so lookups
+        of unknown services don't fetch it over and over.
+
+        :raises: CanNotHandle
+        """
+        age = self.host._service_indexes.age(self.__class__.__name__)
+        index = self.get_index(self.host, self.timeout)
+        if (
+            self.name not in index and age is not None and
+            age > self.index_refresh_age
+        ):
+            self.invalidate_index(self.host)
+            index = self.get_index(self.host, self.timeout)
+        if self.name not in index:
+            raise self.CanNotHandle(
+                "%s is not known to %s" % (self.name, self.cmd)
+            )
+
+    @classmethod
+    def _state_probe(cls, name):
+        """
+        Shell command which prints state of service, used by wait_for
+
+        :param name: service name
+        :type name: str
+        :return: shell command
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def _unit_commands(cls, name, action):
+        """
+        Commands which perform action for single service, the next one
+        is executed only when the previous one failed.
+
+        :param name: service name
+        :type name: str
+        :param action: action to perform (start, stop, restart, reload,
+                       status, enable, disable, is-enabled, mask, unmask)
+        :type action: str
+        :return: list of commands
+        :rtype: list of lists
+        :raises: NotImplementedError
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def _execute_many(cls, host, names, action, timeout):
+        """
+        Perform action for all services by single command
+
+        :param host: relevant host
+        :type host: instance of Host
+        :param names: service names
+        :type names: list
+        :param action: action to perform, see _unit_commands
+        :type action: str
+        :param timeout: expected time to complete operation
+        :type timeout: int
+        :return: service name to result mapping
+        :rtype: dict
+        """
+        return dict(
+            [
+                (name, rc == 0) for name, rc in six.iteritems(
+                    cls._run_many(host, names, action, timeout)
+                )
+            ]
+        )
+
+    @classmethod
+    def _run_many(cls, host, names, action, timeout):
+        """
+        Run commands of all services by single command, see _execute_many
+
+        :return: service name to return code mapping (None when unknown)
+        :rtype: dict
+        """
+        cmd = list()
+        for name in names:
+            alternatives = list()
+            for unit_cmd in cls._unit_commands(name, action):
+                alternatives.append(list(unit_cmd) + ['>/dev/null'])
+            cmd.extend(alternatives[0])
+            for unit_cmd in alternatives[1:]:
+                cmd.append('||')
+                cmd.extend(unit_cmd)
+            cmd.extend([';', 'echo', name, '$?', ';'])
+        executor = host.executor()
+        _, out, _ = executor.run_cmd(cmd[:-1], io_timeout=timeout)
+        results = dict([(name, None) for name in names])
+        for line in out.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0] in results:
+                try:
+                    results[fields[0]] = int(fields[1])
+                except ValueError:
+                    pass
+        return results
+
+    @classmethod
+    def _get_states(cls, host, names, timeout):
+        """
+        Get detailed states of all services by single command
+
+        :param host: relevant host
+        :type host: instance of Host
+        :param names: service names
+        :type names: list
+        :param timeout: expected time to complete operation
+        :type timeout: int
+        :return: service name to state mapping
+        :rtype: dict of ServiceState
+        """
+        raise NotImplementedError()
+
 
 class SysVinit(SystemService):
     cmd = 'service'
     manage_cmd = 'chkconfig'
+    init_dir = '/etc/init.d'
+    # LSB init script status return codes
+    _lsb_states = {
+        0: 'active',
+        1: 'failed',
+        2: 'failed',
+        3: 'inactive',
+    }
     _not_supported = (
         'libvirtd',
     )
@@ -104,14 +365,48 @@ class SysVinit(SystemService):
         if self.name in self._not_supported:
             raise self.CanNotHandle("%s is not supported" % self.name)
         super(SysVinit, self)._can_handle()
-        init_script = '/etc/init.d/%s' % self.name
-        executor = self.host.executor()
-        cmd = ('[', '-e', init_script, ']')
-        rc, _, _ = executor.run_cmd(cmd, io_timeout=self.timeout)
+        self._check_index()
+
+    @classmethod
+    def _fetch_index(cls, host, timeout):
+        cmd = ['ls', '-1', cls.init_dir]
+        executor = host.executor()
+        rc, out, err = executor.run_cmd(cmd, io_timeout=timeout)
         if rc:
-            raise self.CanNotHandle(
-                "there is missing init script %s" % init_script
+            raise cls.CanNotHandle(
+                "Failed to list init scripts in %s: %s" % (cls.init_dir, err)
+            )
+        return dict([(name, None) for name in out.split()])
+
+    @classmethod
+    def _state_probe(cls, name):
+        return (
+            "%s %s status >/dev/null 2>&1 && echo active || echo inactive"
+            % (cls.cmd, name)
+        )
+
+    @classmethod
+    def _unit_commands(cls, name, action):
+        if action in ('mask', 'unmask'):
+            raise NotImplementedError("Method supported only under systemd")
+        if action == 'is-enabled':
+            return [[cls.manage_cmd, name]]
+        if action == 'enable':
+            return [[cls.manage_cmd, name, 'on']]
+        if action == 'disable':
+            return [[cls.manage_cmd, name, 'off']]
+        return [[cls.cmd, name, action]]
+
+    @classmethod
+    def _get_states(cls, host, names, timeout):
+        states = dict()
+        for name, rc in six.iteritems(
+            cls._run_many(host, names, 'status', timeout)
+        ):
+            states[name] = ServiceState(
+                name, cls._lsb_states.get(rc, 'unknown'), None, None, None,
             )
+        return states
 
     def _toggle(self, action):
         cmd = [
@@ -166,31 +461,183 @@ class SysVinit(SystemService):
 
 class Systemd(SystemService):
     cmd = 'systemctl'
+    unit_suffix = '.service'
+    # unit file state after successful action, None means unknown
+    _unit_file_states = {
+        'enable': 'enabled',
+        'disable': 'disabled',
+        'mask': 'masked',
+        'unmask': None,
+    }
+    _state_properties = (
+        'ActiveState', 'SubState', 'MainPID', 'ExecMainStartTimestamp',
+    )
+    # property checked after failed batch action, its expected value and
+    # whether the service should be in this state or not, None means that
+    # the state can't tell the outcome (active service could reject reload)
+    # and per service exit codes are used instead
+    _expected_states = {
+        'start': ('ActiveState', 'active', True),
+        'restart': None,
+        'reload': None,
+        'status': ('ActiveState', 'active', True),
+        'stop': ('ActiveState', 'active', False),
+        'enable': ('UnitFileState', 'enabled', True),
+        'is-enabled': ('UnitFileState', 'enabled', True),
+        'disable': ('UnitFileState', 'enabled', False),
+        'mask': ('UnitFileState', 'masked', True),
+        'unmask': ('UnitFileState', 'masked', False),
+    }
 
     def _can_handle(self):
         super(Systemd, self)._can_handle()
-        cmd = (
-            'systemctl', 'list-unit-files', '|',
-            'grep', '-o', '^[^.][^.]*.service', '|',
-            'cut', '-d.', '-f1', '|',
-            'sort', '|', 'uniq',
-        )
-        executor = self.host.executor()
-        rc, out, _ = executor.run_cmd(cmd, io_timeout=self.timeout)
-        out = out.strip().splitlines()
-        if rc or self.name not in out:
-            raise self.CanNotHandle(
-                "%s is not listed in %s" % (self.name, out)
-            )
+        self._check_index()
+
+    @classmethod
+    def _fetch_index(cls, host, timeout):
+        cmd = [
+            cls.cmd, 'list-unit-files', '--type=service', '--no-legend',
+        ]
+        executor = host.executor()
+        rc, out, err = executor.run_cmd(cmd, io_timeout=timeout)
+        if rc:
+            raise cls.CanNotHandle("Failed to list unit files: %s" % err)
+        index = dict()
+        for line in out.splitlines():
+            fields = line.split()
+            if len(fields) < 2 or not fields[0].endswith(cls.unit_suffix):
+                continue
+            index[fields[0][:-len(cls.unit_suffix)]] = fields[1]
+        return index
 
     def _execute(self, action):
         cmd = [
             self.cmd,
             action,
-            self.name + ".service",
+            self.name + self.unit_suffix,
         ]
         executor = self.host.executor()
         rc, _, _ = executor.run_cmd(cmd, io_timeout=self.timeout)
+        if not rc:
+            self._update_index(self.host, [self.name], action, self.timeout)
+        return rc == 0
+
+    @classmethod
+    def _update_index(cls, host, names, action, timeout):
+        if action not in cls._unit_file_states:
+            return
+        state = cls._unit_file_states[action]
+        if state is None:
+            cls.invalidate_index(host)
+            return
+        index = cls.get_index(host, timeout)
+        for name in names:
+            index[name] = state
+
+    @classmethod
+    def _parse_show(cls, out):
+        """
+        Parse output of 'systemctl show -p Id ...'
+
+        :param out: output of systemctl show
+        :type out: str
+        :return: service name to properties mapping
+        :rtype: dict
+        """
+        units = dict()
+        for block in out.strip().split('\n\n'):
+            properties = dict()
+            for line in block.splitlines():
+                key, _, value = line.partition('=')
+                properties[key.strip()] = value.strip()
+            unit = properties.get('Id', '')
+            if unit.endswith(cls.unit_suffix):
+                units[unit[:-len(cls.unit_suffix)]] = properties
+        return units
+
+    @classmethod
+    def _state_probe(cls, name):
+        return "%s is-active %s%s" % (cls.cmd, name, cls.unit_suffix)
+
+    @classmethod
+    def _get_states(cls, host, names, timeout):
+        units = [name + cls.unit_suffix for name in names]
+        cmd = [cls.cmd, 'show', '-p', 'Id']
+        for prop in cls._state_properties:
+            cmd.extend(['-p', prop])
+        executor = host.executor()
+        rc, out, err = executor.run_cmd(cmd + units, io_timeout=timeout)
+        if rc:
+            raise cls.Error("Failed to get state of %s: %s" % (names, err))
+        units = cls._parse_show(out)
+        states = dict()
+        for name in names:
+            properties = units.get(name, {})
+            try:
+                pid = int(properties.get('MainPID')) or None
+            except (TypeError, ValueError):
+                pid = None
+            states[name] = ServiceState(
+                name,
+                properties.get('ActiveState', 'unknown'),
+                properties.get('SubState') or None,
+                pid,
+                properties.get('ExecMainStartTimestamp') or None,
+            )
+        return states
+
+    @classmethod
+    def _execute_many(cls, host, names, action, timeout):
+        """
+        All services are handled by single systemctl call, when it fails
+        the result for each service is decided by its state afterwards,
+        or by running the action per service when the state can't tell.
+        """
+        expected_state = cls._expected_states[action]
+        units = [name + cls.unit_suffix for name in names]
+        cmd = [cls.cmd, action] + units + ['>/dev/null', ';', 'echo', '$?']
+        if expected_state is not None:
+            prop, expected, positive = expected_state
+            cmd += [';', cls.cmd, 'show', '-p', 'Id', '-p', prop] + units
+        executor = host.executor()
+        _, out, _ = executor.run_cmd(cmd, io_timeout=timeout)
+        rc, _, out = out.partition('\n')
+        if rc.strip() == '0':
+            results = dict([(name, True) for name in names])
+        elif expected_state is None:
+            results = super(Systemd, cls)._execute_many(
+                host, names, action, timeout,
+            )
+        else:
+            states = cls._parse_show(out)
+            results = dict()
+            for name in names:
+                state = states.get(name, {}).get(prop)
+                results[name] = (
+                    state is not None and (state == expected) == positive
+                )
+        cls._update_index(
+            host, [name for name in names if results[name]], action, timeout,
+        )
+        return results
+
+    @classmethod
+    def _unit_commands(cls, name, action):
+        return [[cls.cmd, action, name + cls.unit_suffix]]
+
+    def daemon_reload(self):
+        """
+        Reload systemd manager configuration, the unit index of host
+        is dropped as well.
+
+        :return: True if reload succeeded, False otherwise
+        :rtype: bool
+        """
+        executor = self.host.executor()
+        rc, _, _ = executor.run_cmd(
+            [self.cmd, 'daemon-reload'], io_timeout=self.timeout,
+        )
+        self.invalidate_index(self.host)
         return rc == 0
 
     def is_enabled(self):
@@ -229,18 +676,71 @@ class InitCtl(SystemService):
 
     def _can_handle(self):
         super(InitCtl, self)._can_handle()
-        executor = self.host.executor()
-        cmd = [
-            self.cmd, 'list', '|',
-            'cut', '-d', ' ', '-f1', '|',
-            'sort', '|', 'uniq',
-        ]
-        rc, out, _ = executor.run_cmd(cmd, io_timeout=self.timeout)
-        out = out.strip().splitlines()
-        if rc or self.name not in out:
-            raise self.CanNotHandle(
-                "%s is not listed in %s" % (self.name, out)
-            )
+        self._check_index()
+
+    @classmethod
+    def _fetch_index(cls, host, timeout):
+        executor = host.executor()
+        rc, out, err = executor.run_cmd(
+            [cls.cmd, 'list'], io_timeout=timeout,
+        )
+        if rc:
+            raise cls.CanNotHandle("Failed to list jobs: %s" % err)
+        return dict(
+            [
+                (name, state) for name, (state, _) in six.iteritems(
+                    cls._parse_jobs(out)
+                )
+            ]
+        )
+
+    @classmethod
+    def _parse_jobs(cls, out):
+        """
+        Parse output of 'initctl list' or 'initctl status'
+
+        :param out: output of initctl
+        :type out: str
+        :return: job name to tuple(goal/state, pid) mapping
+        :rtype: dict
+        """
+        jobs = dict()
+        for line in out.splitlines():
+            # e.g.: tty (/dev/tty1) start/running, process 1234
+            fields = [f.rstrip(',') for f in line.split()]
+            if not fields:
+                continue
+            states = [
+                f for f in fields[1:] if '/' in f and not f.startswith('(')
+            ]
+            pid = None
+            if 'process' in fields[:-1]:
+                try:
+                    pid = int(fields[fields.index('process') + 1])
+                except ValueError:
+                    pass
+            jobs[fields[0]] = (states[0] if states else None, pid)
+        return jobs
+
+    @classmethod
+    def _get_states(cls, host, names, timeout):
+        cmd = list()
+        for name in names:
+            cmd.extend([cls.cmd, 'status', name, ';'])
+        executor = host.executor()
+        _, out, _ = executor.run_cmd(cmd[:-1], io_timeout=timeout)
+        jobs = cls._parse_jobs(out)
+        states = dict()
+        for name in names:
+            state, pid = jobs.get(name, (None, None))
+            if state is None:
+                active = 'unknown'
+            elif state.endswith('/running'):
+                active = 'active'
+            else:
+                active = 'inactive'
+            states[name] = ServiceState(name, active, state, pid, None)
+        return states
 
     def _execute(self, action):
         cmd = [
@@ -254,6 +754,24 @@ class InitCtl(SystemService):
             raise self.Error(err)
         return out.strip()
 
+    @classmethod
+    def _state_probe(cls, name):
+        return (
+            "%s status %s 2>/dev/null | grep -q /running "
+            "&& echo active || echo inactive" % (cls.cmd, name)
+        )
+
+    @classmethod
+    def _unit_commands(cls, name, action):
+        if action == 'status':
+            return [[cls.cmd, 'status', name, '|', 'grep', '-q', '/running']]
+        if action == 'restart':
+            # restart fails when there is no instance of job, see restart
+            return [[cls.cmd, 'restart', name], [cls.cmd, 'start', name]]
+        if action in ('start', 'stop', 'reload'):
+            return [[cls.cmd, action, name]]
+        raise NotImplementedError()
+
     def _toggle(self, action):
         try:
             self._execute(action)
@@ -283,3 +801,102 @@ class InitCtl(SystemService):
 
     def reload(self):
         return self._toggle('reload')
+
+
+class SystemServiceGroup(Service):
+    """
+    Group of system services hosted on same host.
+    Action is performed for all services of same provider by single command.
+    Each action returns mapping of service name to result.
+
+    host.services(['httpd', 'postgresql']).restart()
+    """
+    def __init__(self, host, services):
+        """
+        :param host: relevant host
+        :type host: instance of Host
+        :param services: services to manage
+        :type services: list of SystemService instances
+        """
+        super(SystemServiceGroup, self).__init__(host)
+        self.services = list(services)
+
+    def __str__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__,
+            ", ".join([service.name for service in self.services]),
+        )
+
+    def _by_provider(self):
+        groups = list()
+        for service in self.services:
+            for provider, services in groups:
+                if provider is service.__class__:
+                    services.append(service)
+                    break
+            else:
+                groups.append((service.__class__, [service]))
+        return groups
+
+    def _execute(self, action):
+        results = dict()
+        for provider, services in self._by_provider():
+            self.logger.info(
+                "Executing %s for %s services: %s", action, provider.__name__,
+                ", ".join([service.name for service in services]),
+            )
+            results.update(
+                provider._execute_many(
+                    self.host,
+                    [service.name for service in services],
+                    action,
+                    sum([service.timeout for service in services]),
+                )
+            )
+        return results
+
+    def states(self):
+        """
+        :return: service name to detailed state mapping
+        :rtype: dict of ServiceState
+        """
+        states = dict()
+        for provider, services in self._by_provider():
+            states.update(
+                provider._get_states(
+                    self.host,
+                    [service.name for service in services],
+                    max([service.timeout for service in services]),
+                )
+            )
+        return states
+
+    def is_enabled(self):
+        return self._execute('is-enabled')
+
+    def enable(self):
+        return self._execute('enable')
+
+    def disable(self):
+        return self._execute('disable')
+
+    def status(self):
+        return self._execute('status')
+
+    def start(self):
+        return self._execute('start')
+
+    def stop(self):
+        return self._execute('stop')
+
+    def restart(self):
+        return self._execute('restart')
+
+    def reload(self):
+        return self._execute('reload')
+
+    def mask(self):
+        return self._execute('mask')
+
+    def unmask(self):
+        return self._execute('unmask')
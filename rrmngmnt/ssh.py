@@ -1,5 +1,7 @@
 import os
+import six
 import time
+import uuid
 import socket
 import paramiko
 import contextlib
@@ -55,6 +57,7 @@ class RemoteExecutor(Executor):
                 timeout = RemoteExecutor.TCP_TIMEOUT
             self._timeout = timeout
             self._ssh = paramiko.SSHClient()
+            self._sftp = None
             self._ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             if use_pkey:
                 self.pkey = paramiko.RSAKey.from_private_key_file(
@@ -99,6 +102,9 @@ class RemoteExecutor(Executor):
                 raise
 
         def close(self):
+            if self._sftp is not None:
+                sftp, self._sftp = self._sftp, None
+                sftp.close()
             self._ssh.close()
 
         def _update_timeout_exception(self, ex, timeout=None):
@@ -119,17 +125,145 @@ class RemoteExecutor(Executor):
             cmd = self.command(cmd)
             return cmd.run(input_, timeout)
 
+        def channel(self, cmd):
+            """
+            Open new channel of this session executing command
+
+            :param cmd: command
+            :type cmd: str
+            :return: channel, raw paramiko channel
+            :rtype: instance of paramiko.Channel
+            """
+            channel = self._ssh.get_transport().open_session()
+            channel.exec_command(cmd)
+            return channel
+
+        def shell(self):
+            """
+            :return: persistent shell, not opened yet
+            :rtype: instance of RemoteExecutor.Shell
+            """
+            return RemoteExecutor.Shell(self)
+
+        def _get_sftp(self):
+            """
+            SFTP channel is opened once and shared by all files opened
+            within this session.
+            """
+            if self._sftp is None:
+                self._sftp = self._ssh.open_sftp()
+            return self._sftp
+
         @contextlib.contextmanager
         def open_file(self, path, mode='r', bufsize=-1):
-            with contextlib.closing(self._ssh.open_sftp()) as sftp:
-                with contextlib.closing(
-                    sftp.file(
-                        path,
-                        mode,
-                        bufsize,
+            with contextlib.closing(
+                self._get_sftp().file(
+                    path,
+                    mode,
+                    bufsize,
+                )
+            ) as fh:
+                yield fh
+
+    class Shell(object):
+        """
+        Long-lived shell on single channel. Commands are executed one after
+        another by the same shell process, so working directory and
+        environment are kept between them, and login scripts are sourced
+        only once.
+
+        with session.shell() as sh:
+            sh.run_cmd(['cd', '/tmp'])
+            rc, out, err = sh.run_cmd(['pwd'])
+        """
+        program = 'sh'
+        poll_interval = 0.001
+
+        def __init__(self, session):
+            super(RemoteExecutor.Shell, self).__init__()
+            self._ss = session
+            self._channel = None
+            self._sentinel = "__RRMNGMNT_%s__" % uuid.uuid4().hex
+
+        @property
+        def logger(self):
+            return self._ss.logger
+
+        def __enter__(self):
+            self.open()
+            return self
+
+        def __exit__(self, type_, value, tb):
+            self.close()
+
+        def open(self):
+            self._channel = self._ss.channel(self.program)
+
+        def close(self):
+            if self._channel is not None:
+                channel, self._channel = self._channel, None
+                channel.close()
+
+        def _script(self, cmd):
+            # output of command is followed by sentinel line holding rc on
+            # stdout, and by sentinel line on stderr, both are preceded by
+            # newline in case output doesn't end with one
+            return (
+                "{ %(cmd)s\n} </dev/null\n"
+                "printf '\\n%(s)s %%d\\n' $?\n"
+                "printf '\\n%(s)s\\n' >&2\n"
+            ) % {'cmd': cmd, 's': self._sentinel}
+
+        def run_cmd(self, cmd, timeout=None):
+            """
+            :param cmd: command
+            :type cmd: list or str
+            :param timeout: max time to wait for command in seconds
+            :type timeout: float
+            :return: rc, out, err
+            :rtype: tuple (int, str, str)
+            :raises: socket.timeout
+            """
+            if not isinstance(cmd, six.string_types):
+                cmd = subprocess.list2cmdline(cmd)
+            self.logger.debug("Executing in shell: %s", cmd)
+            self._channel.sendall(self._script(cmd).encode('utf-8'))
+            out_mark = ("\n%s " % self._sentinel).encode('utf-8')
+            err_mark = ("\n%s\n" % self._sentinel).encode('utf-8')
+            out = err = six.b('')
+            rc = None
+            err_end = -1
+            deadline = None if timeout is None else time.time() + timeout
+            while rc is None or err_end < 0:
+                progress = False
+                if self._channel.recv_ready():
+                    out += self._channel.recv(65536)
+                    progress = True
+                if self._channel.recv_stderr_ready():
+                    err += self._channel.recv_stderr(65536)
+                    progress = True
+                out_end = out.find(out_mark)
+                if rc is None and out_end >= 0 and out.endswith(six.b('\n')):
+                    rc = int(out[out_end + len(out_mark):])
+                    out = out[:out_end]
+                err_end = err.find(err_mark)
+                if progress:
+                    continue
+                if self._channel.exit_status_ready():
+                    raise Exception(
+                        "Shell exited while executing: %s" % cmd
+                    )
+                if deadline is not None and time.time() > deadline:
+                    # command is still running, shell can't be used anymore
+                    self.close()
+                    raise socket.timeout(
+                        "%s: timeout(%s)" % (cmd, timeout)
                     )
-                ) as fh:
-                    yield fh
+                time.sleep(self.poll_interval)
+            out = out.decode('utf-8', 'replace')
+            err = err[:err_end].decode('utf-8', 'replace')
+            self.logger.debug("  RC: %s", rc)
+            return rc, out, err
 
     class Command(Executor.Command):
         """
@@ -0,0 +1,240 @@
+"""
+This module provides comparison of RPM and Debian package versions,
+it follows rpmvercmp of rpm and verrevcmp of dpkg, so no command needs
+to be executed in order to compare versions.
+"""
+import six
+import string
+
+RPM = 'rpm'
+DEB = 'deb'
+
+_DIGITS = frozenset(string.digits)
+_ALPHA = frozenset(string.ascii_letters)
+_ALNUM = _DIGITS | _ALPHA
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def _segment(s, i, chars):
+    j = i
+    while j < len(s) and s[j] in chars:
+        j += 1
+    return s[i:j], j
+
+
+def rpmvercmp(a, b):
+    """
+    Compare version (or release) strings like rpm does
+
+    :param a: version
+    :type a: str
+    :param b: version
+    :type b: str
+    :return: 1 if a is newer, 0 if they are equal, -1 if b is newer
+    :rtype: int
+    """
+    if a == b:
+        return 0
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while i < len(a) and a[i] not in _ALNUM and a[i] not in '~^':
+            i += 1
+        while j < len(b) and b[j] not in _ALNUM and b[j] not in '~^':
+            j += 1
+        one = a[i] if i < len(a) else ''
+        two = b[j] if j < len(b) else ''
+        # tilde sorts before everything, even end of string
+        if one == '~' or two == '~':
+            if one != '~':
+                return 1
+            if two != '~':
+                return -1
+            i += 1
+            j += 1
+            continue
+        # caret sorts after end of string, but before anything else
+        if one == '^' or two == '^':
+            if not one:
+                return -1
+            if not two:
+                return 1
+            if one != '^':
+                return 1
+            if two != '^':
+                return -1
+            i += 1
+            j += 1
+            continue
+        if not (one and two):
+            break
+        if one in _DIGITS:
+            seg1, i = _segment(a, i, _DIGITS)
+            seg2, j = _segment(b, j, _DIGITS)
+            # numeric segment is always newer than alpha segment
+            if not seg2:
+                return 1
+            seg1 = seg1.lstrip('0')
+            seg2 = seg2.lstrip('0')
+            if len(seg1) != len(seg2):
+                return _sign(len(seg1) - len(seg2))
+        else:
+            seg1, i = _segment(a, i, _ALPHA)
+            seg2, j = _segment(b, j, _ALPHA)
+            if not seg2:
+                return -1
+        if seg1 != seg2:
+            return 1 if seg1 > seg2 else -1
+    one = a[i] if i < len(a) else ''
+    two = b[j] if j < len(b) else ''
+    if not one and not two:
+        return 0
+    # whichever version still has characters left over wins
+    return 1 if one else -1
+
+
+def _order(c):
+    if not c or c in _DIGITS:
+        return 0
+    if c in _ALPHA:
+        return ord(c)
+    if c == '~':
+        return -1
+    return ord(c) + 256
+
+
+def debvercmp(a, b):
+    """
+    Compare upstream version (or revision) strings like dpkg does
+
+    :param a: version
+    :type a: str
+    :param b: version
+    :type b: str
+    :return: 1 if a is newer, 0 if they are equal, -1 if b is newer
+    :rtype: int
+    """
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while (
+            (i < len(a) and a[i] not in _DIGITS) or
+            (j < len(b) and b[j] not in _DIGITS)
+        ):
+            ac = _order(a[i] if i < len(a) else '')
+            bc = _order(b[j] if j < len(b) else '')
+            if ac != bc:
+                return _sign(ac - bc)
+            i += 1
+            j += 1
+        while i < len(a) and a[i] == '0':
+            i += 1
+        while j < len(b) and b[j] == '0':
+            j += 1
+        first_diff = 0
+        while i < len(a) and a[i] in _DIGITS and j < len(b) and \
+                b[j] in _DIGITS:
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len(a) and a[i] in _DIGITS:
+            return 1
+        if j < len(b) and b[j] in _DIGITS:
+            return -1
+        if first_diff:
+            return _sign(first_diff)
+    return 0
+
+
+_COMPARATORS = {
+    RPM: rpmvercmp,
+    DEB: debvercmp,
+}
+
+
+def parse_evr(version):
+    """
+    Split [epoch:]version[-release] string
+
+    :param version: version string
+    :type version: str
+    :return: epoch, version, release (epoch is 0 when it is missing,
+             release is empty string)
+    :rtype: tuple(int, str, str)
+    """
+    epoch = 0
+    if ':' in version:
+        epoch, version = version.split(':', 1)
+        epoch = int(epoch or 0)
+    release = ''
+    if '-' in version:
+        version, release = version.rsplit('-', 1)
+    return epoch, version, release
+
+
+def compare_evr(evr1, evr2, scheme=RPM):
+    """
+    Compare tuples of (epoch, version, release)
+
+    :param evr1: epoch, version, release
+    :type evr1: tuple
+    :param evr2: epoch, version, release
+    :type evr2: tuple
+    :param scheme: versioning scheme, RPM or DEB
+    :type scheme: str
+    :return: 1 if evr1 is newer, 0 if they are equal, -1 if evr2 is newer
+    :rtype: int
+    """
+    vercmp = _COMPARATORS[scheme]
+    epoch1, epoch2 = int(evr1[0] or 0), int(evr2[0] or 0)
+    if epoch1 != epoch2:
+        return _sign(epoch1 - epoch2)
+    return vercmp(evr1[1], evr2[1]) or vercmp(evr1[2] or '', evr2[2] or '')
+
+
+def compare_versions(a, b, scheme=RPM):
+    """
+    Compare [epoch:]version[-release] strings
+
+    :param a: version
+    :type a: str
+    :param b: version
+    :type b: str
+    :param scheme: versioning scheme, RPM or DEB
+    :type scheme: str
+    :return: 1 if a is newer, 0 if they are equal, -1 if b is newer
+    :rtype: int
+    """
+    return compare_evr(parse_evr(a), parse_evr(b), scheme)
+
+
+def compare_many(reference, entries, scheme=RPM):
+    """
+    Compare many versions with reference version in one pass, each
+    distinct version is compared only once.
+
+    :param reference: reference version, [epoch:]version[-release]
+                      string or tuple(epoch, version, release)
+    :type reference: str or tuple
+    :param entries: pairs of key (e.g. host) and version in the same
+                    form as reference
+    :type entries: iterable of tuple(hashable, str or tuple)
+    :param scheme: versioning scheme, RPM or DEB
+    :type scheme: str
+    :return: key to result of comparison of its version with reference
+    :rtype: dict
+    """
+    if isinstance(reference, six.string_types):
+        reference = parse_evr(reference)
+    results = dict()
+    memo = dict()
+    for key, version in entries:
+        if version not in memo:
+            evr = version
+            if isinstance(version, six.string_types):
+                evr = parse_evr(version)
+            memo[version] = compare_evr(evr, reference, scheme)
+        results[key] = memo[version]
+    return results
@@ -15,6 +15,11 @@ class FakeFile(six.StringIO):
     def __enter__(self):
         return self
 
+    def write(self, data):
+        if isinstance(data, six.binary_type):
+            data = data.decode('latin-1')
+        return six.StringIO.write(self, data)
+
     def close(self):
         self.seek(0)
         self.data = self.read()
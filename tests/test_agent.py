@@ -0,0 +1,161 @@
+# -*- coding: utf8 -*-
+import errno
+import os
+import subprocess
+import sys
+
+import pytest
+
+from rrmngmnt import Host, RootUser
+from rrmngmnt import errors
+from rrmngmnt.agent import Agent
+from rrmngmnt.executor import Executor
+
+
+class LocalChannel(object):
+    """
+    Mimics paramiko channel executing command by local shell
+    """
+    def __init__(self, cmd):
+        self._p = subprocess.Popen(
+            ['sh', '-c', cmd], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def sendall(self, data):
+        self._p.stdin.write(data)
+        self._p.stdin.flush()
+
+    def recv(self, size):
+        return os.read(self._p.stdout.fileno(), size)
+
+    def recv_exit_status(self):
+        return self._p.wait()
+
+    def close(self):
+        self._p.stdin.close()
+        self._p.wait()
+
+
+class LocalExecutor(Executor):
+    """
+    Executes everything on local machine
+    """
+    uploads = list()
+
+    class Session(Executor.Session):
+
+        def open(self):
+            pass
+
+        def run_cmd(self, cmd, input_=None):
+            p = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+            out, err = p.communicate()
+            return p.returncode, out, err
+
+        def open_file(self, path, mode):
+            LocalExecutor.uploads.append(path)
+            return open(path, mode)
+
+        def channel(self, cmd):
+            return LocalChannel(cmd)
+
+    def session(self):
+        return LocalExecutor.Session(self)
+
+
+@pytest.fixture
+def host(monkeypatch, tmpdir):
+    monkeypatch.setattr(
+        Host, 'executor',
+        lambda self, user=None, pkey=False: LocalExecutor(RootUser('pass')),
+    )
+    monkeypatch.setattr(Agent, 'remote_dir', str(tmpdir.mkdir('remote')))
+    monkeypatch.setattr(Agent, 'interpreters', (sys.executable,))
+    monkeypatch.setattr(LocalExecutor, 'uploads', list())
+    return Host('1.1.1.1')
+
+
+@pytest.fixture
+def files(tmpdir):
+    d = tmpdir.mkdir('files')
+    d.join('file').write('data')
+    d.mkdir('dir').join('nested').write('nested')
+    return str(d)
+
+
+class TestAgent(object):
+
+    def test_uploaded_once(self, host):
+        with host.agent() as agent:
+            assert os.path.isfile(agent.path)
+            assert agent.pid
+        assert len(LocalExecutor.uploads) == 1
+        with host.agent() as agent:
+            assert agent.call('ping')
+        assert len(LocalExecutor.uploads) == 1
+
+    def test_tampered_helper_replaced(self, host):
+        with host.agent() as agent:
+            path = agent.path
+        with open(path, 'w') as fh:
+            fh.write("raise SystemExit('not the agent')\n")
+        with host.agent() as agent:
+            assert agent.call('ping')
+        assert len(LocalExecutor.uploads) == 2
+
+    def test_registered(self, host):
+        with host.agent() as agent:
+            assert host.fs.agent is agent
+        assert host.fs.agent is None
+        with pytest.raises(errors.AgentError):
+            agent.call('ping')
+
+    def test_methods(self, host, files):
+        with host.agent() as agent:
+            assert agent.listdir(files) == ['dir', 'file']
+            assert agent.stat(files + '/file').st_size == 4
+            assert agent.read_many(
+                [files + '/file', files + '/missing']
+            ) == {files + '/file': 'data', files + '/missing': None}
+            assert agent.read_tree([files + '/*']) == [
+                (files + '/dir/nested', 'nested'),
+                (files + '/file', 'data'),
+            ]
+            assert [e[0] for e in agent.walk(files)] == [
+                files, files + '/dir',
+            ]
+
+    def test_os_error(self, host, files):
+        with host.agent() as agent:
+            with pytest.raises(OSError) as ex_info:
+                agent.stat(files + '/missing')
+            assert ex_info.value.errno == errno.ENOENT
+            assert agent.exists(files)
+
+    def test_unknown_method(self, host):
+        with host.agent() as agent:
+            with pytest.raises(errors.AgentError) as ex_info:
+                agent.call('_recv')
+            assert "Unknown method" in str(ex_info.value)
+
+    def test_services(self, host, files):
+        with host.agent():
+            assert host.fs.exists(files + '/file')
+            assert not host.fs.isdir(files + '/file')
+            assert host.fs.listdir(files) == ['dir', 'file']
+            assert host.fs.read_file(files + '/file') == 'data'
+            assert host.fs.read_file(files + '/missing') == ''
+            assert host.fs.stat(files + '/dir').st_nlink >= 2
+            assert host.os.find_binaries(
+                ['sh', 'rrmngmnt-missing-binary']
+            ) == set(['sh'])
+
+    def test_release_str_missing(self, host, monkeypatch):
+        def read(self, path):
+            raise OSError(errno.ENOENT, "No such file or directory", path)
+        monkeypatch.setattr(Agent, 'read', read)
+        with host.agent():
+            with pytest.raises(errors.CommandExecutionFailure):
+                host.os.get_release_str()
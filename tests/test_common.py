@@ -13,3 +13,50 @@ def test_fqdn2ip_negative():
     with pytest.raises(Exception) as ex_info:
         common.fqdn2ip('github.or')
     assert 'github.or' in str(ex_info.value)
+
+
+class TestTimedCache(object):
+
+    def test_get_set(self):
+        cache = common.TimedCache()
+        assert cache.get('key') is None
+        cache.set('key', 'value')
+        assert cache.get('key') == 'value'
+
+    def test_expired(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(common.time, 'time', lambda: now[0])
+        cache = common.TimedCache(ttl=10)
+        cache.set('key', 'value')
+        now[0] += 5
+        assert cache.get('key') == 'value'
+        now[0] += 10
+        assert cache.get('key', 'default') == 'default'
+
+    def test_age(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(common.time, 'time', lambda: now[0])
+        cache = common.TimedCache(ttl=10)
+        assert cache.age('key') is None
+        cache.set('key', 'value')
+        now[0] += 5
+        assert cache.age('key') == 5
+        now[0] += 10
+        assert cache.age('key') is None
+
+    def test_invalidate(self):
+        cache = common.TimedCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.invalidate('a')
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        cache.invalidate()
+        assert cache.get('b') is None
+
+
+def test_parallel_map():
+    assert common.parallel_map(lambda x: x * 2, [1, 2, 3], workers=2) == [
+        2, 4, 6,
+    ]
+    assert common.parallel_map(lambda x: x, []) == []
@@ -24,9 +24,12 @@ def fake_cmd_data(cmd_to_data, files):
 
 class TestDb(object):
     data = {
-        'which systemctl': (0, "", ""),
-        'systemctl list-unit-files | grep -o ^[^.][^.]*.service | '
-        'cut -d. -f1 | sort | uniq': (0, "postgresql\n", "",),
+        'for b in systemctl service initctl ; do command -v $b ; done': (
+            1, "/usr/bin/systemctl\n", "",
+        ),
+        'systemctl list-unit-files --type=service --no-legend': (
+            0, "postgresql.service disabled\n", "",
+        ),
         'systemctl restart postgresql.service': (0, '', ''),
         'export PGPASSWORD=db_pass; psql -d db_name -U db_user '
         '-h localhost -R __RECORD_SEPARATOR__ -t -A -c '
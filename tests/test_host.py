@@ -1,6 +1,11 @@
 # -*- coding: utf8 -*-
+import hashlib
+import uuid
 from rrmngmnt import Host, User, RootUser
+from rrmngmnt import errors
+from rrmngmnt import common
 import pytest
+from .common import FakeExecutor
 
 
 def get_host(ip='1.1.1.1'):
@@ -30,3 +35,98 @@ class TestExecutorUser(object):
         h.executor_user = user
         e = h.executor()
         e.user.name == 'lukas'
+
+
+class ScriptData(dict):
+    """
+    Commands which check script succeed once script was uploaded
+    """
+    def __init__(self, data, files, uploaded, checks):
+        super(ScriptData, self).__init__(data)
+        self.files = files
+        self.uploaded = uploaded
+        self.checks = checks
+
+    def __getitem__(self, cmd):
+        if cmd in self.checks and self.uploaded in self.files:
+            return 0, 'hello\n', ''
+        return super(ScriptData, self).__getitem__(cmd)
+
+
+class TestRunScript(object):
+    content = "#!/bin/sh\necho $1\n"
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    path = '/var/tmp/rrmngmnt-script-%s' % digest[:16]
+    tmp = '%s.%s' % (path, 'a' * 32)
+    missing = (127, '', 'RRMNGMNT_SCRIPT_MISSING\n')
+    verify_cmd = (
+        '[ -O {p} ] && [ -x {p} ] && [ $(sha256sum < {p} | cut -c1-64) = '
+        '{d} ] || {{ echo RRMNGMNT_SCRIPT_MISSING >&2 ; exit 127 ; }} ; '
+        'exec {p} hello'
+    ).format(p=path, d=digest)
+    cached_cmd = (
+        '[ -O {p} ] && [ -x {p} ] || '
+        '{{ echo RRMNGMNT_SCRIPT_MISSING >&2 ; exit 127 ; }} ; '
+        'exec {p} hello'
+    ).format(p=path)
+    upload_cmd = 'chmod +x %s && mv -f %s %s' % (tmp, tmp, path)
+
+    @pytest.fixture
+    def host(self, monkeypatch):
+        self.files = dict()
+        self.data = dict()
+
+        def executor(h, user=None, pkey=False):
+            e = FakeExecutor(User('fakeuser', 'password'), h.ip)
+            e.cmd_to_data = ScriptData(
+                self.data, self.files, self.tmp,
+                [self.verify_cmd, self.cached_cmd],
+            )
+            e.files_content = self.files
+            return e
+        monkeypatch.setattr(Host, 'executor', executor)
+        monkeypatch.setattr(
+            common.uuid, 'uuid4', lambda: uuid.UUID('a' * 32),
+        )
+        return get_host()
+
+    def test_upload_once(self, host):
+        self.data[self.verify_cmd] = self.missing
+        self.data[self.upload_cmd] = (0, '', '')
+        assert host.run_script(self.content, ['hello']) == (
+            0, 'hello\n', '',
+        )
+        assert self.files[self.tmp].data == self.content
+        assert self.path in host._scripts
+        # second run is served by single command, without upload
+        self.data.clear()
+        self.data[self.cached_cmd] = (0, 'hello\n', '')
+        self.files.clear()
+        assert host.run_script(self.content, ['hello'])[0] == 0
+        assert not self.files
+
+    def test_already_uploaded(self, host):
+        self.data[self.verify_cmd] = (0, 'hello\n', '')
+        assert host.run_script(self.content, ['hello'])[0] == 0
+        assert not self.files
+
+    def test_removed_script_uploaded_again(self, host):
+        host._scripts.add(self.path)
+        self.data[self.cached_cmd] = self.missing
+        self.data[self.upload_cmd] = (0, '', '')
+        assert host.run_script(self.content, ['hello'])[0] == 0
+        assert self.tmp in self.files
+
+    def test_script_failure(self, host):
+        # script itself exits with the same code, it is not uploaded
+        self.data[self.verify_cmd] = (127, '', 'command not found\n')
+        assert host.run_script(self.content, ['hello'])[0] == 127
+        assert not self.files
+        assert self.path not in host._scripts
+
+    def test_upload_failure(self, host):
+        self.data[self.verify_cmd] = self.missing
+        self.data[self.upload_cmd] = (1, '', 'Permission denied')
+        with pytest.raises(errors.CommandExecutionFailure):
+            host.run_script(self.content, ['hello'])
+        assert self.path not in host._scripts
@@ -1,5 +1,21 @@
 # -*- coding: utf8 -*-
+import json
+import pytest
+import socket
+
 from rrmngmnt import Host, RootUser
+from rrmngmnt.network import (
+    Address,
+    NetworkSnapshot,
+    NetworkTransaction,
+    PrefixIndex,
+    _parse_ping_rtt,
+    connectivity_matrix,
+    find_sources,
+    ping_probe,
+    sweep,
+)
+from rrmngmnt import network
 from .common import FakeExecutor
 
 
@@ -14,7 +30,7 @@ def fake_cmd_data(cmd_to_data, files):
     def executor(self, user=None, pkey=False):
         e = FakeExecutor(user, self.ip)
         e.cmd_to_data = cmd_to_data.copy()
-        e.files = files
+        e.files_content = files
         return e
     Host.executor = executor
 
@@ -115,19 +131,19 @@ class TestNetwork(object):
             ),
             ''
         ),
-        'brctl show | sed -e "/^bridge name/ d" '
-        '-e \'s/^\\s\\s*\\(\\S\\S*\\)$/CONT:\\1/I\'': (
+        'for b in /sys/class/net/*/bridge ; do [ -d $b ] || continue ; '
+        'd=${b%/bridge} ; echo ${d##*/} $(cat $b/bridge_id) '
+        '$(cat $b/stp_state) $(ls $d/brif) ; done': (
             0,
             '\n'.join(
                 [
-                    ';vdsmdummy;     8000.000000000000   no      ',
-                    'ovirtmgmt       8000.009c02b0bfa0   no      enp4s0f0',
+                    ';vdsmdummy; 8000.000000000000 0',
+                    'ovirtmgmt 8000.009c02b0bfa0 0 enp4s0f0',
                 ]
             ),
             '',
         ),
-        'brctl addbr br1': (0, '', ''),
-        'brctl addif br1 net1': (0, '', ''),
+        'ip -batch -': (0, '', ''),
         'ls -la /sys/class/net | grep \'dummy_\|pci\' | grep -o \'[^/]*$\'': (
             0,
             '\n'.join(
@@ -187,6 +203,22 @@ class TestNetwork(object):
         ]
         assert bridges == expected
 
+    def test_get_bridge(self):
+        network = get_host().network
+        assert network.get_bridge('ovirtmgmt')['interfaces'] == ['enp4s0f0']
+        assert network.get_bridge('br1') is None
+        assert network.find_int_by_bridge(';vdsmdummy;') is None
+
+    def test_bridges_not_kept(self):
+        network = get_host().network
+        assert network.get_bridge('ovirtmgmt') is not None
+        # bridge removed by someone else
+        data = network._m._e.cmd_to_data
+        for cmd in data:
+            if cmd.startswith('for b in /sys/class/net/*/bridge'):
+                data[cmd] = (0, 'other 8000.009c02b0bfa0 0 enp4s0f0', '')
+        assert network.get_bridge('ovirtmgmt') is None
+
     def test_add_bridge(self):
         assert get_host().network.add_bridge("br1", "net1")
 
@@ -211,7 +243,7 @@ class TestNetwork(object):
 class TestHostNameCtl(object):
 
     data = {
-        'which hostnamectl': (0, '/usr/bin/hostnamectl', ''),
+        'command -v hostnamectl': (0, '/usr/bin/hostnamectl', ''),
         'hostnamectl set-hostname something': (0, '', ''),
         'hostnamectl status | grep hostname | tr -d " " | cut -d: -f2': (
             0, 'local', '',
@@ -234,7 +266,7 @@ class TestHostNameCtl(object):
 class TestHostNameEtc(object):
 
     data = {
-        'which hostnamectl': (1, '', ''),
+        'command -v hostnamectl': (1, '', ''),
         'hostname': (0, 'local', ''),
         'hostname something ; sed -i -e /^HOSTNAME/d /etc/sysconfig/network '
         '&& echo HOSTNAME=something >> /etc/sysconfig/network': (0, '', ''),
@@ -251,3 +283,590 @@ class TestHostNameEtc(object):
 
     def test_set(self):
         get_host().network.hostname = "something"
+
+
+def _link(index, name, mac, addresses=(), master=None, kind=None, **kwargs):
+    link = {
+        'ifindex': index,
+        'ifname': name,
+        'flags': ['BROADCAST', 'MULTICAST', 'UP', 'LOWER_UP'],
+        'mtu': 1500,
+        'operstate': 'UP',
+        'address': mac,
+        'addr_info': [
+            {
+                'family': 'inet6' if ':' in ip else 'inet',
+                'local': ip,
+                'prefixlen': prefixlen,
+            } for ip, prefixlen in addresses
+        ],
+    }
+    if master:
+        link['master'] = master
+    if kind:
+        link['linkinfo'] = {'info_kind': kind, 'info_data': kwargs}
+    return link
+
+
+class TestNetworkSnapshot(object):
+    __test__ = True
+
+    links = [
+        _link(1, 'lo', '00:00:00:00:00:00', [('127.0.0.1', 8), ('::1', 128)]),
+        _link(2, 'enp5s0f0', '44:1e:a1:73:3c:98', [('10.11.12.83', 24)]),
+        _link(3, 'enp4s0f0', '00:9c:02:b0:bf:a0', master='ovirtmgmt'),
+        _link(5, 'enp4s0f1', '00:9c:02:b0:bf:a4', [('10.11.12.81', 24)]),
+        _link(
+            7, 'ovirtmgmt', '00:9c:02:b0:bf:a0', [('10.11.12.35', 24)],
+            kind='bridge', bridge_id='8000.0:9c:2:b0:bf:a0', stp_state=0,
+        ),
+    ]
+    routes = [
+        {'dst': 'default', 'gateway': '10.11.12.1', 'dev': 'enp4s0f1',
+         'metric': 200},
+        {'dst': 'default', 'gateway': '10.11.12.254', 'dev': 'ovirtmgmt',
+         'metric': 100},
+        {'dst': '10.11.12.0/24', 'dev': 'ovirtmgmt', 'prefsrc': '10.11.12.35'},
+        {'type': 'local', 'dst': '10.11.12.35', 'dev': 'ovirtmgmt',
+         'table': 'local'},
+    ]
+    routes6 = [
+        {'dst': 'default', 'gateway': 'fe80::1', 'dev': 'ovirtmgmt'},
+    ]
+    data = {
+        'ip -d -j addr show ; echo __SECTION_SEPARATOR__ ; '
+        'ip -j route show table all ; echo __SECTION_SEPARATOR__ ; '
+        'ip -6 -j route show table all': (
+            0,
+            '%s\n__SECTION_SEPARATOR__\n%s\n__SECTION_SEPARATOR__\n%s\n' % (
+                json.dumps(links), json.dumps(routes), json.dumps(routes6),
+            ),
+            '',
+        ),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def get_network(self):
+        network = get_host().network
+        network.snapshot()
+        return network
+
+    def test_snapshot(self):
+        snapshot = get_host().network.snapshot()
+        assert snapshot.interfaces['enp4s0f0'].master == 'ovirtmgmt'
+        assert snapshot.addresses['10.11.12.81'].interface == 'enp4s0f1'
+        assert snapshot.default_gateway('inet6') == 'fe80::1'
+        assert snapshot.bridges() == {'ovirtmgmt': ['enp4s0f0']}
+
+    def test_address_of_unknown_interface(self):
+        snapshot = NetworkSnapshot(self.links, self.routes)
+        # address event can come before link event
+        snapshot.add_address(Address('10.20.0.1', 24, 'inet', 'eth9'))
+        assert snapshot.ipv4_addresses()[-1].interface == 'eth9'
+        assert snapshot.bridges() == {'ovirtmgmt': ['enp4s0f0']}
+        assert [b['name'] for b in snapshot.list_bridges()] == ['ovirtmgmt']
+
+    def test_find_default_gw(self):
+        assert self.get_network().find_default_gw() == '10.11.12.254'
+
+    def test_find_ips(self):
+        assert self.get_network().find_ips() == (
+            ['10.11.12.83', '10.11.12.81', '10.11.12.35'],
+            ['10.11.12.83/24', '10.11.12.81/24', '10.11.12.35/24'],
+        )
+
+    def test_get_info(self):
+        assert self.get_network().get_info() == {
+            'bridge': 'N/A',
+            'ip': '10.11.12.83',
+            'gateway': '10.11.12.254',
+            'interface': 'enp5s0f0',
+        }
+
+    def test_list_bridges(self):
+        assert self.get_network().list_bridges() == [
+            {
+                'id': '8000.009c02b0bfa0',
+                'interfaces': ['enp4s0f0'],
+                'name': 'ovirtmgmt',
+                'stp': 'no',
+            },
+        ]
+
+    def test_find_int_by_bridge(self):
+        assert self.get_network().find_int_by_bridge('ovirtmgmt') == (
+            'enp4s0f0'
+        )
+
+    def test_find_mac_by_int(self):
+        assert self.get_network().find_mac_by_int(
+            ['enp5s0f0', 'enp4s0f1']
+        ) == ['44:1e:a1:73:3c:98', '00:9c:02:b0:bf:a4']
+
+    def test_find_mac_by_int_unknown(self):
+        assert self.get_network().find_mac_by_int(['eth7']) is False
+
+    def test_find_ip_by_int(self):
+        assert self.get_network().find_ip_by_int('ovirtmgmt') == '10.11.12.35'
+
+    def test_find_ip_by_default_gw(self):
+        network = self.get_network()
+        ips_and_mask = network.find_ips()[1]
+        assert network.find_ip_by_default_gw(
+            '10.11.12.254', ips_and_mask
+        ) == '10.11.12.83'
+
+    def test_find_source(self):
+        network = get_host().network
+        assert network.find_source('8.8.8.8') == ('10.11.12.35', 'ovirtmgmt')
+        assert network.find_source('10.11.12.7') == (
+            '10.11.12.35', 'ovirtmgmt',
+        )
+        assert network.find_source('2001:db8::1') == (None, 'ovirtmgmt')
+
+    def test_find_sources(self):
+        hosts = [get_host(), get_host()]
+        assert find_sources(hosts, '8.8.8.8') == [
+            ('10.11.12.35', 'ovirtmgmt'), ('10.11.12.35', 'ovirtmgmt'),
+        ]
+
+
+class TestRouteTable(object):
+
+    def test_prefix_index(self):
+        index = PrefixIndex()
+        index.add('default', 'default')
+        index.add('10.0.0.0/8', 'ten')
+        index.add('10.1.0.0/16', 'ten-one')
+        index.add('10.1.2.3', 'host')
+        index.add('2001:db8::/32', 'doc6')
+        assert index.lookup('10.1.2.3') == ['host']
+        assert index.lookup('10.1.2.4') == ['ten-one']
+        assert index.lookup('10.2.0.1') == ['ten']
+        assert index.lookup('192.168.1.1') == ['default']
+        assert index.lookup('2001:db8::1') == ['doc6']
+        assert index.lookup('2001:db9::1') == []
+
+    def test_policy_table(self):
+        snapshot = NetworkSnapshot(
+            TestNetworkSnapshot.links,
+            TestNetworkSnapshot.routes + [
+                {'dst': 'default', 'gateway': '10.11.12.1',
+                 'dev': 'enp4s0f1', 'table': '100'},
+            ],
+        )
+        table = snapshot.route_table
+        assert table.lookup('8.8.8.8', table='100').gateway == '10.11.12.1'
+        assert table.source('8.8.8.8', table='100') == (
+            '10.11.12.81', 'enp4s0f1',
+        )
+        assert table.lookup('8.8.8.8', table='200') is None
+
+    def test_connected_addresses(self):
+        snapshot = NetworkSnapshot(TestNetworkSnapshot.links, [])
+        addresses = snapshot.route_table.connected_addresses('10.11.12.200')
+        assert len(addresses) == 3
+        assert all(isinstance(a, Address) for a in addresses)
+        assert snapshot.route_table.connected_addresses('10.0.0.1') == []
+
+
+class TestNetworkTransaction(object):
+    data = {
+        'ip -batch -': (
+            1, '',
+            'RTNETLINK answers: File exists\n'
+            'Command failed -:3\n',
+        ),
+        'ip -force -batch -': (0, '', ''),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_render(self):
+        t = get_host().network.transaction()
+        t.add_bridge('br1', ['eth1'])
+        t.add_vlan('eth2', 10)
+        t.add_bond('bond0', ['eth3'], mode='active-backup')
+        t.add_address('10.0.0.1/24', 'br1')
+        t.add_route('default', gateway='10.0.0.254', table=100)
+        t.set_mtu(['eth1'], 9000)
+        assert t.render([c for c, _ in t._ops]) == (
+            'link add name br1 type bridge\n'
+            'link set eth1 master br1\n'
+            'link add link eth2 name eth2.10 type vlan id 10\n'
+            'link add name bond0 type bond mode active-backup\n'
+            'link set down eth3\n'
+            'link set eth3 master bond0\n'
+            'address add 10.0.0.1/24 dev br1\n'
+            'route add default via 10.0.0.254 table 100\n'
+            'link set mtu 9000 eth1\n'
+        )
+
+    def test_empty_commit(self):
+        assert get_host().network.transaction().commit()
+
+    def test_failure(self, monkeypatch):
+        reverted = list()
+        monkeypatch.setattr(
+            NetworkTransaction, '_revert',
+            lambda self, applied: reverted.extend(applied),
+        )
+        t = get_host().network.transaction()
+        t.add_bridge('br1', ['eth1']).add_address('10.0.0.1/24', 'br1')
+        with pytest.raises(Exception) as ex_info:
+            t.commit()
+        assert "address add 10.0.0.1/24 dev br1" in str(ex_info.value)
+        assert [c for c, _ in reverted] == [
+            ['link', 'add', 'name', 'br1', 'type', 'bridge'],
+            ['link', 'set', 'eth1', 'master', 'br1'],
+        ]
+        assert len(t) == 0
+
+    def test_failure_no_rollback(self, monkeypatch):
+        monkeypatch.setattr(
+            NetworkTransaction, '_revert', lambda self, applied: 1 / 0,
+        )
+        t = get_host().network.transaction(rollback=False)
+        t.add_bridge('br1', ['eth1']).add_address('10.0.0.1/24', 'br1')
+        with pytest.raises(Exception) as ex_info:
+            t.commit()
+        assert "Command failed" in str(ex_info.value)
+
+    def test_context_manager_discards_on_error(self):
+        with pytest.raises(ValueError):
+            with get_host().network.transaction() as t:
+                t.link_up('eth1')
+                raise ValueError()
+        assert len(t) == 0
+
+
+class TestIfcfgFiles(object):
+    data = {
+        'mv -f /etc/sysconfig/network-scripts/.ifcfg-eth1.tmp '
+        '/etc/sysconfig/network-scripts/ifcfg-eth1 && '
+        'mv -f /etc/sysconfig/network-scripts/.ifcfg-eth1.10.tmp '
+        '/etc/sysconfig/network-scripts/ifcfg-eth1.10': (0, '', ''),
+        'rm -f /etc/sysconfig/network-scripts/ifcfg-eth1 '
+        '/etc/sysconfig/network-scripts/ifcfg-eth1.10': (0, '', ''),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_write_ifcfg_files(self):
+        get_host().network.write_ifcfg_files(
+            {
+                'eth1': {'ONBOOT': 'yes'},
+                'eth1.10': {'VLAN': 'yes'},
+            }
+        )
+        tmp = '/etc/sysconfig/network-scripts/.ifcfg-eth1.10.tmp'
+        assert self.files[tmp].data == "DEVICE=eth1.10\nVLAN=yes\n"
+
+    def test_delete_ifcfg_files(self):
+        assert get_host().network.delete_ifcfg_files(['eth1', 'eth1.10'])
+
+
+class TestSweep(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.server = socket.socket()
+        cls.server.bind(('127.0.0.1', 0))
+        cls.server.listen(5)
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        cls.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.server.close()
+
+    def test_tcp(self):
+        port = self.server.getsockname()[1]
+        result = sweep(['127.0.0.1'], timeout=1, method='tcp', port=port)
+        assert result[0].reachable
+        assert result[0].method == 'tcp'
+        assert result[0].rtt >= 0
+
+    def test_tcp_unreachable(self):
+        result = sweep(
+            ['127.0.0.1'], timeout=1, method='tcp', port=self.closed_port,
+        )
+        assert result == [
+            network.Reachability('127.0.0.1', False, None, 'tcp'),
+        ]
+
+    def test_icmp_fallback(self, monkeypatch):
+        def popen(*args, **kwargs):
+            raise OSError("ping: not found")
+        monkeypatch.setattr(network.subprocess, 'Popen', popen)
+        host = type('FakeHost', (object,), {'ip': '127.0.0.1'})()
+        port = self.server.getsockname()[1]
+        result = sweep(
+            ['127.0.0.1', host], timeout=1, port=port, workers=1,
+        )
+        assert [r.method for r in result] == ['tcp', 'tcp']
+        assert all(r.reachable for r in result)
+
+    def test_icmp_command(self, monkeypatch):
+        commands = list()
+
+        class Popen(object):
+            returncode = 0
+
+            def __init__(self, cmd, **kwargs):
+                commands.append(cmd)
+
+            def communicate(self):
+                return b"time=0.045 ms\n", b""
+        monkeypatch.setattr(network.subprocess, 'Popen', Popen)
+        result = sweep(['127.0.0.1', '127.0.0.2'], workers=1)
+        assert all(r.reachable for r in result)
+        ping_probe('127.0.0.1', timeout=0.5)
+        assert commands == [
+            ['ping', '-c', '1', '-w', '5', '127.0.0.1'],
+            ['ping', '-c', '1', '-w', '5', '127.0.0.2'],
+            ['ping', '-c', '1', '-w', '1', '-W', '0.5', '127.0.0.1'],
+        ]
+
+    def test_parse_ping_rtt(self):
+        out = (
+            "64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=0.045 ms\n"
+        )
+        assert _parse_ping_rtt(out) == 0.045
+        assert _parse_ping_rtt("") is None
+
+
+PING_OUT = """PING 1.1.1.1 (1.1.1.1) 56(84) bytes of data.
+64 bytes from 1.1.1.1: icmp_seq=1 ttl=64 time=0.310 ms
+64 bytes from 1.1.1.1: icmp_seq=2 ttl=64 time=0.285 ms
+
+--- 1.1.1.1 ping statistics ---
+3 packets transmitted, 2 received, 33.3333% packet loss, time 2002ms
+rtt min/avg/max/mdev = 0.285/0.297/0.310/0.012 ms
+"""
+
+
+class TestPing(object):
+    data = {
+        'ping -c 3 1.1.1.1 ; for s in 8972 1472 ; do '
+        'ping -c 1 -w 5 -M do -s $s 1.1.1.1 >/dev/null 2>&1 && break ; '
+        's= ; done ; [ x$s != x ] && echo MTU $s': (
+            0, PING_OUT + "MTU 1472\n", '',
+        ),
+        'ping -c 3 -w 1 2.2.2.2': (
+            1,
+            "--- 2.2.2.2 ping statistics ---\n"
+            "3 packets transmitted, 0 received, 100% packet loss, "
+            "time 2002ms\n",
+            '',
+        ),
+        'ping -c 3 -w 1 unknown': (2, '', 'ping: unknown: Name or service'),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_ping(self):
+        stats = get_host().network.ping('1.1.1.1', 3, mtus=[1500, 9000])
+        assert stats == network.PingStats(
+            '1.1.1.1', 3, 2, 33.3333, 0.285, 0.297, 0.310, 1500,
+        )
+
+    def test_ping_loss(self):
+        stats = get_host().network.ping('2.2.2.2', 3, timeout=1)
+        assert stats.loss == 100
+        assert stats.avg is None
+
+    def test_ping_error(self):
+        with pytest.raises(Exception) as ex_info:
+            get_host().network.ping('unknown', 3, timeout=1)
+        assert "Name or service" in str(ex_info.value)
+
+    def test_connectivity_matrix(self):
+        hosts = [get_host(), get_host()]
+        matrix = connectivity_matrix(hosts, mtus=[1500, 9000], max_probes=1)
+        assert matrix[0][0] is None and matrix[1][1] is None
+        assert matrix[0][1].mtu == 1500
+        assert matrix[1][0].received == 2
+
+
+class TestNetworkWatcher(object):
+    links = [
+        _link(2, 'eth0', '52:54:00:00:00:01', [('10.0.0.5', 24)]),
+    ]
+    routes = [
+        {'dst': 'default', 'gateway': '10.0.0.254', 'dev': 'eth0'},
+    ]
+    events = [
+        '3: eth1: <BROADCAST,MULTICAST> mtu 1500 qdisc noop state DOWN '
+        'mode DEFAULT group default qlen 1000\\    '
+        'link/ether 52:54:00:00:00:02 brd ff:ff:ff:ff:ff:ff',
+        '3: eth1: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 9000 qdisc pfifo_fast '
+        'state UP mode DEFAULT group default qlen 1000\\    '
+        'link/ether 52:54:00:00:00:02 brd ff:ff:ff:ff:ff:ff',
+        '3: eth1    inet 10.1.0.5/24 brd 10.1.0.255 scope global eth1\\'
+        '       valid_lft forever preferred_lft forever',
+        '10.1.0.0/24 dev eth1 proto kernel scope link src 10.1.0.5',
+        'Deleted default via 10.0.0.254 dev eth0',
+        'default via 10.1.0.254 dev eth1 metric 100',
+        'Deleted 2: eth0    inet 10.0.0.5/24 brd 10.0.0.255 scope global eth0',
+    ]
+    data = {
+        'ip -d -j addr show ; echo __SECTION_SEPARATOR__ ; '
+        'ip -j route show table all ; echo __SECTION_SEPARATOR__ ; '
+        'ip -6 -j route show table all': (
+            0,
+            '%s\n__SECTION_SEPARATOR__\n%s\n__SECTION_SEPARATOR__\n[]\n' % (
+                json.dumps(links), json.dumps(routes),
+            ),
+            '',
+        ),
+        'ip -o monitor link address route': (
+            0, "\n".join(events) + "\n", '',
+        ),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_events(self):
+        with get_host().network.watch() as watcher:
+            assert watcher.wait_for_link_state('eth1', 'UP', timeout=5)
+            assert watcher.wait_for_address('10.1.0.5', 'eth1', timeout=5)
+            assert watcher.wait_for_address(
+                '10.0.0.5', timeout=5, present=False,
+            )
+            snapshot = watcher.snapshot
+        eth1 = snapshot.interfaces['eth1']
+        assert eth1.mtu == 9000
+        assert eth1.mac == '52:54:00:00:00:02'
+        assert snapshot.default_gateway() == '10.1.0.254'
+        assert snapshot.route_table.source('8.8.8.8') == ('10.1.0.5', 'eth1')
+        assert '10.0.0.5' not in snapshot.addresses
+
+    def test_stream_ended(self):
+        with get_host().network.watch() as watcher:
+            assert not watcher.wait_for_link_state('eth2', 'UP', timeout=5)
+
+
+class TestThroughput(object):
+    data = {
+        'timeout 60 nc -l -p 5201 >/dev/null 2>&1 || '
+        'timeout 60 nc -l 5201 >/dev/null': (0, '', ''),
+        'timeout 60 nc -l -p 5202 >/dev/null 2>&1 || '
+        'timeout 60 nc -l 5202 >/dev/null': (0, '', ''),
+        'timeout 60 bash -c '
+        '"dd if=/dev/zero bs=1M count=10 >/dev/tcp/1.1.1.1/5201"': (
+            0, '',
+            '10+0 records in\n10+0 records out\n'
+            '10485760 bytes (10 MB, 10 MiB) copied, 0.5 s, 21.0 MB/s\n',
+        ),
+        'timeout 60 bash -c '
+        '"dd if=/dev/zero bs=1M count=10 >/dev/tcp/1.1.1.1/5202"': (
+            0, '',
+            '10+0 records in\n10+0 records out\n'
+            '10485760 bytes (10 MB) copied, 1.0 s, 10.5 MB/s\n',
+        ),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_measure_throughput(self):
+        result = get_host().network.measure_throughput(
+            get_host(), bytes_=10 * 1024 ** 2, streams=2,
+        )
+        assert result == [
+            network.Throughput(0, 10485760, 0.5, 20.97152),
+            network.Throughput(1, 10485760, 1.0, 10.48576),
+        ]
+
+
+def _stats(uptime, rx_bytes, tx_bytes):
+    return '\n'.join(
+        [
+            '/proc/uptime:%s 4000.00' % uptime,
+            '/sys/class/net/eth0/statistics/rx_bytes:%s' % rx_bytes,
+            '/sys/class/net/eth0/statistics/tx_bytes:%s' % tx_bytes,
+            '/sys/class/net/eth0/statistics/rx_packets:10',
+            '/sys/class/net/eth0/statistics/collisions:0',
+            '/sys/class/net/lo/statistics/rx_bytes:500',
+            '/sys/class/net/lo/statistics/tx_bytes:500',
+        ]
+    ) + '\n'
+
+
+class TestLinkStats(object):
+    neighbors = [
+        {'dst': '10.0.0.254', 'dev': 'eth0', 'lladdr': '52:54:00:00:00:fe',
+         'state': ['REACHABLE']},
+        {'dst': '10.0.0.7', 'dev': 'eth0', 'state': ['FAILED']},
+    ]
+    data = {
+        'grep -rs . /proc/uptime /sys/class/net/*/statistics': (
+            0, _stats('1000.50', 1000, 2000), '',
+        ),
+        'grep -rs . /proc/uptime /sys/class/net/*/statistics ; '
+        'echo __SECTION_SEPARATOR__ ; ip -j neigh show': (
+            0,
+            '%s__SECTION_SEPARATOR__\n%s\n' % (
+                _stats('1000.50', 1000, 2000), json.dumps(neighbors),
+            ),
+            '',
+        ),
+        'ip -j neigh show': (0, json.dumps(neighbors), ''),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_link_stats(self):
+        stats = get_host().network.link_stats()
+        assert stats.uptime == 1000.5
+        assert stats.interfaces == ('eth0', 'lo')
+        assert len(stats.values) == 2 * len(network.LinkStats.counters)
+        assert stats.get('eth0', 'tx_bytes') == 2000
+        assert stats['eth0']['rx_packets'] == 10
+        assert stats['lo']['tx_errors'] == 0
+
+    def test_rates(self):
+        before = network.LinkStats.parse(_stats('998.50', 200, 1000))
+        after = get_host().network.link_stats()
+        rates = after.rates(before)
+        assert rates['eth0']['rx_bytes'] == 400
+        assert rates['eth0']['tx_bytes'] == 500
+        assert rates['lo']['rx_bytes'] == 0
+        with pytest.raises(ValueError):
+            before.rates(after)
+
+    def test_neighbors(self):
+        neighbors = get_host().network.neighbors()
+        assert neighbors[0] == network.Neighbor(
+            '10.0.0.254', 'eth0', '52:54:00:00:00:fe', ('REACHABLE',),
+        )
+        assert neighbors[1].mac is None
+
+    def test_link_stats_with_neighbors(self):
+        stats = get_host().network.link_stats(neighbors=True)
+        assert stats.get('eth0', 'rx_bytes') == 1000
+        assert [n.ip for n in stats.neighbors] == ['10.0.0.254', '10.0.0.7']
@@ -175,3 +175,56 @@ class TestOsReleaseCorrupted(object):
         info = self.get_host().os.release_info
         assert 'VERSION_ID' not in info
         assert len(info) == 4
+
+
+class TestBinaries(object):
+    data = {
+        'for b in systemctl yum dnf ; do command -v $b ; done': (
+            1, '/usr/bin/systemctl\n/usr/bin/yum\n', '',
+        ),
+        'command -v hostnamectl': (0, '/usr/bin/hostnamectl\n', ''),
+    }
+    files = {}
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def get_host(self, ip='1.1.1.1'):
+        return Host(ip)
+
+    def test_find_binaries(self):
+        result = self.get_host().os.find_binaries(['systemctl', 'yum', 'dnf'])
+        assert result == set(['systemctl', 'yum'])
+
+    def test_timeout(self, monkeypatch):
+        timeouts = list()
+        run_cmd = FakeExecutor.run_cmd
+
+        def record(self, cmd, input_=None, tcp_timeout=None, io_timeout=None):
+            timeouts.append(io_timeout)
+            return run_cmd(self, cmd, input_, tcp_timeout, io_timeout)
+        monkeypatch.setattr(FakeExecutor, 'run_cmd', record)
+        assert self.get_host().os.has_binary('hostnamectl', timeout=10)
+        assert timeouts == [10]
+
+    def test_cached(self):
+        h = self.get_host()
+        h.os.find_binaries(['systemctl', 'yum', 'dnf'])
+        # answered from cache, there is no data for separate lookups
+        assert h.os.has_binary('systemctl')
+        assert not h.os.has_binary('dnf')
+
+    def test_only_missing_looked_up(self):
+        h = self.get_host()
+        h.os.find_binaries(['systemctl', 'yum', 'dnf'])
+        assert h.os.find_binaries(['yum', 'hostnamectl']) == set(
+            ['yum', 'hostnamectl']
+        )
+
+    def test_forget_binaries(self):
+        h = self.get_host()
+        h.os.find_binaries(['systemctl', 'yum', 'dnf'])
+        h.os.forget_binaries()
+        with pytest.raises(Exception):
+            h.os.has_binary('dnf')
@@ -1,5 +1,11 @@
 # -*- coding: utf8 -*-
+import contextlib
+import uuid
+
+import pytest
+
 from rrmngmnt import Host, User
+from rrmngmnt import common
 from .common import FakeExecutor
 import rrmngmnt.package_manager as pm
 from rrmngmnt.package_manager import PackageManagerProxy as PMProxy
@@ -25,10 +31,12 @@ def teardown_module():
     Host.executor = host_executor
 
 
-def fake_cmd_data(cmd_to_data):
+def fake_cmd_data(cmd_to_data, files=None):
     def executor(self, user=User('fakeuser', 'password'), pkey=False):
         e = FakeExecutor(user, self.ip)
         e.cmd_to_data = cmd_to_data.copy()
+        if files is not None:
+            e.files_content = files
         return e
     Host.executor = executor
 
@@ -106,6 +114,16 @@ class BasePackageManager(object):
                     cls.packages['installed_2']
                 ): cls.rc0,
                 remove_pattern_cmd: cls.rc0,
+                extend_cmd(
+                    cls.managers[cls.manager].remove_command_d,
+                    cls.packages['installed_1'],
+                    cls.packages['installed_2'],
+                ): cls.rc0,
+                extend_cmd(
+                    cls.managers[cls.manager].install_command_d,
+                    cls.packages['not_installed'],
+                    cls.packages['non_existing'],
+                ): cls.rc1,
                 extend_cmd(
                     cls.managers[cls.manager].update_command_d,
                     cls.packages['installed_1']
@@ -117,17 +135,73 @@ class BasePackageManager(object):
                     cls.managers[cls.manager].list_command_d
                 ): (0, cls.packages['list'], ''),
             })
+            if cls.managers[cls.manager].index_command_d:
+                cls.set_index_data()
         fake_cmd_data(cls.data)
 
+    @classmethod
+    def set_index_data(cls):
+        manager = cls.managers[cls.manager]
+        cls.data.update({
+            list2cmdline(manager.index_command_d): (
+                0,
+                ''.join(
+                    cls.index_line(cls.packages[p], None, '1.0', '1.el7')
+                    for p in ('installed_1', 'installed_2', 'installed_3')
+                ),
+                '',
+            ),
+            extend_cmd(
+                manager.query_command_d, cls.packages['not_installed']
+            ): (
+                1, '', 'package %s is not installed\n' % (
+                    cls.packages['not_installed'],
+                ),
+            ),
+            extend_cmd(
+                manager.query_command_d,
+                cls.packages['not_installed'],
+                cls.packages['non_existing'],
+            ): (1, '', 'packages are not installed\n'),
+            extend_cmd(
+                manager.query_command_d,
+                cls.packages['not_installed'],
+                'p-skipped',
+            ): (1, '', 'packages are not installed\n'),
+            extend_cmd(
+                manager.install_command_d,
+                cls.packages['not_installed'],
+                'p-skipped',
+            ): cls.rc0,
+            extend_cmd(
+                manager.query_command_d, 'p-installed-2-2.0',
+            ): cls.rc1,
+            extend_cmd(
+                manager.query_command_d, 'p-installed-2.noarch',
+            ): cls.rc1,
+            # installed after index was fetched
+            extend_cmd(manager.query_command_d, 'p-out-of-band'): (
+                0, cls.index_line('p-out-of-band', None, '1.0', '1.el7'), '',
+            ),
+        })
+
+    @staticmethod
+    def index_line(name, epoch, version, release, arch='x86_64'):
+        return '%s\t%s\t%s\t%s\t%s\n' % (
+            name, epoch or '(none)', version, release, arch,
+        )
+
     @classmethod
     def set_base_data(cls):
-        for manager_ in cls.managers:
-            rc = cls.rc1
-            if manager_ == cls.manager:
-                rc = cls.rc0
-            cls.data.update({
-                list2cmdline(['which', manager_]): rc,
-            })
+        binaries = [cls.managers[name].binary for name in PMProxy.order]
+        cls.data.update({
+            list2cmdline(
+                ['for', 'b', 'in'] + binaries +
+                [';', 'do', 'command', '-v', '$b', ';', 'done']
+            ): (
+                1, '/usr/bin/%s\n' % cls.managers[cls.manager].binary, '',
+            ),
+        })
 
     def get_host(self, ip='1.1.1.1'):
         return Host(ip)
@@ -135,6 +209,25 @@ class BasePackageManager(object):
     def get_pm(self):
         return self.get_host().package_manager
 
+    @contextlib.contextmanager
+    def installed(self, *names):
+        """
+        Index fetched meanwhile holds given packages as well
+        """
+        index_cmd = list2cmdline(self.managers[self.manager].index_command_d)
+        index_data = self.data[index_cmd]
+        self.data[index_cmd] = (
+            0,
+            index_data[1] + ''.join(
+                self.index_line(name, None, '1.0', '1.el7') for name in names
+            ),
+            '',
+        )
+        try:
+            yield
+        finally:
+            self.data[index_cmd] = index_data
+
     def test_exist(self):
         assert self.get_pm().exist(self.packages['installed_1'])
 
@@ -145,7 +238,8 @@ class BasePackageManager(object):
         assert self.get_pm().install(self.packages['installed_1'])
 
     def test_install_new(self):
-        assert self.get_pm().install(self.packages['not_installed'])
+        with self.installed(self.packages['not_installed']):
+            assert self.get_pm().install(self.packages['not_installed'])
 
     def test_install_negative(self):
         assert not self.get_pm().install(self.packages['non_existing'])
@@ -153,6 +247,26 @@ class BasePackageManager(object):
     def test_remove(self):
         assert self.get_pm().remove(self.packages['installed_1'])
 
+    def test_install_list(self):
+        with self.installed(self.packages['not_installed']):
+            result = self.get_pm().install(
+                [self.packages['installed_1'], self.packages['not_installed']]
+            )
+        assert result == {
+            self.packages['installed_1']: True,
+            self.packages['not_installed']: True,
+        }
+
+    def test_remove_list(self):
+        result = self.get_pm().remove(
+            [
+                self.packages['installed_1'],
+                self.packages['installed_2'],
+                self.packages['not_installed'],
+            ]
+        )
+        assert all(result.values()) and len(result) == 3
+
     def test_remove_pattern(self):
         assert (
             self.get_pm().remove(self.packages['pattern'], pattern=True)
@@ -168,21 +282,303 @@ class BasePackageManager(object):
         assert self.get_pm().list_() == self.packages['list'].split('\n')
 
 
-class TestYumPM(BasePackageManager):
+class BaseIndexedPackageManager(BasePackageManager):
+    __test__ = False
+
+    def test_index(self):
+        index = self.get_pm().get_index()
+        assert sorted(index) == [
+            'p-installed-1', 'p-installed-2', 'p-installed-3',
+        ]
+        assert index['p-installed-1'] == (
+            pm.Package('p-installed-1', None, '1.0', '1.el7', 'x86_64'),
+        )
+
+    def test_find(self):
+        p = self.get_pm()
+        assert p.exist('p-installed-2-1.0')
+        assert p.exist('p-installed-2-1.0-1.el7.x86_64')
+        assert p.exist('p-installed-2.x86_64')
+        assert not p.exist('p-installed-2-2.0')
+        assert not p.exist('p-installed-2.noarch')
+
+    def test_index_cached(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        # index is not queried again, there is no data for exist commands
+        h.executor = lambda *args, **kwargs: 1 / 0
+        try:
+            assert h.package_manager.exist('p-installed-3')
+        finally:
+            del h.executor
+
+    def test_install_drops_index(self):
+        # transaction could install dependencies as well
+        h = self.get_host()
+        h.package_manager.get_index()
+        with self.installed(self.packages['not_installed']):
+            assert h.package_manager.install(self.packages['not_installed'])
+        # index is fetched again after transaction
+        assert self.packages['not_installed'] in h._package_indexes.get(
+            h.package_manager.index_command_d
+        )
+
+    def test_update_drops_index(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        assert h.package_manager.update([self.packages['installed_1']])
+        assert h._package_indexes.get(
+            h.package_manager.index_command_d
+        ) is None
+
+    def test_exist_queries_on_miss(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        assert h.package_manager.exist('p-out-of-band')
+        assert 'p-out-of-band' in h.package_manager.get_index()
+
+    def test_compare_version(self):
+        p = self.get_pm()
+        assert p.compare_version(self.packages['installed_1'], '1.0-2') == -1
+        assert p.compare_version(self.packages['installed_1'], '0.9') == 1
+        assert p.compare_version(self.packages['not_installed'], '1') is None
+
+    def test_install_list_partial(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        # index fetched after failed transaction holds installed part
+        with self.installed(self.packages['not_installed']):
+            result = h.package_manager.install(
+                [self.packages['not_installed'], self.packages['non_existing']]
+            )
+        assert result == {
+            self.packages['not_installed']: True,
+            self.packages['non_existing']: False,
+        }
+
+    def test_install_list_skipped(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        # transaction succeeds, but unknown name is skipped
+        with self.installed(self.packages['not_installed']):
+            result = h.package_manager.install(
+                [self.packages['not_installed'], 'p-skipped']
+            )
+        assert result == {
+            self.packages['not_installed']: True,
+            'p-skipped': False,
+        }
+
+    def test_remove_drops_index(self):
+        h = self.get_host()
+        h.package_manager.get_index()
+        assert h.package_manager.remove(self.packages['installed_1'])
+        assert h._package_indexes.get(
+            h.package_manager.index_command_d
+        ) is None
+
+
+class TestYumPM(BaseIndexedPackageManager):
     __test__ = True
     manager = 'yum'
 
 
-class TestRpmPM(BasePackageManager):
+class TestRpmPM(BaseIndexedPackageManager):
     __test__ = True
     manager = 'rpm'
 
 
-class TestDnfPM(BasePackageManager):
+class TestDnfPM(BaseIndexedPackageManager):
     __test__ = True
     manager = 'dnf'
 
 
-class TestAptPM(BasePackageManager):
+class TestAptPM(BaseIndexedPackageManager):
     __test__ = True
     manager = 'apt'
+
+    @staticmethod
+    def index_line(name, epoch, version, release, arch='x86_64'):
+        return '%s\t%s%s-%s\t%s\tii \n' % (
+            name, '%s:' % epoch if epoch else '', version, release, arch,
+        )
+
+    def test_parse_index(self):
+        index = pm.APTPackageManager._parse_index(
+            'bash\t4.4-5\tamd64\tii \n'
+            'removed\t1.0-1\tamd64\trc \n'
+            'tzdata\t2:2019c-0ubuntu1\tall\tii \n'
+            'native\t1.2\tall\tii \n'
+        )
+        assert sorted(index) == ['bash', 'native', 'tzdata']
+        assert index['tzdata'] == (
+            pm.Package('tzdata', '2', '2019c', '0ubuntu1', 'all'),
+        )
+        assert index['native'][0].release == ''
+
+
+class TestComparePackages(object):
+    data = {
+        'for b in dnf yum apt rpm ; do command -v $b ; done': (
+            0, '/usr/bin/rpm\n', '',
+        ),
+    }
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data)
+
+    def get_host(self, packages):
+        h = Host('1.1.1.1')
+        index = dict(
+            (name, (pm.Package(name, None, version, '1', 'x86_64'),))
+            for name, version in packages
+        )
+        h._package_indexes.set(pm.RPMPackageManager.index_command_d, index)
+        return h
+
+    def test_majority(self):
+        hosts = [
+            self.get_host([('bash', '4.2'), ('vdsm', '4.1'), ('htop', '2')]),
+            self.get_host([('bash', '4.2'), ('vdsm', '4.1')]),
+            self.get_host([('bash', '4.3'), ('tmux', '1.8')]),
+        ]
+        result = pm.compare_packages(hosts)
+        assert result[0] == pm.PackageDrift(set(), set(['htop']), {})
+        assert result[1] == pm.PackageDrift(set(), set(), {})
+        assert result[2] == pm.PackageDrift(
+            set(['vdsm']), set(['tmux']),
+            {'bash': (('4.3-1.x86_64',), ('4.2-1.x86_64',))},
+        )
+
+    def test_compare_package_versions(self):
+        hosts = [
+            self.get_host([('bash', '4.2')]),
+            self.get_host([('bash', '4.3')]),
+            self.get_host([]),
+        ]
+        assert pm.compare_package_versions(hosts, 'bash', '4.3-1') == [
+            -1, 0, None,
+        ]
+
+    def test_reference(self):
+        reference = self.get_host([('bash', '4.3')])
+        hosts = [self.get_host([('bash', '4.2')])]
+        result = pm.compare_packages(hosts, reference)
+        assert result[0].different == {
+            'bash': (('4.2-1.x86_64',), ('4.3-1.x86_64',)),
+        }
+
+
+class TestDetectPackageManagers(object):
+    data = {
+        'for b in dnf yum apt rpm ; do command -v $b ; done': (
+            1, '/usr/bin/yum\n/bin/rpm\n', '',
+        ),
+    }
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data)
+
+    def get_host(self, facts=None):
+        h = Host('1.1.1.1')
+        h.os._release_info = facts
+        return h
+
+    def test_detect(self):
+        hosts = [self.get_host(), self.get_host()]
+        assert pm.detect_package_managers(hosts) == ['yum', 'yum']
+        assert isinstance(
+            hosts[0].package_manager._manager, pm.YumPackageManager
+        )
+
+    def test_share(self, monkeypatch):
+        monkeypatch.setattr(PMProxy, '_shared', dict())
+        facts = {'ID': 'centos', 'VERSION_ID': '7'}
+        assert self.get_host(facts).package_manager.detect(share=True) == 'yum'
+        h = self.get_host(facts)
+        # answered without any command
+        h.executor = lambda *args, **kwargs: 1 / 0
+        assert pm.detect_package_managers([h], share=True) == ['yum']
+
+
+class TestInstallLocal(object):
+    staged = '/var/tmp/rrmngmnt-packages/'
+    # sha256 of 'aaa' and 'bbb'
+    sha_a = '9834876dcfb05cb167a5c24953eba58c4ac89b1adf57f28f2f9d09af107ee8f0'
+    sha_b = '3e744b9dc39389baf0c5a0660589b8402f3dbb49b89b3e75f2c9355852a3c677'
+    staging_cmd = (
+        'mkdir -p -m 700 {d} ; [ -d {d} ] && [ ! -h {d} ] && [ -O {d} ] '
+        '&& chmod 700 {d} && d={d} || d=$(mktemp -d) || exit 1 ; '
+        'echo $d ; cd $d && sha256sum a.rpm b.rpm'
+    ).format(d='/var/tmp/rrmngmnt-packages')
+    install_cmd = (
+        '[ -O {d}a.rpm ] && [ $(sha256sum < {d}a.rpm | cut -c1-64) = {a} ] '
+        '&& [ -O {d}b.rpm ] && [ $(sha256sum < {d}b.rpm | cut -c1-64) = {b} ] '
+        '&& dnf install -y {d}a.rpm {d}b.rpm'
+    )
+    data = {
+        'for b in dnf yum apt rpm ; do command -v $b ; done': (
+            0, '/usr/bin/dnf\n', '',
+        ),
+        staging_cmd: (
+            1,
+            '/var/tmp/rrmngmnt-packages\n%s  a.rpm\n' % sha_a,
+            'sha256sum: b.rpm: No such file',
+        ),
+        'mv -f {d}b.rpm.{u} {d}b.rpm'.format(d=staged, u='a' * 32): (
+            0, '', '',
+        ),
+        install_cmd.format(d=staged, a=sha_a, b=sha_b): (0, '', ''),
+    }
+    files = {}
+
+    @pytest.fixture
+    def paths(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(
+            common.uuid, 'uuid4', lambda: uuid.UUID('a' * 32),
+        )
+        tmpdir.join('a.rpm').write('aaa')
+        tmpdir.join('b.rpm').write('bbb')
+        return [str(tmpdir.join('a.rpm')), str(tmpdir.join('b.rpm'))]
+
+    @classmethod
+    def setup_class(cls):
+        fake_cmd_data(cls.data, cls.files)
+
+    def test_install_local(self, paths):
+        hosts = [Host('1.1.1.1'), Host('1.1.1.1')]
+        assert pm.install_local_packages(hosts, paths) == [True, True]
+        # only the package which is not staged yet is uploaded, under
+        # temporary name
+        assert self.files[
+            '%sb.rpm.%s' % (self.staged, 'a' * 32)
+        ].data == 'bbb'
+        assert self.staged + 'a.rpm.' + 'a' * 32 not in self.files
+
+    def test_untrusted_staging_dir(self, paths):
+        # staging directory belongs to other user, private one is used
+        tmp = '/var/tmp/tmp.x/'
+        data = dict(self.data)
+        data.update({
+            self.staging_cmd: (
+                1, '/var/tmp/tmp.x\n', 'sha256sum: a.rpm: No such file',
+            ),
+            'mv -f {d}a.rpm.{u} {d}a.rpm'.format(d=tmp, u='a' * 32): (
+                0, '', '',
+            ),
+            'mv -f {d}b.rpm.{u} {d}b.rpm'.format(d=tmp, u='a' * 32): (
+                0, '', '',
+            ),
+            self.install_cmd.format(d=tmp, a=self.sha_a, b=self.sha_b): (
+                0, '', '',
+            ),
+            'rm -rf /var/tmp/tmp.x': (0, '', ''),
+        })
+        fake_cmd_data(data, self.files)
+        try:
+            assert Host('1.1.1.1').package_manager.install_local(paths)
+        finally:
+            fake_cmd_data(self.data, self.files)
+        assert self.files['%sa.rpm.%s' % (tmp, 'a' * 32)].data == 'aaa'
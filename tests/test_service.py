@@ -1,6 +1,9 @@
 # -*- coding: utf8 -*-
+import time
+
 from rrmngmnt import Host
-from rrmngmnt.service import SysVinit, Systemd, InitCtl
+from rrmngmnt import common
+from rrmngmnt.service import SysVinit, Systemd, InitCtl, ServiceState
 from .common import FakeExecutor
 import pytest
 
@@ -33,6 +36,7 @@ class TestSystemService(object):
     service_running = "s-running"
     factory = None
     data = None
+    index_cmd = None
 
     @classmethod
     def setup_class(cls):
@@ -83,22 +87,61 @@ class TestSystemService(object):
     def test_unmask(self):
         assert self.get_service(self.service_stopped).unmask()
 
+    def test_unknown_service(self):
+        with pytest.raises(self.factory.CanNotHandle):
+            self.get_service('s-unknown')
+
+    def test_index_cached(self):
+        h = get_host()
+        self.factory(h, self.service_running)
+        data = self.data.copy()
+        del data[self.index_cmd]
+        fake_cmd_data(data)
+        try:
+            self.factory(h, self.service_stopped)
+        finally:
+            fake_cmd_data(self.data)
+
+    def test_index_refreshed_on_miss(self, monkeypatch):
+        h = get_host()
+        self.factory(h, self.service_running)
+        # service was added after index had been fetched
+        h._service_indexes.set(self.factory.__name__, dict())
+        now = time.time() + self.factory.index_refresh_age + 1
+        monkeypatch.setattr(common.time, 'time', lambda: now)
+        self.factory(h, self.service_stopped)
+        assert self.service_stopped in self.factory.get_index(h)
+
+    def test_fresh_index_not_refreshed(self):
+        h = get_host()
+        self.factory(h, self.service_running)
+        data = self.data.copy()
+        del data[self.index_cmd]
+        fake_cmd_data(data)
+        try:
+            for _ in range(2):
+                with pytest.raises(self.factory.CanNotHandle):
+                    self.factory(h, 's-unknown')
+        finally:
+            fake_cmd_data(self.data)
+
 
 class TestSystemd(TestSystemService):
     __test__ = True
 
     factory = Systemd
+    index_cmd = 'systemctl list-unit-files --type=service --no-legend'
     data = {
-        'which systemctl': (0, '/usr/bin/systemctl', ''),
-        'systemctl list-unit-files | grep -o ^[^.][^.]*.service '
-        '| cut -d. -f1 | sort | uniq': (
+        'command -v systemctl': (0, '/usr/bin/systemctl', ''),
+        'systemctl list-unit-files --type=service --no-legend': (
             0,
             '\n'.join(
                 [
-                    's-disabled',
-                    's-enabled',
-                    's-stopped',
-                    's-running',
+                    's-disabled.service disabled',
+                    's-enabled.service enabled',
+                    's-stopped.service enabled',
+                    's-running.service enabled',
+                    's-timer.timer enabled',
                 ]
             ),
             ''
@@ -117,18 +160,150 @@ class TestSystemd(TestSystemService):
         'systemctl reload s-running.service': (0, '', ''),
         'systemctl mask s-stopped.service': (0, '', ''),
         'systemctl unmask s-stopped.service': (0, '', ''),
+        'systemctl daemon-reload': (0, '', ''),
+        'for b in systemctl service initctl ; do command -v $b ; done': (
+            1, '/usr/bin/systemctl\n', '',
+        ),
+        'systemctl restart s-running.service s-stopped.service >/dev/null ; '
+        'echo $?': (0, '0\n', ''),
+        'systemctl reload s-running.service s-stopped.service >/dev/null ; '
+        'echo $?': (0, '1\n', ''),
+        'systemctl reload s-running.service >/dev/null ; '
+        'echo s-running $? ; '
+        'systemctl reload s-stopped.service >/dev/null ; '
+        'echo s-stopped $?': (0, 's-running 1\ns-stopped 0\n', ''),
+        'systemctl start s-running.service s-stopped.service >/dev/null ; '
+        'echo $? ; systemctl show -p Id -p ActiveState s-running.service '
+        's-stopped.service': (
+            0,
+            '1\nId=s-running.service\nActiveState=active\n\n'
+            'Id=s-stopped.service\nActiveState=failed\n',
+            '',
+        ),
+        'systemctl enable s-disabled.service >/dev/null ; echo $? ; '
+        'systemctl show -p Id -p UnitFileState s-disabled.service': (
+            0, '0\n', '',
+        ),
+        'read t0 _ < /proc/uptime ; '
+        'd=$((${t0%.*}*100+1${t0#*.}-100+1000)) ; '
+        'while : ; do s=$(systemctl is-active s-stopped.service) ; '
+        '[ x$s = xactive ] && break ; read t _ < /proc/uptime ; '
+        '[ $((${t%.*}*100+1${t#*.}-100)) -ge $d ] && break ; '
+        'sleep 1 ; done ; '
+        'read t1 _ < /proc/uptime ; echo $s $t0 $t1': (
+            0, 'active 100.50 102.75\n', '',
+        ),
+        'read t0 _ < /proc/uptime ; '
+        'd=$((${t0%.*}*100+1${t0#*.}-100+200)) ; '
+        'while : ; do s=$(systemctl is-active s-running.service) ; '
+        '[ x$s = xinactive ] && break ; read t _ < /proc/uptime ; '
+        '[ $((${t%.*}*100+1${t#*.}-100)) -ge $d ] && break ; '
+        'sleep 0.5 ; done ; '
+        'read t1 _ < /proc/uptime ; echo $s $t0 $t1': (
+            0, 'active 100.00 102.10\n', '',
+        ),
+        'systemctl show -p Id -p ActiveState -p SubState -p MainPID '
+        '-p ExecMainStartTimestamp s-running.service s-stopped.service': (
+            0,
+            '\n'.join(
+                [
+                    'MainPID=1234',
+                    'Id=s-running.service',
+                    'ActiveState=active',
+                    'SubState=running',
+                    'ExecMainStartTimestamp=Mon 2016-05-02 10:00:00 CEST',
+                    '',
+                    'Id=s-stopped.service',
+                    'MainPID=0',
+                    'ActiveState=inactive',
+                    'SubState=dead',
+                    'ExecMainStartTimestamp=',
+                ]
+            ),
+            '',
+        ),
     }
 
+    def test_wait_for(self):
+        service = self.get_service(self.service_stopped)
+        elapsed, state = service.wait_for('active', timeout=10)
+        assert state == 'active'
+        assert abs(elapsed - 2.25) < 0.001
+
+    def test_wait_for_timeout(self):
+        service = self.get_service(self.service_running)
+        elapsed, state = service.wait_for('inactive', timeout=2, interval=0.5)
+        assert state == 'active'
+
+    def test_service_states(self):
+        states = get_host().service_states(
+            [self.service_running, self.service_stopped]
+        )
+        assert states == {
+            self.service_running: ServiceState(
+                self.service_running, 'active', 'running', 1234,
+                'Mon 2016-05-02 10:00:00 CEST',
+            ),
+            self.service_stopped: ServiceState(
+                self.service_stopped, 'inactive', 'dead', None, None,
+            ),
+        }
+
+    def test_group_restart(self):
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.restart() == {
+            self.service_running: True, self.service_stopped: True,
+        }
+
+    def test_group_reload_failure(self):
+        # s-running rejected reload, even though it stays active
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.reload() == {
+            self.service_running: False, self.service_stopped: True,
+        }
+
+    def test_group_start_partial_failure(self):
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.start() == {
+            self.service_running: True, self.service_stopped: False,
+        }
+
+    def test_group_enable_updates_index(self):
+        h = get_host()
+        h.services([self.service_disabled]).enable()
+        assert Systemd.get_index(h)[self.service_disabled] == 'enabled'
+
+    def test_index(self):
+        index = Systemd.get_index(get_host())
+        assert index['s-enabled'] == 'enabled'
+        assert 's-timer' not in index
+
+    def test_enable_updates_index(self):
+        h = get_host()
+        assert Systemd(h, self.service_disabled).enable()
+        assert Systemd.get_index(h)[self.service_disabled] == 'enabled'
+
+    def test_daemon_reload(self):
+        h = get_host()
+        assert Systemd(h, self.service_running).daemon_reload()
+        assert h._service_indexes.get('Systemd') is None
+
 
 class TestSysVinit(TestSystemService):
     __test__ = True
     factory = SysVinit
+    index_cmd = 'ls -1 /etc/init.d'
     data = {
-        'which service': (0, '/usr/sbin/service', ''),
-        '[ -e /etc/init.d/s-enabled ]': (0, '', ''),
-        '[ -e /etc/init.d/s-disabled ]': (0, '', ''),
-        '[ -e /etc/init.d/s-running ]': (0, '', ''),
-        '[ -e /etc/init.d/s-stopped ]': (0, '', ''),
+        'command -v service': (0, '/usr/sbin/service', ''),
+        'ls -1 /etc/init.d': (
+            0, 's-enabled\ns-disabled\ns-running\ns-stopped\n', '',
+        ),
         'chkconfig s-enabled': (0, '', ''),
         'chkconfig s-disabled': (1, '', ''),
         'chkconfig s-disabled on': (0, '', ''),
@@ -141,8 +316,63 @@ class TestSysVinit(TestSystemService):
         'service s-running stop': (0, '', ''),
         'service s-running restart': (0, '', ''),
         'service s-running reload': (0, '', ''),
+        'for b in systemctl service initctl ; do command -v $b ; done': (
+            1, '/usr/sbin/service\n', '',
+        ),
+        'service s-running restart >/dev/null ; echo s-running $? ; '
+        'service s-stopped restart >/dev/null ; echo s-stopped $?': (
+            0, 's-running 0\ns-stopped 1\n', '',
+        ),
+        'chkconfig s-enabled >/dev/null ; echo s-enabled $? ; '
+        'chkconfig s-disabled >/dev/null ; echo s-disabled $?': (
+            0, 's-enabled 0\ns-disabled 1\n', '',
+        ),
+        'read t0 _ < /proc/uptime ; '
+        'd=$((${t0%.*}*100+1${t0#*.}-100+3000)) ; '
+        'while : ; do s=$(service s-running status >/dev/null 2>&1 '
+        '&& echo active || echo inactive) ; [ x$s = xinactive ] && break ; '
+        'read t _ < /proc/uptime ; '
+        '[ $((${t%.*}*100+1${t#*.}-100)) -ge $d ] && break ; sleep 1 ; '
+        'done ; read t1 _ < /proc/uptime ; echo $s $t0 $t1': (
+            0, 'inactive 10.00 13.00\n', '',
+        ),
+        'service s-running status >/dev/null ; echo s-running $? ; '
+        'service s-stopped status >/dev/null ; echo s-stopped $?': (
+            0, 's-running 0\ns-stopped 3\n', '',
+        ),
     }
 
+    def test_service_states(self):
+        states = get_host().service_states(
+            [self.service_running, self.service_stopped]
+        )
+        assert states[self.service_running].active == 'active'
+        assert states[self.service_stopped].active == 'inactive'
+
+    def test_wait_for(self):
+        service = self.get_service(self.service_running)
+        assert service.wait_for('inactive') == (3.0, 'inactive')
+
+    def test_group_restart(self):
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.restart() == {
+            self.service_running: True, self.service_stopped: False,
+        }
+
+    def test_group_is_enabled(self):
+        group = get_host().services(
+            [self.service_enabled, self.service_disabled]
+        )
+        assert group.is_enabled() == {
+            self.service_enabled: True, self.service_disabled: False,
+        }
+
+    def test_group_mask(self):
+        with pytest.raises(NotImplementedError):
+            get_host().services([self.service_running]).mask()
+
     def test_mask(self):
         with pytest.raises(NotImplementedError):
             super(TestSysVinit, self).test_mask()
@@ -155,16 +385,17 @@ class TestSysVinit(TestSystemService):
 class TestInitCtl(TestSystemService):
     __test__ = True
     factory = InitCtl
+    index_cmd = 'initctl list'
     data = {
-        'which initctl': (0, '/sbin/initctl', ''),
-        'initctl list | cut -d " " -f1 | sort | uniq': (
+        'command -v initctl': (0, '/sbin/initctl', ''),
+        'initctl list': (
             0,
             '\n'.join(
                 [
-                    's-disabled',
-                    's-enabled',
-                    's-stopped',
-                    's-running',
+                    's-disabled stop/waiting',
+                    's-enabled stop/waiting',
+                    's-stopped stop/waiting',
+                    's-running start/running, process 1234',
                 ]
             ),
             '',
@@ -179,8 +410,66 @@ class TestInitCtl(TestSystemService):
         'initctl stop s-running': (0, '', ''),
         'initctl restart s-running': (0, '', ''),
         'initctl reload s-running': (0, '', ''),
+        'for b in systemctl service initctl ; do command -v $b ; done': (
+            1, '/sbin/initctl\n', '',
+        ),
+        'initctl restart s-running >/dev/null || '
+        'initctl start s-running >/dev/null ; echo s-running $? ; '
+        'initctl restart s-stopped >/dev/null || '
+        'initctl start s-stopped >/dev/null ; echo s-stopped $?': (
+            0, 's-running 0\ns-stopped 0\n', '',
+        ),
+        'initctl status s-running | grep -q /running >/dev/null ; '
+        'echo s-running $? ; '
+        'initctl status s-stopped | grep -q /running >/dev/null ; '
+        'echo s-stopped $?': (
+            0, 's-running 0\ns-stopped 1\n', '',
+        ),
+        'initctl status s-running ; initctl status s-stopped': (
+            0,
+            's-running start/running, process 1234\ns-stopped stop/waiting\n',
+            '',
+        ),
     }
 
+    def test_service_states(self):
+        states = get_host().service_states(
+            [self.service_running, self.service_stopped]
+        )
+        assert states == {
+            self.service_running: ServiceState(
+                self.service_running, 'active', 'start/running', 1234, None,
+            ),
+            self.service_stopped: ServiceState(
+                self.service_stopped, 'inactive', 'stop/waiting', None, None,
+            ),
+        }
+
+    def test_get_state(self):
+        state = self.get_service(self.service_running).get_state()
+        assert state.active == 'active'
+
+    def test_group_restart(self):
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.restart() == {
+            self.service_running: True, self.service_stopped: True,
+        }
+
+    def test_group_status(self):
+        group = get_host().services(
+            [self.service_running, self.service_stopped]
+        )
+        assert group.status() == {
+            self.service_running: True, self.service_stopped: False,
+        }
+
+    def test_index(self):
+        index = InitCtl.get_index(get_host())
+        assert index['s-running'] == 'start/running'
+        assert index['s-stopped'] == 'stop/waiting'
+
     def test_is_enabled_positive(self):
         with pytest.raises(NotImplementedError):
             super(TestInitCtl, self).test_is_enabled_positive()
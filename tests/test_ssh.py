@@ -0,0 +1,104 @@
+# -*- coding: utf8 -*-
+import os
+import socket
+import subprocess
+import threading
+
+import pytest
+
+from rrmngmnt import RootUser
+from rrmngmnt.ssh import RemoteExecutor
+
+
+class LocalChannel(object):
+    """
+    Mimics paramiko channel executing command by local process
+    """
+    def __init__(self, program):
+        self._p = subprocess.Popen(
+            [program], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._lock = threading.Lock()
+        self._buffers = {'out': b'', 'err': b''}
+        for name, stream in (('out', self._p.stdout), ('err', self._p.stderr)):
+            t = threading.Thread(target=self._read, args=(name, stream))
+            t.daemon = True
+            t.start()
+
+    def _read(self, name, stream):
+        for data in iter(lambda: os.read(stream.fileno(), 4096), b''):
+            with self._lock:
+                self._buffers[name] += data
+
+    def _take(self, name, size):
+        with self._lock:
+            data = self._buffers[name][:size]
+            self._buffers[name] = self._buffers[name][size:]
+        return data
+
+    def sendall(self, data):
+        self._p.stdin.write(data)
+        self._p.stdin.flush()
+
+    def recv_ready(self):
+        return bool(self._buffers['out'])
+
+    def recv_stderr_ready(self):
+        return bool(self._buffers['err'])
+
+    def recv(self, size):
+        return self._take('out', size)
+
+    def recv_stderr(self, size):
+        return self._take('err', size)
+
+    def exit_status_ready(self):
+        return self._p.poll() is not None
+
+    def close(self):
+        self._p.stdin.close()
+        self._p.wait()
+
+
+class LocalShell(RemoteExecutor.Shell):
+    def open(self):
+        self._channel = LocalChannel(self.program)
+
+
+class TestShell(object):
+
+    def get_shell(self):
+        executor = RemoteExecutor(RootUser('pass'), '1.1.1.1')
+        return LocalShell(executor.session())
+
+    def test_run_cmd(self):
+        with self.get_shell() as sh:
+            assert sh.run_cmd(['echo', 'hello world']) == (
+                0, 'hello world\n', '',
+            )
+            assert sh.run_cmd('printf out; printf err >&2; exit_=3; '
+                              '(exit $exit_)') == (3, 'out', 'err')
+
+    def test_state_kept(self):
+        with self.get_shell() as sh:
+            sh.run_cmd(['cd', '/'])
+            sh.run_cmd('export RRMNGMNT_TEST=value')
+            assert sh.run_cmd(['pwd'])[1] == '/\n'
+            assert sh.run_cmd('echo $RRMNGMNT_TEST')[1] == 'value\n'
+
+    def test_stdin_not_consumed(self):
+        with self.get_shell() as sh:
+            assert sh.run_cmd(['cat']) == (0, '', '')
+            assert sh.run_cmd(['echo', 'next']) == (0, 'next\n', '')
+
+    def test_timeout(self):
+        with self.get_shell() as sh:
+            with pytest.raises(socket.timeout):
+                sh.run_cmd(['sleep', '1'], timeout=0.1)
+
+    def test_exit(self):
+        with self.get_shell() as sh:
+            with pytest.raises(Exception) as ex_info:
+                sh.run_cmd(['exit', '1'])
+            assert "Shell exited" in str(ex_info.value)
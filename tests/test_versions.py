@@ -0,0 +1,75 @@
+# -*- coding: utf8 -*-
+import pytest
+
+from rrmngmnt import versions
+
+
+@pytest.mark.parametrize(
+    ('a', 'b', 'expected'),
+    [
+        ('1.0', '1.0', 0),
+        ('1.0', '2.0', -1),
+        ('2.0.1', '2.0', 1),
+        ('2.0', '2.0.1', -1),
+        ('2.0.1a', '2.0.1', 1),
+        ('5.5p1', '5.5p10', -1),
+        ('10xyz', '10.1xyz', -1),
+        ('xyz10', 'xyz10.1', -1),
+        ('1.010', '1.10', 0),
+        ('1.0a', '1.0.1', -1),
+        ('a', '1', -1),
+        ('2.0', '2_0', 0),
+        ('1.0~rc1', '1.0', -1),
+        ('1.0~rc1', '1.0~rc2', -1),
+        ('1.0~rc1~git123', '1.0~rc1', -1),
+        ('1.0^', '1.0', 1),
+        ('1.0^git1', '1.0', 1),
+        ('1.0^git1', '1.01', -1),
+        ('1.0^git1', '1.0^git2', -1),
+        ('1.0^git1', '1.0~rc1', 1),
+        ('1.0~rc1^git1', '1.0~rc1', 1),
+    ]
+)
+def test_rpmvercmp(a, b, expected):
+    assert versions.rpmvercmp(a, b) == expected
+    assert versions.rpmvercmp(b, a) == -expected
+
+
+@pytest.mark.parametrize(
+    ('a', 'b', 'expected'),
+    [
+        ('1.0', '1.0', 0),
+        ('1.0', '1.1', -1),
+        ('1.0~rc1', '1.0', -1),
+        ('1.0~~', '1.0~', -1),
+        ('1.0+dfsg', '1.0', 1),
+        ('1.0a', '1.0+', -1),
+        ('1.01', '1.1', 0),
+        ('0ubuntu10', '0ubuntu9', 1),
+    ]
+)
+def test_debvercmp(a, b, expected):
+    assert versions.debvercmp(a, b) == expected
+    assert versions.debvercmp(b, a) == -expected
+
+
+def test_compare_versions():
+    assert versions.compare_versions('1:1.0-1', '2.0-1') == 1
+    assert versions.compare_versions('1.0-2.el7', '1.0-10.el7') == -1
+    assert versions.compare_versions(
+        '2:2019c-0ubuntu1', '2:2019c-0ubuntu0.18.04', versions.DEB,
+    ) == 1
+
+
+def test_parse_evr():
+    assert versions.parse_evr('1:2.3-4.el7') == (1, '2.3', '4.el7')
+    assert versions.parse_evr('2.3') == (0, '2.3', '')
+
+
+def test_compare_many():
+    result = versions.compare_many(
+        '1.2-3',
+        [('a', '1.2-3'), ('b', '1.1-9'), ('c', (1, '0.1', '1')),
+         ('d', '1.1-9')],
+    )
+    assert result == {'a': 0, 'b': -1, 'c': 1, 'd': -1}